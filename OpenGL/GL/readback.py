@@ -0,0 +1,184 @@
+"""Asynchronous pixel readback through a ring of pixel buffer objects
+
+glReadPixels into client memory makes the driver finish every queued
+command before it can copy the image back, and OpenGL.GL.images'
+version allocates a new output for every call.  Reading into a buffer
+bound to GL_PIXEL_PACK_BUFFER instead only queues the copy; the image is
+mapped a frame (or more) later, by which time the copy has normally
+finished, and NumPy looks at the mapped memory directly.
+
+Usage, once per frame after drawing:
+
+    from OpenGL.GL.readback import PixelReadback
+    readback = PixelReadback( width, height )
+    ...
+    image = readback.read()     # None until the ring has filled
+    if image is not None:
+        save( image )           # only valid until the next call
+    ...
+    image = readback.map()      # frames still in flight, oldest first
+    while image is not None:
+        save( image )
+        image = readback.map()
+    readback.release()
+
+With ``count`` buffers an image arrives ``count - 1`` frames after it
+was drawn.  Pass ``out`` (an array of the right shape and dtype) to
+read() or map() to have the image copied there and the buffer returned
+to the ring at once.
+"""
+import collections
+import ctypes
+import numpy
+from OpenGL import images
+from OpenGL.arrays.numpymodule import GL_TYPE_TO_ARRAY_MAPPING
+from OpenGL.GL import (
+    GL_PIXEL_PACK_BUFFER, GL_STREAM_READ, GL_MAP_READ_BIT, GL_READ_ONLY,
+    GL_PACK_ALIGNMENT, GL_RGB, GL_UNSIGNED_BYTE,
+    GL_SYNC_GPU_COMMANDS_COMPLETE, GL_TIMEOUT_EXPIRED,
+    glGenBuffers, glDeleteBuffers, glBindBuffer, glBufferData,
+    glMapBufferRange, glMapBuffer, glUnmapBuffer,
+    glPixelStorei, glReadPixels,
+    glFenceSync, glClientWaitSync, glDeleteSync,
+)
+
+__all__ = (
+    'PixelReadback',
+)
+
+class PixelReadback( object ):
+    """Ring of ``count`` pack buffers for reading back width x height images
+
+    format, type -- as for glReadPixels; images come back as
+        (height, width, components) arrays of the matching dtype
+        ((height, width, 1) for packed types)
+    x, y -- lower left corner of the region read
+    flip -- return the top row first (a reversed view, nothing is copied)
+
+    Rows are read tightly packed (GL_PACK_ALIGNMENT 1).
+    """
+    def __init__(
+        self, width, height, format=GL_RGB, type=GL_UNSIGNED_BYTE,
+        count=2, x=0, y=0, flip=True,
+    ):
+        if count < 1:
+            raise ValueError( """Need at least one buffer, got %r"""%( count, ))
+        self.width, self.height = width, height
+        self.format, self.type = format, type
+        self.x, self.y = x, y
+        self.flip = flip
+        self.count = count
+        if type in images.TIGHT_PACK_FORMATS:
+            components = 1
+        else:
+            components = images.formatToComponentCount( format )
+        self.dtype = numpy.dtype( GL_TYPE_TO_ARRAY_MAPPING[ images.TYPE_TO_ARRAYTYPE.get( type, type ) ] )
+        self.shape = (height, width, components)
+        self.size = width * height * components * self.dtype.itemsize
+        buffers = glGenBuffers( count )
+        self.buffers = [ int(buffer) for buffer in numpy.ravel( buffers ) ]
+        for buffer in self.buffers:
+            glBindBuffer( GL_PIXEL_PACK_BUFFER, buffer )
+            glBufferData( GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ )
+        glBindBuffer( GL_PIXEL_PACK_BUFFER, 0 )
+        self.free = collections.deque( self.buffers )
+        self.pending = collections.deque()  # (buffer, fence or None), oldest first
+        self.mapped = None
+        self.use_fences = bool( glFenceSync )
+        self.use_range = bool( glMapBufferRange )
+
+    def request( self ):
+        """Queue a copy of the region into the next free buffer
+
+        raises RuntimeError if every buffer still holds an image nobody
+        has mapped.
+        """
+        self.unmap()
+        if not self.free:
+            raise RuntimeError( """All %d readback buffers are pending, map() one first"""%( self.count, ))
+        buffer = self.free.popleft()
+        glBindBuffer( GL_PIXEL_PACK_BUFFER, buffer )
+        glPixelStorei( GL_PACK_ALIGNMENT, 1 )
+        glReadPixels( self.x, self.y, self.width, self.height, self.format, self.type, 0 )
+        fence = glFenceSync( GL_SYNC_GPU_COMMANDS_COMPLETE, 0 ) if self.use_fences else None
+        glBindBuffer( GL_PIXEL_PACK_BUFFER, 0 )
+        self.pending.append( (buffer, fence) )
+
+    def ready( self ):
+        """Whether the oldest pending image can be mapped without waiting for the GPU"""
+        if not self.pending:
+            return False
+        fence = self.pending[0][1]
+        if fence is None:
+            return True
+        return glClientWaitSync( fence, 0, 0 ) != GL_TIMEOUT_EXPIRED
+
+    def map( self, out=None ):
+        """The oldest pending image, or None if nothing is pending
+
+        Without ``out`` this is a view of the mapped buffer, valid until
+        the next request(), map(), read(), unmap() or release().  With
+        ``out`` the image is copied there, the buffer goes back to the
+        ring and ``out`` is returned.
+        """
+        self.unmap()
+        if not self.pending:
+            return None
+        buffer, fence = self.pending.popleft()
+        if fence is not None:
+            glDeleteSync( fence )  # Mapping waits for the copy anyway
+        glBindBuffer( GL_PIXEL_PACK_BUFFER, buffer )
+        if self.use_range:
+            pointer = glMapBufferRange( GL_PIXEL_PACK_BUFFER, 0, self.size, GL_MAP_READ_BIT )
+        else:
+            pointer = glMapBuffer( GL_PIXEL_PACK_BUFFER, GL_READ_ONLY )
+        if not pointer:
+            glBindBuffer( GL_PIXEL_PACK_BUFFER, 0 )
+            self.free.append( buffer )
+            raise RuntimeError( """Unable to map readback buffer %s"""%( buffer, ))
+        memory = (ctypes.c_char * self.size).from_address( pointer )
+        image = numpy.frombuffer( memory, dtype=self.dtype ).reshape( self.shape )
+        if self.flip:
+            image = image[::-1]
+        if out is not None:
+            out[...] = image
+            del memory, image
+            glUnmapBuffer( GL_PIXEL_PACK_BUFFER )
+            glBindBuffer( GL_PIXEL_PACK_BUFFER, 0 )
+            self.free.append( buffer )
+            return out
+        glBindBuffer( GL_PIXEL_PACK_BUFFER, 0 )
+        self.mapped = buffer
+        return image
+
+    def unmap( self ):
+        """Give the buffer behind the last returned view back to the ring"""
+        if self.mapped is not None:
+            glBindBuffer( GL_PIXEL_PACK_BUFFER, self.mapped )
+            glUnmapBuffer( GL_PIXEL_PACK_BUFFER )
+            glBindBuffer( GL_PIXEL_PACK_BUFFER, 0 )
+            self.free.append( self.mapped )
+            self.mapped = None
+
+    def read( self, out=None ):
+        """request() this frame, then map() the one ``count - 1`` frames old
+
+        Returns None while the ring is filling; see map() for ``out``
+        and how long the result stays valid.
+        """
+        self.request()
+        if len( self.pending ) < self.count:
+            return None
+        return self.map( out )
+
+    def release( self ):
+        """Unmap and delete the buffers (pending images are lost)"""
+        self.unmap()
+        while self.pending:
+            _, fence = self.pending.popleft()
+            if fence is not None:
+                glDeleteSync( fence )
+        if self.buffers:
+            glDeleteBuffers( len( self.buffers ), self.buffers )
+            self.buffers = []
+            self.free.clear()
@@ -0,0 +1,257 @@
+"""Client-side shadow of common GL state that drops no-op state changes
+
+Immediate-mode code tends to set the same state over and over: every
+helper disables lighting, sets a point size or colour and re-enables
+lighting again, whether or not anything changed.  Each of those is a
+full PyOpenGL wrapper call (argument conversion, ctypes call, error
+check).  A StateShadow remembers what it last sent for:
+
+    enable bits (glEnable/glDisable), client arrays
+    (glEnableClientState/glDisableClientState), glBlendFunc, glPointSize,
+    glLineWidth, the current colour (glColor3f/glColor4f), buffer
+    bindings (glBindBuffer), texture bindings per unit (glActiveTexture,
+    glBindTexture) and glUseProgram
+
+and returns without calling GL when asked to set the value already in
+effect.  Dropped calls are counted per entry point.
+
+The shadow is only correct while it sees every change to the state it
+tracks.  It forgets state on its own when it can tell GL changed it
+(glPopAttrib, glPopClientAttrib, glCallList(s), glDrawArrays and
+glDrawElements with a colour array enabled) and tracks nothing while a
+display list is being compiled.  Code that changes tracked state by
+other means (modules calling OpenGL.GL directly, display lists compiled
+behind the shadow's back) must run inside foreign(), which forgets the
+tracked state before and after it:
+
+    with state.foreign():
+        renderer.draw()
+
+    @state.foreign()
+    def draw_with_helpers(): ...
+
+Usage:
+
+    from OpenGL.GL.stateshadow import StateShadow
+    state = StateShadow()
+    state.glEnable( GL_LIGHTING )   # calls GL
+    state.glEnable( GL_LIGHTING )   # dropped, state.redundant['glEnable'] == 1
+
+or replace the GL functions a module uses in one go:
+
+    state.install( globals() )
+"""
+import collections
+import contextlib
+from OpenGL import GL
+
+__all__ = (
+    'StateShadow',
+    'ForeignCode',
+    'SHADOWED_FUNCTIONS',
+)
+
+#: Entry points a StateShadow provides in place of the GL ones
+SHADOWED_FUNCTIONS = (
+    'glEnable', 'glDisable',
+    'glEnableClientState', 'glDisableClientState',
+    'glBlendFunc', 'glPointSize', 'glLineWidth',
+    'glColor3f', 'glColor4f',
+    'glBindBuffer', 'glActiveTexture', 'glBindTexture', 'glUseProgram',
+    'glPushAttrib', 'glPopAttrib', 'glPushClientAttrib', 'glPopClientAttrib',
+    'glCallList', 'glCallLists', 'glNewList', 'glEndList',
+    'glDrawArrays', 'glDrawElements',
+)
+
+class ForeignCode( contextlib.ContextDecorator ):
+    """Invalidates a StateShadow on entry and exit, see StateShadow.foreign
+
+    On entry so that nothing compiled into a display list the shadow
+    doesn't know about relies on state it assumed, on exit because the
+    code may have changed anything.  server/client choose which half of
+    the state is forgotten (see invalidate_server, invalidate_client).
+    """
+    def __init__( self, shadow, server=True, client=True ):
+        self.shadow = shadow
+        self.server = server
+        self.client = client
+    def invalidate( self ):
+        if self.server:
+            self.shadow.invalidate_server()
+        if self.client:
+            self.shadow.invalidate_client()
+    def __enter__( self ):
+        self.invalidate()
+        return self.shadow
+    def __exit__( self, *exc_info ):
+        self.invalidate()
+        return False
+
+class StateShadow( object ):
+    """Remembers GL state it has set and skips calls that would not change it
+
+    gl -- namespace the real entry points are taken from (default
+        OpenGL.GL); pass another to stack the shadow on wrapped functions
+
+    passed -- number of calls forwarded to GL
+    redundant -- collections.Counter of dropped calls by entry point name
+    """
+    def __init__( self, gl=None ):
+        gl = gl if gl is not None else GL
+        self.gl = gl
+        self._real = dict( (name, getattr( gl, name )) for name in SHADOWED_FUNCTIONS )
+        self._installed = []
+        self.compiling = False
+        self.passed = 0
+        self.redundant = collections.Counter()
+        self.invalidate()
+
+    def invalidate( self ):
+        """Forget everything; the next change of every kind goes to GL"""
+        self.invalidate_server()
+        self.invalidate_client()
+
+    def foreign( self, server=True, client=True ):
+        """Context manager (and decorator) for GL code that bypasses the shadow
+
+        Pass server=False for code that only touches client arrays and
+        buffer bindings (e.g. glutSolidSphere drawing from vertex arrays).
+        """
+        return ForeignCode( self, server, client )
+
+    def invalidate_server( self ):
+        """Forget the server-side state (everything but client arrays and buffers)"""
+        self.enabled = {}
+        self.blend_func = None
+        self.point_size = None
+        self.line_width = None
+        self.color = None
+        self.active_texture = None
+        self.textures = {}
+        self.program = None
+
+    def invalidate_client( self ):
+        """Forget client array enables and buffer bindings"""
+        self.client_enabled = {}
+        self.buffers = {}
+
+    def reset_counters( self ):
+        """Zero the counters, returning (passed, redundant) as they were"""
+        counts = self.passed, self.redundant
+        self.passed = 0
+        self.redundant = collections.Counter()
+        return counts
+
+    def redundant_total( self ):
+        return sum( self.redundant.values() )
+
+    def install( self, namespace ):
+        """Replace the SHADOWED_FUNCTIONS present in ``namespace`` (e.g. globals())"""
+        for name in SHADOWED_FUNCTIONS:
+            if name in namespace:
+                self._installed.append( (namespace, name, namespace[name]) )
+                namespace[name] = getattr( self, name )
+
+    def uninstall( self ):
+        """Put back whatever install() replaced"""
+        while self._installed:
+            namespace, name, original = self._installed.pop()
+            namespace[name] = original
+
+    def _set( self, table, key, value, name, *args ):
+        """Forward ``name(*args)`` unless table[key] is already value"""
+        if self.compiling:
+            return self._real[name]( *args )
+        if table.get( key ) == value:
+            self.redundant[name] += 1
+            return None
+        table[key] = value
+        self.passed += 1
+        return self._real[name]( *args )
+
+    def glEnable( self, cap ):
+        return self._set( self.enabled, cap, True, 'glEnable', cap )
+    def glDisable( self, cap ):
+        return self._set( self.enabled, cap, False, 'glDisable', cap )
+    def glEnableClientState( self, array ):
+        return self._set( self.client_enabled, array, True, 'glEnableClientState', array )
+    def glDisableClientState( self, array ):
+        return self._set( self.client_enabled, array, False, 'glDisableClientState', array )
+    def glBindBuffer( self, target, buffer ):
+        return self._set( self.buffers, target, buffer, 'glBindBuffer', target, buffer )
+    def glBindTexture( self, target, texture ):
+        return self._set(
+            self.textures, (self.active_texture, target), texture,
+            'glBindTexture', target, texture,
+        )
+
+    def _set_value( self, attribute, value, name, *args ):
+        """Forward ``name(*args)`` unless self.<attribute> is already value"""
+        if self.compiling:
+            return self._real[name]( *args )
+        if getattr( self, attribute ) == value:
+            self.redundant[name] += 1
+            return None
+        setattr( self, attribute, value )
+        self.passed += 1
+        return self._real[name]( *args )
+
+    def glBlendFunc( self, sfactor, dfactor ):
+        return self._set_value( 'blend_func', (sfactor, dfactor), 'glBlendFunc', sfactor, dfactor )
+    def glPointSize( self, size ):
+        return self._set_value( 'point_size', size, 'glPointSize', size )
+    def glLineWidth( self, width ):
+        return self._set_value( 'line_width', width, 'glLineWidth', width )
+    def glColor3f( self, red, green, blue ):
+        return self._set_value( 'color', (red, green, blue, 1.0), 'glColor3f', red, green, blue )
+    def glColor4f( self, red, green, blue, alpha ):
+        return self._set_value( 'color', (red, green, blue, alpha), 'glColor4f', red, green, blue, alpha )
+    def glActiveTexture( self, texture ):
+        return self._set_value( 'active_texture', texture, 'glActiveTexture', texture )
+    def glUseProgram( self, program ):
+        return self._set_value( 'program', program, 'glUseProgram', program )
+
+    # Calls that change tracked state behind the shadow's back
+    def _forward( self, name, *args ):
+        self.passed += 1
+        return self._real[name]( *args )
+    def glPushAttrib( self, mask ):
+        return self._forward( 'glPushAttrib', mask )
+    def glPopAttrib( self ):
+        if not self.compiling:
+            self.invalidate_server()
+        return self._forward( 'glPopAttrib' )
+    def glPushClientAttrib( self, mask ):
+        return self._forward( 'glPushClientAttrib', mask )
+    def glPopClientAttrib( self ):
+        if not self.compiling:
+            self.invalidate_client()
+        return self._forward( 'glPopClientAttrib' )
+    def glCallList( self, list ):
+        if not self.compiling:
+            self.invalidate()
+        return self._forward( 'glCallList', list )
+    def glCallLists( self, *args ):
+        if not self.compiling:
+            self.invalidate()
+        return self._forward( 'glCallLists', *args )
+    def glNewList( self, list, mode ):
+        result = self._forward( 'glNewList', list, mode )
+        self.compiling = True
+        self._list_mode = mode
+        return result
+    def glEndList( self ):
+        self.compiling = False
+        if self._list_mode != GL.GL_COMPILE:
+            self.invalidate()
+        return self._forward( 'glEndList' )
+    def _after_draw( self ):
+        """A draw with a colour array leaves the current colour undefined"""
+        if not self.compiling and self.client_enabled.get( GL.GL_COLOR_ARRAY ) is not False:
+            self.color = None
+    def glDrawArrays( self, mode, first, count ):
+        self._after_draw()
+        return self._forward( 'glDrawArrays', mode, first, count )
+    def glDrawElements( self, mode, count, type, indices ):
+        self._after_draw()
+        return self._forward( 'glDrawElements', mode, count, type, indices )
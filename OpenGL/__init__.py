@@ -78,6 +78,37 @@ import occurs the flags should no longer be changed.
 
         Default: False
 
+    CALL_ACCOUNTING -- if set to True, PyOpenGL will count and
+        time every call of every GL, GLU and GLUT entry point, per
+        frame (a frame ends at glutSwapBuffers).  Read the results
+        with OpenGL.accounting.top() or OpenGL.accounting.report().
+        Adds two clock reads and a dictionary update to each call,
+        so only enable it to find out which calls to batch.
+
+        Default: False
+
+    FAST_SCALAR_CALLS -- if set to True, entry points whose
+        arguments and result are all plain scalars (glVertex3f,
+        glTranslatef, glEnable, ...) use a trimmed error-checking
+        policy: per-vertex attribute calls (glVertex*, glColor*,
+        glNormal*, glTexCoord*, ...), which cannot raise GL errors,
+        and the glTranslate*/glRotate*/glScale* transforms, whose only
+        error is being called between glBegin and glEnd, skip the
+        per-call glGetError; an error they do cause is reported by
+        the next checked call instead.  Wrappers with nothing to
+        convert call their base function directly.
+
+        Default: False
+
+    ENTRY_POINT_CACHE -- if set to True, what BasePlatform works out
+        about each entry point from its library (whether the symbol
+        exists, its final argument types) is cached on disk, per
+        library path, library mtime and PyOpenGL version, under the
+        user cache directory (PYOPENGL_CACHE_DIR overrides it), so
+        later processes skip that work.  See OpenGL.platform.entrycache.
+
+        Default: False
+
     STORE_POINTERS -- if set to True, PyOpenGL array operations
         will attempt to store references to pointers which are
         being passed in order to prevent memory-access failures
@@ -203,6 +234,9 @@ FORWARD_COMPATIBLE_ONLY = False
 SIZE_1_ARRAY_UNPACK = True
 USE_ACCELERATE = environ_key("USE_ACCELERATE", True)
 CONTEXT_CHECKING = environ_key("CONTEXT_CHECKING", False)
+CALL_ACCOUNTING = environ_key("CALL_ACCOUNTING", False)
+FAST_SCALAR_CALLS = environ_key("FAST_SCALAR_CALLS", False)
+ENTRY_POINT_CACHE = environ_key("ENTRY_POINT_CACHE", False)
 
 FULL_LOGGING = environ_key("FULL_LOGGING", False)
 ALLOW_NUMPY_SCALARS = environ_key("ALLOW_NUMPY_SCALARS", False)
@@ -10,6 +10,9 @@ from OpenGL import (
     SIZE_1_ARRAY_UNPACK,
     USE_ACCELERATE,
     CONTEXT_CHECKING,
+    CALL_ACCOUNTING,
+    FAST_SCALAR_CALLS,
+    ENTRY_POINT_CACHE,
 
     FULL_LOGGING,
     ALLOW_NUMPY_SCALARS,
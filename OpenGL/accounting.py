@@ -0,0 +1,214 @@
+"""Per-entry-point call counts and times, per frame
+
+Enabled by setting OpenGL.CALL_ACCOUNTING = True (or the environment
+variable PYOPENGL_CALL_ACCOUNTING=1) before the first OpenGL import.
+Every base function built by the platform, and every finalised
+OpenGL.wrapper.Wrapper, is then wrapped by a counter that records one
+call and its duration (time.perf_counter_ns) against the entry point's
+name.  A Wrapper's own call is recorded under the same name as the base
+function it wraps, and the base call it makes is not counted again, so
+the time covers PyOpenGL's argument conversion and error checking as
+well as the C call.  Times are inclusive: a wrapper that makes other GL
+calls (glGetIntegerv to size an array, say) is charged for them and
+they are counted as well.
+
+A frame ends when glutSwapBuffers returns (see FRAME_FUNCTIONS), or when
+endFrame() is called by code that swaps buffers some other way.  Usage:
+
+    from OpenGL import accounting
+    for name, count, seconds in accounting.top( 10 ):
+        print( name, count, seconds )
+    print( accounting.report( 10 ) )
+
+With accounting disabled nothing is wrapped, and the functions here
+report nothing.
+"""
+import time
+from OpenGL import _configflags
+
+__all__ = (
+    'CallStats',
+    'stats',
+    'enabled',
+    'countCalls',
+    'countWrapperCalls',
+    'endFrame',
+    'top',
+    'report',
+    'reset',
+)
+
+#: Entry points whose return ends a frame
+FRAME_FUNCTIONS = ( 'glutSwapBuffers', )
+#: Entry points that run the application's callbacks; they are not counted
+NOT_COUNTED = ( 'glutMainLoop', 'glutMainLoopEvent', 'glutCheckLoop' )
+
+_now = time.perf_counter_ns
+
+class CallStats( object ):
+    """Call counts and nanoseconds by entry point name
+
+    current -- {name: [count, nanoseconds]} for the frame in progress
+    last -- the same for the last finished frame
+    totals -- the same summed over every finished frame
+    frames -- number of finished frames
+    """
+    def __init__( self ):
+        self.wrapping = None
+        self.reset()
+
+    def reset( self ):
+        """Forget everything recorded so far"""
+        self.current = {}
+        self.last = {}
+        self.totals = {}
+        self.frames = 0
+
+    def record( self, name, nanoseconds ):
+        entry = self.current.get( name )
+        if entry is None:
+            self.current[name] = [1, nanoseconds]
+        else:
+            entry[0] += 1
+            entry[1] += nanoseconds
+
+    def endFrame( self ):
+        """Close the current frame, adding it to the totals"""
+        totals = self.totals
+        for name, (count, nanoseconds) in self.current.items():
+            entry = totals.get( name )
+            if entry is None:
+                totals[name] = [count, nanoseconds]
+            else:
+                entry[0] += count
+                entry[1] += nanoseconds
+        self.last = self.current
+        self.current = {}
+        self.frames += 1
+
+    def frameCalls( self ):
+        """Total number of calls in the last finished frame"""
+        return sum( count for count, _ in self.last.values() )
+
+    def top( self, n=10, key='time', scope='frames' ):
+        """The ``n`` heaviest entry points as (name, calls, seconds) tuples
+
+        key -- 'time' or 'count', what to sort by
+        scope -- 'frames' for the mean per finished frame, 'last' for
+            the last finished frame, 'total' for the sums over every
+            finished frame, 'current' for the frame in progress
+        """
+        if scope == 'last':
+            table, divisor = self.last, 1
+        elif scope == 'current':
+            table, divisor = self.current, 1
+        elif scope in ('frames', 'total'):
+            table = self.totals
+            divisor = max( self.frames, 1 ) if scope == 'frames' else 1
+        else:
+            raise ValueError( """Unknown scope %r"""%( scope, ))
+        rows = [
+            (name, count / float( divisor ) if divisor != 1 else count, nanoseconds / 1e9 / divisor)
+            for name, (count, nanoseconds) in table.items()
+        ]
+        index = {'time': 2, 'count': 1}[key]
+        rows.sort( key=lambda row: row[index], reverse=True )
+        return rows[:n]
+
+    def report( self, n=10, key='time', scope='frames' ):
+        """Text table of top( n, key, scope )"""
+        rows = self.top( n, key, scope )
+        label = {
+            'frames': 'mean of %d frames'%( self.frames, ),
+            'last': 'last frame',
+            'total': 'total of %d frames'%( self.frames, ),
+            'current': 'current frame',
+        }[scope]
+        lines = [ '%-32s %10s %10s %8s'%( 'GL calls (%s)'%( label, ), 'calls', 'ms', 'us/call' ) ]
+        for name, count, seconds in rows:
+            lines.append( '%-32s %10.1f %10.3f %8.2f'%(
+                name, count, seconds * 1e3, seconds * 1e6 / count if count else 0.0,
+            ))
+        return '\n'.join( lines )
+
+stats = CallStats()
+
+def enabled( ):
+    """Whether entry points are being counted"""
+    return bool( _configflags.CALL_ACCOUNTING )
+
+class _CountedFunction( object ):
+    """Proxy that counts and times calls of a base function
+
+    Attribute access goes to the base function, as for the logging
+    proxies in OpenGL.logs, so errcheck and the like can still be set.
+    """
+    def __init__( self, base, name, stats ):
+        self.__dict__[''] = base
+        self.__dict__['_name'] = name
+        self.__dict__['_stats'] = stats
+        self.__dict__['_endsFrame'] = name in FRAME_FUNCTIONS
+    def __setattr__( self, key, value ):
+        if key != '':
+            setattr( self.__dict__[''], key, value )
+        else:
+            self.__dict__[''] = value
+    def __getattr__( self, key ):
+        if key == '':
+            return self.__dict__['']
+        else:
+            return getattr( self.__dict__[''], key )
+    def __call__( self, *args, **named ):
+        function = self.__dict__['']
+        stats = self._stats
+        if stats.wrapping == self._name:
+            # Counted by the Wrapper around us
+            return function( *args, **named )
+        start = _now()
+        try:
+            return function( *args, **named )
+        finally:
+            stats.record( self._name, _now() - start )
+            if self._endsFrame:
+                stats.endFrame()
+
+def countCalls( function, name=None ):
+    """Produce a counted version of base function if CALL_ACCOUNTING is set"""
+    if not _configflags.CALL_ACCOUNTING:
+        return function
+    name = name or function.__name__
+    if name in NOT_COUNTED:
+        return function
+    return _CountedFunction( function, name, stats )
+
+def countWrapperCalls( callFunction, name ):
+    """Produce a counted version of a Wrapper's finalised call if CALL_ACCOUNTING is set"""
+    if not _configflags.CALL_ACCOUNTING or not name or name in NOT_COUNTED:
+        return callFunction
+    def countedCall( *args, **named ):
+        previous = stats.wrapping
+        stats.wrapping = name
+        start = _now()
+        try:
+            return callFunction( *args, **named )
+        finally:
+            stats.wrapping = previous
+            stats.record( name, _now() - start )
+            if name in FRAME_FUNCTIONS:
+                stats.endFrame()
+    return countedCall
+
+def endFrame( ):
+    """End the current frame (for code that does not swap with glutSwapBuffers)"""
+    stats.endFrame()
+
+def top( n=10, key='time', scope='frames' ):
+    return stats.top( n, key, scope )
+top.__doc__ = CallStats.top.__doc__
+
+def report( n=10, key='time', scope='frames' ):
+    return stats.report( n, key, scope )
+report.__doc__ = CallStats.report.__doc__
+
+def reset( ):
+    stats.reset()
@@ -6,7 +6,13 @@ such as TypeError or ValueError when appropriate.
 ErrorChecker is an _ErrorChecker instance that allows you
 to register a new error-checking function for use 
 throughout the system.
+
+deferErrors() switches GL error checking to a deferred mode that
+only calls glGetError at sync points (see DeferredErrors);
+useDebugOutput() replaces glGetError polling with a KHR_debug message
+callback where the context has one (see DebugOutput).
 """
+import collections
 import logging
 _log = logging.getLogger( 'OpenGL.error' )
 from OpenGL import platform, _configflags
@@ -14,6 +20,9 @@ from ctypes import ArgumentError
 __all__ = (
     "Error",'GLError','GLUError','GLUTError',
     'GLerror','GLUerror','GLUTerror','ArgumentError',
+    'DeferredGLError','DeferredErrors',
+    'deferErrors','checkEveryCall','flushErrors',
+    'DebugOutput','useDebugOutput','stopDebugOutput',
 )
 
 class Error( Exception ):
@@ -152,6 +161,23 @@ class GLError( Error ):
         else:
             return '%s = %r'%( property, value )
 
+class DeferredGLError( GLError ):
+    """GLError found at a sync point of deferred error checking
+
+    Attributes (besides GLError's):
+
+        errors -- every error code glGetError returned at the sync point
+        calls -- the last checked calls up to the sync point, oldest
+            first, as "name( arguments )" strings; any one of them may
+            have caused the error
+        complete -- False if earlier calls since the previous sync
+            point fell out of the window
+    """
+    DISPLAY_ORDER = GLError.DISPLAY_ORDER + ( 'errors', 'complete', 'calls', )
+    errors = calls = complete = None
+    def format_calls( self, property, value ):
+        return '%s = [\n\t\t%s\n\t]'%( property, '\n\t\t'.join( value ))
+
 class GLUError( Error ):
     """GLU error implementation class"""
 
@@ -178,6 +204,7 @@ if _configflags.ERROR_CHECKING:
                 _currentChecker -- currently active checking function
             """
             _getErrors = None
+            _deferred = None
             def __init__( self, platform, baseOperation=None, noErrorResult=0, errorClass=GLError ):
                 """Initialize from a platform module/reference"""
                 self._isValid = platform.CurrentContextIsValid
@@ -225,6 +252,13 @@ if _configflags.ERROR_CHECKING:
                     sequence.  If you are calling glBegin/glEnd in C you 
                     should call onBegin and onEnd appropriately.
                 """
+                deferred = self._deferred
+                if deferred is not None:
+                    # DeferredErrors.record, inlined: this runs for every call
+                    deferred.append( (baseOperation, cArguments) )
+                    if baseOperation.__name__ in deferred.syncPoints:
+                        deferred.flush()
+                    return result
                 err = self._currentChecker()
                 if err != self._noErrorResult:
                     raise self._errorClass(
@@ -242,6 +276,343 @@ if _configflags.ERROR_CHECKING:
                 self._currentChecker = self._registeredChecker
 else:
     _ErrorChecker = None
+
+#: Calls after which deferred error checking calls glGetError
+SYNC_POINTS = ( 'glutSwapBuffers', 'glEnd', 'glFinish' )
+#: Functions without an error checker of their own that can still be
+#: sync points (see syncPointCheck)
+SYNC_POINT_FUNCTIONS = ( 'glutSwapBuffers', )
+#: Calls remembered for an error report
+DEFERRED_WINDOW = 32
+
+class DeferredErrors( object ):
+    """Frame-scoped error checking: remember calls, check glGetError later
+
+    In place of a glGetError after every call, each checked call is
+    appended to a ring of the last ``size`` calls (the arguments are
+    only formatted if an error turns up).  After a call named in
+    ``syncPoints``, or on flush(), glGetError is called until it reports
+    no error; the errors found are raised as one DeferredGLError (or
+    logged, if not ``raiseErrors``) listing the calls since the previous
+    sync point.
+
+    Entry points that skip error checking altogether (FAST_SCALAR_CALLS)
+    are not recorded, but errors they cause are still found.
+    """
+    MAX_ERRORS = 16  # glGetError calls per flush, in case it never clears
+    def __init__( self, checker, size=DEFERRED_WINDOW, syncPoints=SYNC_POINTS, raiseErrors=True ):
+        self.checker = checker
+        self.calls = collections.deque( maxlen=size )
+        self.append = self.calls.append
+        self.syncPoints = frozenset( syncPoints )
+        self.raiseErrors = raiseErrors
+    def record( self, result, baseOperation=None, cArguments=None ):
+        """errcheck-compatible: remember the call, flush after a sync point"""
+        self.append( (baseOperation, cArguments) )
+        if getattr( baseOperation, '__name__', None ) in self.syncPoints:
+            self.flush()
+        return result
+    def flush( self ):
+        """Check glGetError now; returns the error codes found (raises by default)
+
+        Does nothing between glBegin and glEnd, where glGetError is
+        itself an error.
+        """
+        checker = self.checker
+        if checker._currentChecker == checker.nullGetError:
+            return []
+        errors = []
+        noError = checker._noErrorResult
+        getErrors = checker._registeredChecker
+        for i in range( self.MAX_ERRORS ):
+            err = getErrors()
+            if err is None or err == noError:
+                break
+            errors.append( err )
+        calls, complete = list( self.calls ), len( self.calls ) < self.calls.maxlen
+        self.calls.clear()
+        if errors:
+            self.report( errors, calls, complete )
+        return errors
+    def describe( self, call ):
+        """Short "name( arguments )" summary of a recorded call"""
+        baseOperation, cArguments = call
+        name = getattr( baseOperation, '__name__', None ) or repr( baseOperation )
+        arguments = []
+        for argument in cArguments or ():
+            text = repr( argument )
+            arguments.append( text if len( text ) <= 24 else text[:21] + '...' )
+        return '%s( %s )'%( name, ', '.join( arguments ))
+    def report( self, errors, calls, complete ):
+        err = DeferredGLError(
+            errors[0],
+            baseOperation = calls[-1][0] if calls else None,
+            cArguments = calls[-1][1] if calls else None,
+        )
+        err.errors = errors
+        err.calls = [ self.describe( call ) for call in calls ]
+        err.complete = complete
+        if self.raiseErrors:
+            raise err
+        _log.warning( """GL error at sync point: %s""", err )
+
+_deferred = None
+
+def deferErrors( size=DEFERRED_WINDOW, syncPoints=SYNC_POINTS, raiseErrors=True ):
+    """Switch GL and GLU calls to deferred error checking, returning the DeferredErrors
+
+    size -- number of recent calls kept for error reports
+    syncPoints -- names of the calls after which glGetError is called
+    raiseErrors -- raise DeferredGLError if True, else log a warning
+
+    Needs ERROR_CHECKING; returns None without it.
+    """
+    global _deferred
+    if _ErrorChecker is None:
+        return None
+    from OpenGL.raw.GL import _errors as glErrors
+    from OpenGL.raw.GLU import _errors as gluErrors
+    checkEveryCall()
+    _deferred = DeferredErrors( glErrors._error_checker, size, syncPoints, raiseErrors )
+    for checker in ( glErrors._error_checker, gluErrors._error_checker ):
+        checker._deferred = _deferred
+    return _deferred
+
+def checkEveryCall( ):
+    """Leave deferred mode (after a final flush): glGetError after every call again"""
+    global _deferred
+    if _deferred is None:
+        return
+    deferred, _deferred = _deferred, None
+    from OpenGL.raw.GL import _errors as glErrors
+    from OpenGL.raw.GLU import _errors as gluErrors
+    for checker in ( glErrors._error_checker, gluErrors._error_checker ):
+        checker._deferred = None
+    deferred.flush()
+
+def flushErrors( ):
+    """Check for errors now in deferred mode (a sync point on demand)
+
+    Returns the error codes found ([] if none, or when not deferring).
+    """
+    if _deferred is None:
+        return []
+    return _deferred.flush()
+
+def syncPointCheck( result, baseOperation=None, cArguments=None, *args ):
+    """errcheck for SYNC_POINT_FUNCTIONS: a sync point while deferring, else nothing"""
+    if _deferred is not None:
+        return _deferred.record( result, baseOperation, cArguments )
+    return result
+
+#: Minimum severity name: severities delivered, most severe first
+DEBUG_SEVERITIES = ( 'high', 'medium', 'low', 'notification' )
+#: Python logging level for each debug message severity
+DEBUG_LOG_LEVELS = {
+    'high': logging.ERROR,
+    'medium': logging.WARNING,
+    'low': logging.INFO,
+    'notification': logging.DEBUG,
+}
+
+class DebugOutput( object ):
+    """Error reporting through a debug message callback (GL 4.3, KHR_debug or ARB_debug_output)
+
+    install() registers a glDebugMessageCallback and disables the
+    driver's messages below ``severity`` ('high', 'medium', 'low' or
+    'notification').  Messages are logged to OpenGL.error.debug at a
+    level matching their severity.  GL errors (GL_DEBUG_TYPE_ERROR)
+    are raised instead if ``raiseErrors``: the callback marks the error,
+    and the checked call it happened in raises a GLError carrying the
+    driver's message as its description (with ``synchronous`` output
+    the callback runs inside the offending call, so that is the call
+    that raises).
+
+    While installed the GL and GLU error checkers stop polling
+    glGetError after every call; they only read it once the callback
+    has reported an error.  Entry points that skip error checking
+    (FAST_SCALAR_CALLS) still produce messages, but an error they
+    cause is raised by the next checked call.
+    """
+    log = logging.getLogger( 'OpenGL.error.debug' )
+    def __init__( self, checkers, severity='low', raiseErrors=True, synchronous=True ):
+        if severity not in DEBUG_SEVERITIES:
+            raise ValueError( """Unknown severity %r, expected one of %s"""%( severity, DEBUG_SEVERITIES ))
+        self.checkers = checkers
+        self.severity = severity
+        self.raiseErrors = raiseErrors
+        self.synchronous = synchronous
+        self.pending = None  # Message of an error not yet raised
+        self.installed = False
+        self._saved = []
+        self._enabled = []  # (capability, enabled before install)
+        self._callback = None
+    @staticmethod
+    def entryPoints( ):
+        """(callback setter, message control, uses GL_DEBUG_OUTPUT) for this context, or None"""
+        from OpenGL.GL.KHR import debug
+        from OpenGL.GL.ARB import debug_output
+        if debug.glDebugMessageCallback:
+            return debug.glDebugMessageCallback, debug.glDebugMessageControl, True
+        if debug_output.glDebugMessageCallbackARB:
+            return debug_output.glDebugMessageCallbackARB, debug_output.glDebugMessageControlARB, False
+        return None
+    def install( self ):
+        """Register the callback; returns False (changing nothing) if the context has none"""
+        if self.installed:
+            return True
+        entryPoints = self.entryPoints()
+        if entryPoints is None:
+            return False
+        from OpenGL.raw.GL import _types
+        from OpenGL.raw.GL.KHR import debug
+        from OpenGL.raw.GL.VERSION.GL_1_0 import glEnable, glDisable, glIsEnabled, GL_DONT_CARE
+        setCallback, control, hasEnable = entryPoints
+        capabilities = [ debug.GL_DEBUG_OUTPUT_SYNCHRONOUS ]
+        if hasEnable:
+            capabilities.append( debug.GL_DEBUG_OUTPUT )
+        self._enabled = [
+            (capability, bool( glIsEnabled( capability )))
+            for capability in capabilities
+        ]
+        self.names = {}
+        for prefix in ('GL_DEBUG_SOURCE_','GL_DEBUG_TYPE_','GL_DEBUG_SEVERITY_'):
+            self.names[prefix] = dict(
+                (int( getattr( debug, name )), name[len( prefix ):].lower())
+                for name in dir( debug )
+                if name.startswith( prefix ) and not name.endswith( '_KHR' )
+            )
+        self.errorType = int( debug.GL_DEBUG_TYPE_ERROR )
+        cutoff = DEBUG_SEVERITIES.index( self.severity )
+        for index, name in enumerate( DEBUG_SEVERITIES ):
+            constant = getattr( debug, 'GL_DEBUG_SEVERITY_%s'%( name.upper(), ))
+            control( GL_DONT_CARE, GL_DONT_CARE, constant, 0, None, index <= cutoff )
+        self._callback = _types.GLDEBUGPROC( self.callback )
+        setCallback( self._callback, None )
+        if hasEnable:
+            glEnable( debug.GL_DEBUG_OUTPUT )
+        if self.synchronous:
+            glEnable( debug.GL_DEBUG_OUTPUT_SYNCHRONOUS )
+        else:
+            glDisable( debug.GL_DEBUG_OUTPUT_SYNCHRONOUS )
+        self._setCallback = setCallback
+        for checker in self.checkers:
+            self._saved.append( (checker, checker._registeredChecker, checker._errorClass) )
+            inBegin = checker._currentChecker == checker.nullGetError
+            checker._registeredChecker = self.makeChecker( checker )
+            if not inBegin:
+                checker._currentChecker = checker._registeredChecker
+            checker._errorClass = self.makeError
+        self.installed = True
+        return True
+    def uninstall( self ):
+        """Unregister the callback and go back to polling glGetError
+
+        GL_DEBUG_OUTPUT and GL_DEBUG_OUTPUT_SYNCHRONOUS go back to what
+        they were before install(), and the errors queued meanwhile are
+        read and dropped: the callback already reported each of them,
+        and without raiseErrors nothing called glGetError since.
+        """
+        if not self.installed:
+            return
+        from OpenGL.raw.GL import _types
+        from OpenGL.raw.GL.VERSION.GL_1_0 import glEnable, glDisable
+        self._setCallback( _types.GLDEBUGPROC(), None )
+        self.pending = None
+        while self._enabled:
+            capability, enabled = self._enabled.pop()
+            if enabled:
+                glEnable( capability )
+            else:
+                glDisable( capability )
+        for checker, registered, errorClass in self._saved:
+            if checker._currentChecker != checker.nullGetError:
+                # Not inside glBegin/glEnd, where glGetError is itself an error
+                self.drainErrors( checker, registered )
+                break
+        while self._saved:
+            checker, registered, errorClass = self._saved.pop()
+            inBegin = checker._currentChecker == checker.nullGetError
+            checker._registeredChecker = registered
+            if not inBegin:
+                checker._currentChecker = registered
+            checker._errorClass = errorClass
+        self.installed = False
+    @staticmethod
+    def drainErrors( checker, getErrors ):
+        """Read errors with getErrors until ``checker`` sees none (at most MAX_ERRORS)"""
+        for i in range( DeferredErrors.MAX_ERRORS ):
+            if getErrors() in (None, checker._noErrorResult):
+                break
+    def callback( self, source, type, id, severity, length, message, userParam ):
+        """The GLDEBUGPROC; must never raise into the driver"""
+        try:
+            text = ( message[:length] if length >= 0 else message ).decode( 'utf-8', 'replace' )
+            if type == self.errorType and self.raiseErrors:
+                self.pending = text
+                return
+            severityName = self.names['GL_DEBUG_SEVERITY_'].get( severity, 'notification' )
+            self.log.log(
+                DEBUG_LOG_LEVELS.get( severityName, logging.DEBUG ),
+                """%s %s %s (%s): %s""",
+                self.names['GL_DEBUG_SOURCE_'].get( source, hex( source )),
+                self.names['GL_DEBUG_TYPE_'].get( type, hex( type )),
+                id, severityName, text,
+            )
+        except Exception as err:
+            self.log.error( """Debug message callback failed: %s""", err )
+    def makeChecker( self, checker ):
+        """Error "getter" for ``checker`` that only calls glGetError after a reported error"""
+        getErrors = checker._getErrors
+        noError = checker._noErrorResult
+        def pendingError( ):
+            if self.pending is None:
+                return noError
+            err = getErrors()
+            if err == noError:
+                # Reported, but already cleared (or not a glGetError error)
+                self.pending = None
+            return err
+        return pendingError
+    def makeError( self, err, result, cArguments=None, baseOperation=None ):
+        """The errorClass for checkers: a GLError described by the driver's message"""
+        description, self.pending = self.pending, None
+        return GLError(
+            err, result, cArguments=cArguments, baseOperation=baseOperation,
+            description=description,
+        )
+
+_debugOutput = None
+
+def useDebugOutput( severity='low', raiseErrors=True, synchronous=True ):
+    """Report GL errors and messages through a debug message callback if the context has one
+
+    Returns the installed DebugOutput, or None when the context has no
+    debug output (or ERROR_CHECKING is off), in which case errors are
+    checked with glGetError as before.  Needs a current context.
+    """
+    global _debugOutput
+    if _ErrorChecker is None:
+        return None
+    from OpenGL.raw.GL import _errors as glErrors
+    from OpenGL.raw.GLU import _errors as gluErrors
+    stopDebugOutput()
+    output = DebugOutput(
+        ( glErrors._error_checker, gluErrors._error_checker ),
+        severity, raiseErrors, synchronous,
+    )
+    if not output.install():
+        return None
+    _debugOutput = output
+    return output
+
+def stopDebugOutput( ):
+    """Uninstall the useDebugOutput() callback, polling glGetError again"""
+    global _debugOutput
+    if _debugOutput is not None:
+        output, _debugOutput = _debugOutput, None
+        output.uninstall()
+
 # Compatibility with PyOpenGL 2.x series
 GLUerror = GLUError
 GLerror = GLError 
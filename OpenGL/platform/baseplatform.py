@@ -2,10 +2,11 @@
 """
 import ctypes
 from OpenGL.platform import ctypesloader
+from OpenGL.platform import entrycache
 from OpenGL._bytes import as_8_bit
-import sys, logging
+import sys, logging, re
 from OpenGL import _configflags
-from OpenGL import logs, MODULE_ANNOTATIONS
+from OpenGL import logs, accounting, MODULE_ANNOTATIONS
 log = logging.getLogger(__name__)
 
 class lazy_property( object ):
@@ -73,6 +74,10 @@ class BasePlatform( object ):
         EXTENSIONS_USE_BASE_FUNCTIONS -- if True, uses regular
             dll attribute-based lookup to retrieve extension 
             function pointers.
+
+        UNCHECKED_SCALAR_FUNCTIONS -- regex matching the scalar-only
+            entry points that skip per-call error checking when
+            FAST_SCALAR_CALLS is set
     """
     
     EXPORTED_NAMES = [
@@ -90,6 +95,14 @@ class BasePlatform( object ):
     DEFAULT_FUNCTION_TYPE = None
     GLUT_GUARD_CALLBACKS = False
     EXTENSIONS_USE_BASE_FUNCTIONS = False
+    # Per-vertex attributes never set a GL error; transforms only set
+    # GL_INVALID_OPERATION between glBegin/glEnd, where nothing is checked anyway
+    UNCHECKED_SCALAR_FUNCTIONS = re.compile(
+        r'^gl(Vertex|Color|SecondaryColor|Normal|TexCoord|FogCoord|Index|EdgeFlag'
+        r'|Translate|Rotate|Scale)[1-4]?(b|s|i|f|d|ub|us|ui)?$'
+    )
+    # ctypes type codes of char*, wchar_t* and void*
+    POINTER_TYPE_CODES = 'zZP'
     
     def install( self, namespace ):
         """Install this platform instance into the platform module"""
@@ -105,14 +118,39 @@ class BasePlatform( object ):
         else:
             return self.DEFAULT_FUNCTION_TYPE
     
+    def isScalarFunction( self, resultType, argTypes ):
+        """Whether the result and every argument are plain ctypes scalars (no pointers)"""
+        for typ in (resultType,) + tuple( argTypes ):
+            if typ is None:
+                continue
+            if not (
+                isinstance( typ, type ) and
+                issubclass( typ, ctypes._SimpleCData ) and
+                typ._type_ not in self.POINTER_TYPE_CODES
+            ):
+                return False
+        return True
+    def skipErrorCheck( self, func ):
+        """Whether FAST_SCALAR_CALLS leaves this function without per-call error checking"""
+        return bool(
+            _configflags.FAST_SCALAR_CALLS and
+            getattr( func, 'scalarOnly', False ) and
+            self.UNCHECKED_SCALAR_FUNCTIONS.match( func.__name__ )
+        )
     def errorChecking( self, func, dll, error_checker=None ):
         """Add error checking to the function if appropriate"""
         from OpenGL import error
-        if error_checker and _configflags.ERROR_CHECKING:
+        if error_checker and _configflags.ERROR_CHECKING and not self.skipErrorCheck( func ):
             #GLUT spec says error-checking is basically undefined...
             # there *may* be GL errors on GLUT calls that e.g. render 
             # geometry, but that's all basically "maybe" stuff...
             func.errcheck = error_checker.glCheckError
+        elif (
+            not error_checker and error._ErrorChecker and
+            func.__name__ in error.SYNC_POINT_FUNCTIONS
+        ):
+            # e.g. glutSwapBuffers, so it can end a frame of deferred checking
+            func.errcheck = error.syncPointCheck
         return func
     def wrapContextCheck( self, func, dll ):
         """Wrap function with context-checking if appropriate"""
@@ -126,6 +164,9 @@ class BasePlatform( object ):
     def wrapLogging( self, func ):
         """Wrap function with logging operations if appropriate"""
         return logs.logOnFail( func, logs.getLog( 'OpenGL.errors' ))
+    def wrapAccounting( self, func ):
+        """Wrap function with call counting/timing if appropriate (CALL_ACCOUNTING)"""
+        return accounting.countCalls( func )
     
     def finalArgType( self, typ ):
         """Retrieve a final type for arg-type"""
@@ -152,7 +193,19 @@ class BasePlatform( object ):
         is_core = (not extension) or extension.split('_')[1] == 'VERSION'
         if (not is_core) and not self.checkExtension( extension ):
             raise AttributeError( """Extension not available""" )
-        argTypes = [ self.finalArgType( t ) for t in argTypes ]
+        cache = entrycache.forLibrary( dll )
+        record = cache.get( functionName ) if cache is not None else None
+        if record is None or not record['present']:
+            declared = argTypes
+            argTypes = [ self.finalArgType( t ) for t in argTypes ]
+            scalarOnly = self.isScalarFunction( resultType, argTypes )
+        else:
+            argTypes = list( argTypes )
+            if record['arrays']:
+                from OpenGL.arrays import ArrayDatatype
+                for index in record['arrays']:
+                    argTypes[index] = ArrayDatatype
+            scalarOnly = record['scalar']
             
         if force_extension or ((not is_core) and (not self.EXTENSIONS_USE_BASE_FUNCTIONS)):
             # what about the VERSION values???
@@ -166,25 +219,42 @@ class BasePlatform( object ):
                 )
             else:
                 raise AttributeError( """Extension %r available, but no pointer for function %r"""%(extension,functionName))
+        elif record is not None and not record['present']:
+            # A cached miss only covers the library's own exports
+            raise AttributeError( """No %r in %s (cached)"""%( functionName, cache.path ))
         else:
-            func = ctypesloader.buildFunction(
-                self.functionTypeFor( dll )(
-                    resultType,
-                    *argTypes
-                ),
-                functionName,
-                dll,
-            )
+            try:
+                func = ctypesloader.buildFunction(
+                    self.functionTypeFor( dll )(
+                        resultType,
+                        *argTypes
+                    ),
+                    functionName,
+                    dll,
+                )
+            except AttributeError:
+                if cache is not None:
+                    cache.set( functionName, {'present': False} )
+                raise
+        if cache is not None and record is None:
+            cache.set( functionName, {
+                'present': True,
+                'arrays': [ i for i,(t,final) in enumerate( zip( declared, argTypes )) if final is not t ],
+                'scalar': scalarOnly,
+            })
         func.__doc__ = doc 
         func.argNames = list(argNames or ())
         func.__name__ = functionName
         func.DLL = dll
         func.extension = extension
         func.deprecated = deprecated
-        func = self.wrapLogging( 
-            self.wrapContextCheck(
-                self.errorChecking( func, dll, error_checker=error_checker ),
-                dll,
+        func.scalarOnly = scalarOnly
+        func = self.wrapAccounting(
+            self.wrapLogging( 
+                self.wrapContextCheck(
+                    self.errorChecking( func, dll, error_checker=error_checker ),
+                    dll,
+                )
             )
         )
         if MODULE_ANNOTATIONS:
@@ -322,24 +392,28 @@ class BasePlatform( object ):
         error_checker = None,
         force_extension = False,
     ):
-        """Construct a "null" function pointer"""
+        """Construct a "null" function pointer
+
+        The pointer only gets a class of its own (named after the function,
+        which load() patches with the real call) when it is first loaded,
+        so the thousands of entry points an application never touches
+        cost a plain instance each.
+        """
         if deprecated:
             base = _DeprecatedFunctionPointer
         else:
             base = _NullFunctionPointer
-        cls = type( functionName, (base,), {
-            '__doc__': doc,
-            'deprecated': deprecated,
-        } )
+        pointer = base(
+            functionName, dll, resultType, argTypes, argNames, extension=extension, doc=doc,
+            deprecated = deprecated,
+            error_checker = error_checker, force_extension=force_extension,
+        )
         if MODULE_ANNOTATIONS:
             if not module:
                 module = _find_module( )
             if module:
-                cls.__module__ = module
-        return cls(
-            functionName, dll, resultType, argTypes, argNames, extension=extension, doc=doc,
-            error_checker = error_checker, force_extension=force_extension,
-        )
+                pointer.__module__ = module
+        return pointer
     def GetCurrentContext( self ):
         """Retrieve opaque pointer for the current context"""
         raise NotImplementedError( 
@@ -376,7 +450,19 @@ class _NullFunctionPointer( object ):
         self.deprecated = deprecated
         self.error_checker = error_checker
         self.force_extension = force_extension
+        self.__doc__ = doc
     resolved = False
+    def _ownClass( self ):
+        """Move this pointer to a class of its own, named after the function"""
+        cls = self.__class__
+        if cls in (_NullFunctionPointer, _DeprecatedFunctionPointer):
+            cls = type( self.__name__, (cls,), {
+                '__doc__': self.doc,
+                '__module__': self.__dict__.get( '__module__', cls.__module__ ),
+                'deprecated': self.deprecated,
+            } )
+            self.__class__ = cls
+        return cls
     def __nonzero__( self ):
         """Make this object appear to be NULL"""
         if (not self.resolved) and (self.extension or self.force_extension):
@@ -406,7 +492,12 @@ class _NullFunctionPointer( object ):
             return None 
         else:
             # now short-circuit so that we don't need to check again...
-            self.__class__.__call__ = staticmethod( func.__call__ )
+            cls = self._ownClass()
+            if _configflags.FAST_SCALAR_CALLS and getattr( func, 'scalarOnly', False ):
+                # the function itself, without the bound-__call__ hop
+                cls.__call__ = staticmethod( func )
+            else:
+                cls.__call__ = staticmethod( func.__call__ )
             self.resolved = True
             return func
         return None
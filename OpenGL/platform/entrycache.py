@@ -0,0 +1,170 @@
+"""On-disk cache of per-entry-point metadata (ENTRY_POINT_CACHE)
+
+BasePlatform.constructFunction works out the same things about an entry
+point in every process: whether the library exports the symbol at all,
+which void * arguments become ArrayDatatype arguments, and whether the
+function is scalar-only (see BasePlatform.isScalarFunction).  With
+OpenGL.ENTRY_POINT_CACHE set (or PYOPENGL_ENTRY_POINT_CACHE=1) the
+answers are kept in a small JSON file per library and read back by later
+processes, which then raise at once for symbols known to be missing and
+skip the argument introspection for the rest.
+
+A cache file is keyed by the library's resolved path, its modification
+time and the PyOpenGL version, so a driver or PyOpenGL upgrade starts a
+new one.  Files live under userCacheDir() (PYOPENGL_CACHE_DIR overrides
+it) and are written at exit, merged with what other processes wrote in
+the meantime.  Nothing context-dependent is stored: extension checks and
+extension procedure lookups still happen in every process, as do the
+ctypes function objects themselves, whose addresses change from run to
+run.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sys
+from OpenGL import _configflags
+from OpenGL.version import __version__
+_log = logging.getLogger( 'OpenGL.platform.entrycache' )
+
+__all__ = (
+    'LibraryCache',
+    'userCacheDir',
+    'libraryPath',
+    'forLibrary',
+    'saveAll',
+)
+
+def userCacheDir( ):
+    """Directory for PyOpenGL's cache files, PYOPENGL_CACHE_DIR if set"""
+    directory = os.environ.get( 'PYOPENGL_CACHE_DIR' )
+    if directory:
+        return directory
+    if sys.platform in ('win32','cygwin'):
+        base = os.environ.get( 'LOCALAPPDATA' ) or os.path.expanduser( '~/AppData/Local' )
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser( '~/Library/Caches' )
+    else:
+        base = os.environ.get( 'XDG_CACHE_HOME' ) or os.path.expanduser( '~/.cache' )
+    return os.path.join( base, 'PyOpenGL' )
+
+def libraryPath( dll ):
+    """Resolved path of the file a ctypes library was loaded from, or None
+
+    Libraries loaded by bare name (libGL.so.1) are looked up in
+    /proc/self/maps where that exists, as that file or one with a longer
+    version suffix (libGL.so.1.7.0, but never libGLU.so.1).
+    """
+    name = getattr( dll, '_name', None )
+    if not name:
+        return None
+    if os.path.isabs( name ):
+        return os.path.realpath( name ) if os.path.exists( name ) else None
+    try:
+        with open( '/proc/self/maps' ) as maps:
+            for line in maps:
+                fields = line.split( None, 5 )
+                if len( fields ) == 6:
+                    path = fields[5].strip()
+                    basename = os.path.basename( path )
+                    if basename == name or basename.startswith( name + '.' ):
+                        return os.path.realpath( path )
+    except (IOError,OSError):
+        pass
+    return None
+
+class LibraryCache( object ):
+    """Metadata for the entry points of one library
+
+    functions -- {name: record}, a record being {'present': False} for
+        a symbol the library does not export, otherwise
+        {'present': True, 'arrays': [index, ...], 'scalar': bool}
+    hits, misses -- lookups answered from / not found in the cache
+    """
+    def __init__( self, path, directory=None ):
+        self.path = path
+        self.key = {
+            'library': path,
+            'mtime': os.stat( path ).st_mtime_ns,
+            'version': __version__,
+        }
+        digest = hashlib.sha1(
+            json.dumps( self.key, sort_keys=True ).encode( 'utf-8' )
+        ).hexdigest()[:16]
+        self.filename = os.path.join(
+            directory or userCacheDir(),
+            'entrypoints-%s-%s.json'%( os.path.basename( path ), digest ),
+        )
+        self.functions = self.read()
+        self.dirty = False
+        self.hits = self.misses = 0
+    def read( self ):
+        """The records stored for our key, {} if there are none (or the file is unusable)"""
+        try:
+            with open( self.filename ) as stream:
+                data = json.load( stream )
+        except (IOError,OSError,ValueError):
+            return {}
+        if not isinstance( data, dict ) or data.get( 'key' ) != self.key:
+            return {}
+        return data.get( 'functions' ) or {}
+    def get( self, name ):
+        """Record for name, or None"""
+        record = self.functions.get( name )
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+    def set( self, name, record ):
+        if self.functions.get( name ) != record:
+            self.functions[name] = record
+            self.dirty = True
+    def save( self ):
+        """Write the records (merged with the file's current ones) if anything changed"""
+        if not self.dirty:
+            return
+        functions = self.read()
+        functions.update( self.functions )
+        temporary = '%s.%d.tmp'%( self.filename, os.getpid() )
+        try:
+            os.makedirs( os.path.dirname( self.filename ), exist_ok=True )
+            with open( temporary, 'w' ) as stream:
+                json.dump( {'key': self.key, 'functions': functions}, stream, sort_keys=True )
+            os.replace( temporary, self.filename )
+        except (IOError,OSError) as err:
+            _log.warning( 'Unable to write entry point cache %s: %s', self.filename, err )
+            return
+        self.functions = functions
+        self.dirty = False
+
+_caches = {}
+
+def forLibrary( dll ):
+    """LibraryCache for a ctypes library, None if caching is off or the library has no file"""
+    if not _configflags.ENTRY_POINT_CACHE:
+        return None
+    key = id( dll )
+    try:
+        return _caches[key][1]
+    except KeyError:
+        pass
+    cache = None
+    path = libraryPath( dll )
+    if path:
+        try:
+            cache = LibraryCache( path )
+        except (IOError,OSError) as err:
+            _log.info( 'No entry point cache for %s: %s', path, err )
+    if not _caches:
+        atexit.register( saveAll )
+    # Keep dll alive so its id is not reused
+    _caches[key] = (dll, cache)
+    return cache
+
+def saveAll( ):
+    """Write every cache with new records (done at exit)"""
+    for _, cache in _caches.values():
+        if cache is not None:
+            cache.save()
@@ -1,8 +1,8 @@
 """The wrapping code for providing natural ctypes-based OpenGL interface"""
 import ctypes, logging
-from OpenGL import platform, error
+from OpenGL import platform, error, accounting
 assert platform
-from OpenGL._configflags import STORE_POINTERS, ERROR_ON_COPY, SIZE_1_ARRAY_UNPACK
+from OpenGL._configflags import STORE_POINTERS, ERROR_ON_COPY, SIZE_1_ARRAY_UNPACK, FAST_SCALAR_CALLS
 from OpenGL import converters
 from OpenGL.converters import DefaultCConverter
 from OpenGL.converters import returnCArgument,returnPyArgument
@@ -371,6 +371,12 @@ class Wrapper( LateBind ):
     
     def finalise( self ):
         """Finalise our various elements into simple index-based operations"""
+        if self.__class__ is Wrapper:
+            # see wrapper(), the named class is only made for wrappers in use
+            super( Wrapper, self ).__setattr__( '__class__', type( self.wrappedOperation.__name__, (Wrapper,), {
+                '__doc__': self.__dict__.get( '__doc__' ),
+                '__module__': self.__dict__.get( '__module__', Wrapper.__module__ ),
+            } ))
         for attribute in ('pyConverters','cConverters','cResolvers' ):
             value = getattr( self, attribute, None )
             if value is not None:
@@ -396,6 +402,9 @@ class Wrapper( LateBind ):
         if not callFunction:
             raise RuntimeError( """Missing finalised call type for %s"""%( self, ))
         else:
+            callFunction = accounting.countWrapperCalls(
+                callFunction, getattr( self.wrappedOperation, '__name__', None ),
+            )
             #self.__class__.finalize = lambda *args: callFunction
             #self.__call__ = callFunction
             #self.__class__.__call__ = callFunction
@@ -420,6 +429,11 @@ class Wrapper( LateBind ):
         wrappedOperation = self.wrappedOperation
         storeValues = getattr( self, 'storeValues', None )
         returnValues = getattr( self, 'returnValues', None )
+        if FAST_SCALAR_CALLS and not (
+            pyConverters or cConverters or cResolvers or storeValues or returnValues
+        ):
+            # Nothing to convert, store or return: call the base function itself
+            return wrappedOperation
         if pyConverters:
             if cWrapper:
                 calculate_pyArgs = PyArgCalculator(
@@ -1502,15 +1516,17 @@ def wrapper( wrappedOperation ):
     has the __doc__ and __name__ of the wrappedOperation so that the instance of
     the wrapper will show up as <functionname instance @ address> by default,
     and will have the docstring available naturally in pydoc and the like.
+
+    Building that class for each of the thousands of wrappers in OpenGL.GL
+    is a good part of the cost of importing it, so the instance starts out
+    as a plain Wrapper carrying __doc__ and __module__ itself, and only
+    moves to its named sub-class when finalised (on its first call).
     """
     if isinstance( wrappedOperation, Wrapper ):
         return wrappedOperation
-    dict = {
-        '__doc__': wrappedOperation.__doc__,
-        '__slots__': ('wrappedOperation', ),
-    }
-    cls = type( wrappedOperation.__name__, (Wrapper,), dict )
+    instance = Wrapper(wrappedOperation)
+    # Bypass Wrapper.__setattr__, which forwards to wrappedOperation
+    instance.__dict__['__doc__'] = wrappedOperation.__doc__
     if hasattr( wrappedOperation, '__module__' ):
-        cls.__module__ = wrappedOperation.__module__
-    instance = cls(wrappedOperation)
+        instance.__dict__['__module__'] = wrappedOperation.__module__
     return instance
@@ -0,0 +1,396 @@
+"""Monte Carlo balancing runs for Fire Fighter 3D
+
+Plays many seeded headless games for every combination of parameter
+values, spread over a process pool, and writes per-parameter-set
+distributions of score, houses saved, lives lost and performance rating
+as CSV.
+
+    python balance.py --games 2000 --set FIRE_POP_INTERVAL=4,6,8 \\
+        --set fire_rate=0.5,1.0 --output balance.csv
+
+Parameters given with --set are either simulation constants (UPPER_CASE,
+e.g. FIRE_SPREAD_PROBABILITY, SCORE_PER_HOUSE; see RUNTIME_PARAMETERS and
+SIMULATION_OPTIONS) or keys of the game's DIFFICULTY_LEVELS entry
+(lower_case, e.g. fire_rate, time_limit).  Every parameter set is played
+at each requested difficulty.
+"""
+import argparse
+import csv
+import itertools
+import math
+import multiprocessing
+import sys
+import time
+
+import numpy as np
+
+import simulation
+
+POLICIES = ('scripted', 'random', 'idle')
+ACTION_INTERVAL = 0.1  # Game seconds between policy decisions (key repeat rate)
+
+#: Columns of a per-game result row, in order
+RESULT_FIELDS = (
+    'set_index', 'seed', 'score', 'houses_saved', 'houses_destroyed',
+    'lives_lost', 'performance_rating', 'game_time',
+)
+#: Per-game metrics summarised for each parameter set
+SUMMARY_METRICS = ('score', 'houses_saved', 'lives_lost', 'performance_rating', 'game_time')
+SUMMARY_STATISTICS = ('mean', 'std', 'min', 'p5', 'p50', 'p95', 'max')
+#: simulation constants read whenever they are used, so they can be swapped per
+#: game.  Others are fixed at import (Simulation defaults, or derived from other
+#: constants, e.g. CLEAR_DISTANCE does not follow COLLISION_DISTANCE) and
+#: would silently change nothing.
+RUNTIME_PARAMETERS = frozenset((
+    'NUM_HOUSES', 'MAX_HEALTH', 'FIRE_DAMAGE', 'WATER_HEAL', 'SPRAY_DISTANCE',
+    'TRUCK_SPEED', 'WORLD_SIZE', 'WATER_CAPACITY', 'WATER_USAGE_RATE',
+    'COLLISION_DISTANCE', 'WATER_REFILL_DISTANCE', 'CLEAR_DISTANCE',
+    'FIRE_POP_INTERVAL', 'TIME_LIMIT', 'MAX_LIVES', 'SCORE_PER_HOUSE',
+    'SCORE_PER_SECOND', 'ROAD_WIDTH', 'WATER_STATION_DISTANCE', 'WIND_SPEED',
+    'FIRE_SPREAD_RADIUS', 'FIRE_SPREAD_PROBABILITY', 'MAX_SMOKE_DENSITY',
+    'SMOKE_DISSIPATION_RATE', 'WRONG_TOOL_NOTICE_INTERVAL',
+))
+#: simulation constants that are Simulation() defaults, passed as keyword arguments
+SIMULATION_OPTIONS = {
+    'MAX_FIRE_PARTICLES': 'max_fire_particles',
+    'MAX_SMOKE_PARTICLES': 'max_smoke_particles',
+    'PARTICLE_EVICTION': 'particle_eviction',
+}
+
+
+def simulation_options(params):
+    """Simulation() keyword arguments for the SIMULATION_OPTIONS in ``params``"""
+    return dict(
+        (SIMULATION_OPTIONS[name], value) for name, value in params.items()
+        if name in SIMULATION_OPTIONS
+    )
+
+
+def apply_parameters(params):
+    """Install ``params`` into the simulation module, returns what they replaced
+
+    Must only be used inside a single game at a time (as in the pool
+    workers); restore the returned values with restore_parameters().
+    SIMULATION_OPTIONS are left alone here (see simulation_options());
+    any other UPPER_CASE name outside RUNTIME_PARAMETERS raises ValueError.
+    """
+    previous = {}
+    difficulty = params.get('difficulty', 'NORMAL')
+    for name, value in params.items():
+        if name == 'difficulty' or name in SIMULATION_OPTIONS:
+            continue
+        if name.isupper():
+            if name not in RUNTIME_PARAMETERS:
+                raise ValueError(
+                    "%r cannot be swept: it is %s" % (
+                        name,
+                        "read only when simulation is imported" if hasattr(simulation, name)
+                        else "not a simulation parameter",
+                    )
+                )
+            previous[name] = getattr(simulation, name)
+            setattr(simulation, name, value)
+    levels = dict(simulation.DIFFICULTY_LEVELS)
+    level = dict(levels[difficulty])
+    for name, value in params.items():
+        if name != 'difficulty' and not name.isupper():
+            if name not in level:
+                raise KeyError("difficulty levels have no setting %r" % (name,))
+            level[name] = value
+    levels[difficulty] = level
+    previous['DIFFICULTY_LEVELS'] = simulation.DIFFICULTY_LEVELS
+    simulation.DIFFICULTY_LEVELS = levels
+    return previous
+
+
+def restore_parameters(previous):
+    for name, value in previous.items():
+        setattr(simulation, name, value)
+
+
+def _nearest(truck, points):
+    """Index and distance of the point nearest the truck, or (None, inf)"""
+    if not len(points):
+        return None, float('inf')
+    offsets = np.asarray(points, dtype=np.float64)[:, (0, 2)] - (truck['position'][0], truck['position'][2])
+    distances = np.hypot(offsets[:, 0], offsets[:, 1])
+    index = int(np.argmin(distances))
+    return index, float(distances[index])
+
+
+def scripted_policy(sim, rng):
+    """Drive to the nearest fire with the right tool, refill when low on water"""
+    truck = sim.fire_truck
+    houses = sim.houses
+    burning = np.flatnonzero(houses.on_fire)
+    low_on_water = truck['water'] < simulation.WATER_CAPACITY * 0.1
+    if not len(burning) and not low_on_water:
+        if truck['spraying']:
+            sim.toggle_spray()
+        return
+    if low_on_water or not len(burning):
+        index, distance = _nearest(truck, [station['position'] for station in sim.water_stations])
+        target = sim.water_stations[index]['position']
+        close_enough = simulation.WATER_REFILL_DISTANCE * 0.5
+        spray = False
+    else:
+        index, distance = _nearest(truck, houses.position[burning])
+        house = houses[int(burning[index])]
+        required = simulation.REQUIRED_EQUIPMENT[house['fire_type']]
+        if sim.current_equipment != required:
+            sim.select_tool(required)
+        target = house['position']
+        close_enough = simulation.SPRAY_DISTANCE * 0.7
+        spray = True
+
+    heading = math.degrees(math.atan2(target[0] - truck['position'][0], target[2] - truck['position'][2]))
+    turn = (heading - truck['rotation'] + 180) % 360 - 180
+    aimed = abs(turn) < 10
+    if truck['spraying'] != (spray and aimed and distance < simulation.SPRAY_DISTANCE):
+        sim.toggle_spray()
+    if not aimed:
+        sim.turn_truck(5 if turn > 0 else -5)
+    elif distance > close_enough:
+        if not sim.drive_truck(1):
+            # Blocked: veer off to get around the obstacle
+            sim.turn_truck(rng.choice((-45, 45)))
+
+
+def random_policy(sim, rng):
+    """Mash random keys, as a baseline"""
+    action = rng.randrange(6)
+    if action == 0:
+        sim.drive_truck(1)
+    elif action == 1:
+        sim.drive_truck(-1)
+    elif action == 2:
+        sim.turn_truck(5)
+    elif action == 3:
+        sim.turn_truck(-5)
+    elif action == 4:
+        sim.toggle_spray()
+    else:
+        sim.select_tool(rng.choice(simulation.tool_keys))
+
+
+def idle_policy(sim, rng):
+    """Never touch the controls"""
+
+
+POLICY_FUNCTIONS = {
+    'scripted': scripted_policy,
+    'random': random_policy,
+    'idle': idle_policy,
+}
+
+
+def play_game(params, seed, policy='scripted', tick_rate=simulation.TICK_RATE):
+    """Play one seeded game to its end, returns the result metrics as a dict"""
+    previous = apply_parameters(params)
+    try:
+        sim = simulation.Simulation(
+            difficulty=params.get('difficulty', 'NORMAL'), verbose=False, seed=seed,
+            **simulation_options(params)
+        )
+        sim.start()
+        act = POLICY_FUNCTIONS[policy]
+        policy_rng = sim.streams.python('policy')
+        dt = 1.0 / tick_rate
+        ticks_per_action = max(1, int(round(ACTION_INTERVAL / dt)))
+        tick = 0
+        while not sim.game_over:
+            if tick % ticks_per_action == 0:
+                act(sim, policy_rng)
+            sim.step(dt)
+            tick += 1
+        return {
+            'seed': seed,
+            'score': sim.score,
+            'houses_saved': sim.houses_saved,
+            'houses_destroyed': int(np.count_nonzero(sim.houses.health <= 0)),
+            'lives_lost': simulation.MAX_LIVES - sim.lives,
+            'performance_rating': sim.calculate_performance_rating(),
+            'game_time': sim.game_time,
+        }
+    finally:
+        restore_parameters(previous)
+
+
+def play_batch(job):
+    """Pool worker: play a batch of games, returns compact result rows"""
+    set_index, params, seeds, policy, tick_rate = job
+    rows = []
+    for seed in seeds:
+        result = play_game(params, seed, policy, tick_rate)
+        result['set_index'] = set_index
+        rows.append(tuple(result[field] for field in RESULT_FIELDS))
+    return rows
+
+
+def parameter_sets(difficulties, sweeps):
+    """Cartesian product of difficulties and the value lists in ``sweeps``"""
+    names = sorted(sweeps)
+    sets = []
+    for difficulty in difficulties:
+        for values in itertools.product(*[sweeps[name] for name in names]):
+            params = {'difficulty': difficulty}
+            params.update(zip(names, values))
+            sets.append(params)
+    return sets
+
+
+def make_jobs(sets, games, batch_size, base_seed, policy, tick_rate):
+    for set_index, params in enumerate(sets):
+        seeds = [base_seed + game for game in range(games)]
+        for start in range(0, games, batch_size):
+            yield (set_index, params, seeds[start:start + batch_size], policy, tick_rate)
+
+
+def run_sweep(sets, games, policy='scripted', workers=None, batch_size=16,
+              base_seed=0, tick_rate=simulation.TICK_RATE, progress=None):
+    """Play ``games`` games for every parameter set, returns all result rows
+
+    Every parameter set uses the same seeds (``base_seed`` onwards), so the
+    sets are compared on identical maps and fire schedules.
+    """
+    jobs = make_jobs(sets, games, batch_size, base_seed, policy, tick_rate)
+    rows = []
+    total = len(sets) * games
+    if workers == 1:
+        batches = map(play_batch, jobs)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers)
+        batches = pool.imap_unordered(play_batch, jobs)
+    try:
+        for batch in batches:
+            rows.extend(batch)
+            if progress:
+                progress(len(rows), total)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return rows
+
+
+def summarise(sets, rows):
+    """One summary dict per parameter set with distribution statistics"""
+    columns = dict((field, index) for index, field in enumerate(RESULT_FIELDS))
+    data = np.array(rows, dtype=np.float64).reshape(-1, len(RESULT_FIELDS))
+    summaries = []
+    for set_index, params in enumerate(sets):
+        games = data[data[:, columns['set_index']] == set_index]
+        summary = dict(params)
+        summary['games'] = len(games)
+        for metric in SUMMARY_METRICS:
+            values = games[:, columns[metric]]
+            if not len(values):
+                continue
+            p5, p50, p95 = np.percentile(values, (5, 50, 95))
+            summary.update({
+                metric + '_mean': values.mean(),
+                metric + '_std': values.std(),
+                metric + '_min': values.min(),
+                metric + '_p5': p5,
+                metric + '_p50': p50,
+                metric + '_p95': p95,
+                metric + '_max': values.max(),
+            })
+        summaries.append(summary)
+    return summaries
+
+
+def write_csv(path, records, fieldnames):
+    stream = sys.stdout if path == '-' else open(path, 'w', newline='')
+    try:
+        writer = csv.DictWriter(stream, fieldnames=fieldnames)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+
+def summary_fields(sets):
+    names = ['difficulty'] + sorted(set(itertools.chain(*sets)) - {'difficulty'})
+    return names + ['games'] + [
+        '%s_%s' % (metric, statistic)
+        for metric in SUMMARY_METRICS for statistic in SUMMARY_STATISTICS
+    ]
+
+
+def parse_sweep(option):
+    """'NAME=v1,v2,...' to (NAME, [v1, v2, ...]) with numeric values"""
+    name, _, values = option.partition('=')
+    if not name or not values:
+        raise argparse.ArgumentTypeError("expected NAME=value[,value...], got %r" % (option,))
+    parsed = []
+    for value in values.split(','):
+        try:
+            parsed.append(int(value))
+        except ValueError:
+            parsed.append(float(value))
+    return name.strip(), parsed
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Monte Carlo balancing runs for Fire Fighter 3D")
+    parser.add_argument('--games', type=int, default=100, help="games per parameter set")
+    parser.add_argument(
+        '--difficulty', nargs='+', choices=sorted(simulation.DIFFICULTY_LEVELS),
+        default=list(simulation.DIFFICULTY_LEVELS), help="difficulties to play every set at",
+    )
+    parser.add_argument(
+        '--set', dest='sweeps', action='append', type=parse_sweep, default=[],
+        metavar='NAME=V1,V2', help="parameter values to sweep (repeatable)",
+    )
+    parser.add_argument('--policy', choices=POLICIES, default='scripted')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--batch-size', type=int, default=16, help="games per worker result batch")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game of every set")
+    parser.add_argument('--tick-rate', type=float, default=simulation.TICK_RATE)
+    parser.add_argument('--output', default='-', help="summary CSV path ('-' for stdout)")
+    parser.add_argument('--raw', default=None, help="also write one CSV row per game here")
+    return parser
+
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    sets = parameter_sets(args.difficulty, dict(args.sweeps))
+    for params in sets:
+        # Fail early on unknown parameter names rather than inside a worker
+        try:
+            restore_parameters(apply_parameters(params))
+        except (KeyError, ValueError) as err:
+            parser.error(err.args[0])
+
+    def progress(done, total):
+        sys.stderr.write("\r%d/%d games" % (done, total))
+
+    start = time.perf_counter()
+    rows = run_sweep(
+        sets, args.games, policy=args.policy, workers=args.workers,
+        batch_size=args.batch_size, base_seed=args.seed, tick_rate=args.tick_rate,
+        progress=progress,
+    )
+    elapsed = time.perf_counter() - start
+    game_seconds = sum(row[RESULT_FIELDS.index('game_time')] for row in rows)
+    sys.stderr.write(
+        "\n%d games, %.0f game-seconds in %.1fs (%.0f game-s/s)\n"
+        % (len(rows), game_seconds, elapsed, game_seconds / elapsed if elapsed > 0 else 0)
+    )
+
+    write_csv(args.output, summarise(sets, rows), summary_fields(sets))
+    if args.raw:
+        write_csv(
+            args.raw,
+            [dict(zip(RESULT_FIELDS, row)) for row in sorted(rows)],
+            RESULT_FIELDS,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Micro-benchmark: calls/sec of the scalar GL entry points main.py uses
+
+Times each call in a tight loop (process CPU time), with PyOpenGL's
+default wrapping and with OpenGL.FAST_SCALAR_CALLS.  The mode has to be
+chosen before OpenGL is imported, so each runs in its own interpreter;
+the two alternate for several rounds and the best rate of each counts,
+which keeps a busy machine from favouring one of them.  Vertex
+attributes are called between glBegin/glEnd, as the game does.
+
+    python bench_glcalls.py --calls 200000 --rounds 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+#: (entry point, arguments, called between glBegin and glEnd)
+CASES = (
+    ('glVertex3f', (0.0, 1.0, 2.0), True),
+    ('glNormal3f', (0.0, 1.0, 0.0), True),
+    ('glColor3f', (1.0, 0.5, 0.2), True),
+    ('glColor3f', (1.0, 0.5, 0.2), False),
+    ('glColor4f', (1.0, 0.5, 0.2, 0.8), False),
+    ('glTranslatef', (0.0, 0.0, 0.0), False),
+    ('glRotatef', (0.0, 0.0, 1.0, 0.0), False),
+    ('glScalef', (1.0, 1.0, 1.0), False),
+    ('glPushMatrix', (), False),  # Each paired with a glPopMatrix
+    ('glEnable', ('GL_LIGHTING',), False),
+    ('glDisable', ('GL_LIGHTING',), False),
+    ('glPointSize', (2.0,), False),
+)
+
+
+def measure(calls, repeat):
+    """{label: best calls per second of ``repeat`` runs} in this interpreter's mode"""
+    import offscreen  # Selects the offscreen platform before OpenGL is imported
+    from OpenGL import GL
+
+    context = offscreen.OffscreenContext(64, 64)
+    results = {}
+    try:
+        for name, args, in_begin in CASES:
+            function = getattr(GL, name)
+            args = tuple(getattr(GL, arg) if isinstance(arg, str) else arg for arg in args)
+            function(*args)  # Resolve lazily loaded entry points first
+            if name == 'glPushMatrix':
+                GL.glPopMatrix()
+            label = name + (' (in glBegin)' if in_begin else '')
+            best = None
+            for _ in range(repeat):
+                if in_begin:
+                    GL.glBegin(GL.GL_POINTS)
+                start = time.process_time()
+                if name == 'glPushMatrix':
+                    pop = GL.glPopMatrix
+                    for _ in range(calls // 2):
+                        function()
+                        pop()
+                else:
+                    for _ in range(calls):
+                        function(*args)
+                elapsed = time.process_time() - start
+                if in_begin:
+                    GL.glEnd()
+                GL.glFinish()
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = calls / best
+    finally:
+        context.release()
+    return results
+
+
+def run_mode(fast, calls, repeat):
+    env = dict(os.environ, PYOPENGL_FAST_SCALAR_CALLS='1' if fast else '0')
+    output = subprocess.run(
+        [sys.executable, __file__, '--calls', str(calls), '--repeat', str(repeat), '--child'],
+        env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200000, help="calls timed per entry point")
+    parser.add_argument('--repeat', type=int, default=3, help="timed loops per entry point in each round")
+    parser.add_argument('--rounds', type=int, default=3, help="interpreters started per mode")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        print(json.dumps(measure(args.calls, args.repeat)))
+        return
+    default, fast = {}, {}
+    for _ in range(args.rounds):
+        for results, mode in ((default, False), (fast, True)):
+            for label, rate in run_mode(mode, args.calls, args.repeat).items():
+                results[label] = max(rate, results.get(label, 0.0))
+    print("%-28s %14s %14s %8s" % ('calls/sec', 'default', 'fast scalar', 'speedup'))
+    for label, rate in default.items():
+        print("%-28s %14.0f %14.0f %7.2fx" % (label, rate, fast[label], fast[label] / rate))
+
+
+if __name__ == "__main__":
+    main()
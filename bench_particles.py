@@ -0,0 +1,133 @@
+"""Micro-benchmark: per-particle immediate mode vs the batched billboard renderer
+
+Fills the fire and smoke pools with N particles each, then draws them
+offscreen both ways and reports GL calls and CPU time per frame.
+
+    python bench_particles.py --particles 1000 5000 20000 --frames 30
+"""
+import offscreen  # Selects the EGL platform before OpenGL is imported
+
+import argparse
+import collections
+import sys
+import time
+
+import numpy as np
+
+from OpenGL.GL import (
+    GL_BLEND, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, GL_DEPTH_TEST,
+    GL_LIGHTING, GL_MODELVIEW, GL_ONE, GL_ONE_MINUS_SRC_ALPHA, GL_PROJECTION,
+    GL_QUADS, GL_SRC_ALPHA,
+    glBegin, glBlendFunc, glClear, glColor4f, glDisable, glEnable, glEnd,
+    glFinish, glLoadIdentity, glMatrixMode, glPopMatrix, glPushMatrix,
+    glTranslatef, glVertex3f,
+)
+from OpenGL.GLU import gluLookAt, gluPerspective
+
+import particlerender
+from particles import FireParticles, SmokeParticles
+
+
+def draw_immediate(fire, smoke):
+    """The per-particle draw_particles this renderer replaced (smoke drawn twice)"""
+    glDisable(GL_LIGHTING)
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE)
+    for pool, blend in ((fire, GL_ONE), (smoke, GL_ONE_MINUS_SRC_ALPHA), (smoke, None)):
+        if blend is None:
+            glDisable(GL_BLEND)
+        else:
+            glBlendFunc(GL_SRC_ALPHA, blend)
+        for position, (r, g, b), alpha, size in pool.rows():
+            glPushMatrix()
+            glTranslatef(*position)
+            glColor4f(r, g, b, alpha)
+            glBegin(GL_QUADS)
+            glVertex3f(-size, -size, 0)
+            glVertex3f(size, -size, 0)
+            glVertex3f(size, size, 0)
+            glVertex3f(-size, size, 0)
+            glEnd()
+            glPopMatrix()
+    glEnable(GL_LIGHTING)
+
+
+def fill_pools(count, seed=0):
+    rng = np.random.default_rng(seed)
+    fire = FireParticles(count, rng=rng)
+    smoke = SmokeParticles(count, rng=rng)
+    positions = rng.uniform(-40, 40, (count, 3))
+    fire.spawn(positions, rng.uniform(0.5, 1.0, (count, 3)), (1.0, 0.0, 0.0), 0.5)
+    smoke.spawn(positions, (1.0, 0.0, 0.0), 0.5)
+    return fire, smoke
+
+
+def count_gl_calls(namespaces, draw):
+    """Run draw() once with the gl* names of ``namespaces`` wrapped to count calls"""
+    counts = collections.Counter()
+    saved = []
+    for namespace in namespaces:
+        for name in dir(namespace):
+            function = getattr(namespace, name)
+            if name.startswith('gl') and callable(function):
+                def counted(*args, _name=name, _function=function):
+                    counts[_name] += 1
+                    return _function(*args)
+                saved.append((namespace, name, function))
+                setattr(namespace, name, counted)
+    try:
+        draw()
+    finally:
+        for namespace, name, function in saved:
+            setattr(namespace, name, function)
+    return sum(counts.values())
+
+
+def time_frames(draw, frames):
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        draw()
+        glFinish()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--particles', type=int, nargs='+', default=[1000, 5000, 20000],
+                        help="particles per pool (fire and smoke each)")
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--size', type=int, nargs=2, default=(640, 480), metavar=('WIDTH', 'HEIGHT'))
+    args = parser.parse_args(argv)
+
+    context = offscreen.OffscreenContext(*args.size)
+    glEnable(GL_DEPTH_TEST)
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    gluPerspective(60, args.size[0] / args.size[1], 0.1, 1500)
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()
+    gluLookAt(0, 30, 90, 0, 0, 0, 0, 1, 0)
+    renderer = particlerender.BillboardRenderer()
+
+    sys.stdout.write("%8s  %-10s %10s %12s\n" % ('per pool', 'renderer', 'GL calls', 'frame ms'))
+    for count in args.particles:
+        fire, smoke = fill_pools(count)
+        contenders = (
+            ('immediate', lambda: draw_immediate(fire, smoke), [sys.modules[__name__]]),
+            # The VBO helper issues the buffer upload through its implementation object
+            ('batched', lambda: renderer.draw({'additive': [fire], 'alpha': [smoke]}),
+             [particlerender, renderer.buffer.implementation]),
+        )
+        for label, draw, namespaces in contenders:
+            calls = count_gl_calls(namespaces, draw)
+            seconds = time_frames(draw, args.frames)
+            sys.stdout.write("%8d  %-10s %10d %12.2f\n" % (count, label, calls, seconds * 1000))
+    renderer.release()
+    context.release()
+
+
+if __name__ == "__main__":
+    main()
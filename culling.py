@@ -0,0 +1,133 @@
+"""View-frustum culling and distance-based level of detail
+
+The frustum is rebuilt from the same numbers setupCamera passes to
+gluPerspective and gluLookAt, so no matrices are read back from GL.
+Objects are tested as bounding spheres, many at a time with NumPy, and
+each visible one gets a tessellation level from its projected radius in
+pixels.  Counts of drawn and culled objects are kept per kind for the
+current frame.
+"""
+import math
+
+import numpy as np
+
+#: (minimum projected radius in pixels, sphere slices/stacks), largest first
+LOD_LEVELS = ((40.0, 16), (15.0, 8), (0.0, 4))
+
+
+def perspective_matrix(fovy, aspect, near, far):
+    """The matrix gluPerspective multiplies in (row-major, column vectors)"""
+    f = 1.0 / math.tan(math.radians(fovy) / 2.0)
+    return np.array([
+        [f / aspect, 0.0, 0.0, 0.0],
+        [0.0, f, 0.0, 0.0],
+        [0.0, 0.0, (far + near) / (near - far), 2.0 * far * near / (near - far)],
+        [0.0, 0.0, -1.0, 0.0],
+    ])
+
+
+def look_at_matrix(eye, target, up):
+    """The matrix gluLookAt multiplies in (row-major, column vectors)"""
+    eye = np.asarray(eye, dtype=float)
+    forward = np.asarray(target, dtype=float) - eye
+    forward /= np.linalg.norm(forward)
+    side = np.cross(forward, up)
+    side /= np.linalg.norm(side)
+    upward = np.cross(side, forward)
+    matrix = np.identity(4)
+    matrix[0, :3] = side
+    matrix[1, :3] = upward
+    matrix[2, :3] = -forward
+    matrix[:3, 3] = -matrix[:3, :3].dot(eye)
+    return matrix
+
+
+class Frustum(object):
+    """Six world-space planes (a, b, c, d) with inward unit normals
+
+    ``pixel_scale`` turns radius / depth along ``forward`` into a projected
+    radius in pixels.
+    """
+    def __init__(self, planes, eye, forward, near, pixel_scale):
+        self.planes = planes
+        self.eye = eye
+        self.forward = forward
+        self.near = near
+        self.pixel_scale = pixel_scale
+
+    @classmethod
+    def from_camera(cls, fovy, aspect, near, far, eye, target, up=(0, 1, 0), viewport_height=800):
+        """The frustum of gluPerspective(fovy, aspect, near, far) + gluLookAt(eye, target, up)"""
+        clip = perspective_matrix(fovy, aspect, near, far).dot(look_at_matrix(eye, target, up))
+        # Gribb-Hartmann: each plane is row 3 plus or minus one of rows 0-2
+        planes = np.array([
+            clip[3] + clip[0], clip[3] - clip[0],  # left, right
+            clip[3] + clip[1], clip[3] - clip[1],  # bottom, top
+            clip[3] + clip[2], clip[3] - clip[2],  # near, far
+        ])
+        planes /= np.linalg.norm(planes[:, :3], axis=1)[:, None]
+        eye = np.asarray(eye, dtype=float)
+        forward = np.asarray(target, dtype=float) - eye
+        forward /= np.linalg.norm(forward)
+        pixel_scale = viewport_height / 2.0 / math.tan(math.radians(fovy) / 2.0)
+        return cls(planes, eye, forward, near, pixel_scale)
+
+    def intersects(self, centers, radii):
+        """Boolean mask of the spheres (N x 3 centres, scalar or N radii) at least partly inside"""
+        distances = centers.dot(self.planes[:, :3].T) + self.planes[:, 3]
+        return (distances >= -np.reshape(radii, (-1, 1))).all(axis=1)
+
+    def pixel_radii(self, centers, radii):
+        """Approximate projected radius in pixels of each sphere"""
+        depth = np.maximum((centers - self.eye).dot(self.forward), self.near)
+        return self.pixel_scale * np.asarray(radii, dtype=float) / depth
+
+
+def detail_levels(pixel_radii, levels=LOD_LEVELS):
+    """Tessellation for each projected radius, from a LOD_LEVELS-style table"""
+    details = np.full(len(pixel_radii), levels[-1][1], dtype=int)
+    for threshold, detail in reversed(levels[:-1]):
+        details[pixel_radii >= threshold] = detail
+    return details
+
+
+class Culler(object):
+    """Visibility and LOD for one frame, with drawn/culled counts per object kind
+
+    Until begin_frame() is given a frustum everything is drawn at full
+    detail.
+    """
+    def __init__(self, levels=LOD_LEVELS):
+        self.levels = levels
+        self.frustum = None
+        self.drawn = {}
+        self.culled = {}
+
+    def begin_frame(self, frustum):
+        self.frustum = frustum
+        self.drawn = {}
+        self.culled = {}
+
+    def select(self, kind, positions, offset=(0.0, 0.0, 0.0), radius=1.0):
+        """Indices of the visible ``positions`` (N x 3) and a detail level for each
+
+        Each object's bounding sphere is centred ``offset`` from its position.
+        """
+        centers = np.asarray(positions, dtype=float).reshape(-1, 3) + offset
+        if self.frustum is None:
+            visible = np.arange(len(centers))
+            details = np.full(len(centers), self.levels[0][1], dtype=int)
+        else:
+            visible = np.flatnonzero(self.frustum.intersects(centers, radius))
+            details = detail_levels(self.frustum.pixel_radii(centers[visible], radius), self.levels)
+        self.drawn[kind] = self.drawn.get(kind, 0) + len(visible)
+        self.culled[kind] = self.culled.get(kind, 0) + len(centers) - len(visible)
+        return visible, details
+
+    def counts(self):
+        """{kind: (drawn, culled)} for the current frame"""
+        return dict((kind, (self.drawn[kind], self.culled[kind])) for kind in self.drawn)
+
+    def totals(self):
+        """(drawn, culled) over every kind this frame"""
+        return sum(self.drawn.values()), sum(self.culled.values())
@@ -0,0 +1,115 @@
+"""Column store for the houses of a map
+
+Every per-house attribute is one NumPy column, so the per-tick house
+rules (fire growth, damage, collapse, spread timers, spraying) run as
+masked array operations instead of dict lookups per house.  Code that
+thinks in terms of single houses (rendering, pop_random_fire) gets a
+dict-like HouseView per row.
+"""
+from collections.abc import MutableMapping
+
+import numpy as np
+
+#: Columns of the table and their dtypes; 'position' holds (x, y, z) rows
+FIELDS = (
+    ('position', np.float64),
+    ('health', np.float64),
+    ('structural_integrity', np.float64),
+    ('on_fire', np.bool_),
+    ('fire_intensity', np.float64),
+    ('fire_type', np.int8),
+    ('smoke_level', np.float64),
+    ('flammability', np.float64),
+    ('fire_spread_timer', np.float64),
+    ('fire_spread_cooldown', np.float64),
+    ('collapse_risk', np.float64),
+)
+FIELD_NAMES = tuple(name for name, _ in FIELDS)
+
+
+class HouseTable(object):
+    """Houses as parallel NumPy columns
+
+    ``fire_type`` is stored as an index into ``fire_type_names``; the
+    views translate it back to the name.  Row views are created once and
+    reused, so a house keeps its identity (e.g. as a key in the obstacle
+    grid) for the lifetime of the table.
+    """
+    def __init__(self, records, fire_type_names):
+        self.fire_type_names = tuple(fire_type_names)
+        self.fire_type_codes = dict((name, code) for code, name in enumerate(self.fire_type_names))
+        records = list(records)
+        count = len(records)
+        for name, dtype in FIELDS:
+            if name == 'position':
+                column = np.array([record['position'] for record in records], dtype=dtype).reshape(count, 3)
+            elif name == 'fire_type':
+                column = np.array([self.fire_type_codes[record['fire_type']] for record in records], dtype=dtype)
+            else:
+                column = np.array([record.get(name, 0) for record in records], dtype=dtype)
+            setattr(self, name, column)
+        self._views = [HouseView(self, index) for index in range(count)]
+
+    def __len__(self):
+        return len(self._views)
+
+    def __iter__(self):
+        return iter(self._views)
+
+    def __getitem__(self, index):
+        return self._views[index]
+
+    @property
+    def x(self):
+        return self.position[:, 0]
+
+    @property
+    def z(self):
+        return self.position[:, 2]
+
+    def standing(self):
+        return self.health > 0
+
+    def fire_type_name(self, index):
+        return self.fire_type_names[self.fire_type[index]]
+
+
+class HouseView(MutableMapping):
+    """Dict-like window onto one row of a HouseTable
+
+    Reads return plain Python values (position as a list) so callers
+    such as the GL drawing code never see NumPy scalars; writes go
+    straight into the table's columns.
+    """
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, key):
+        if key not in FIELD_NAMES:
+            raise KeyError(key)
+        if key == 'fire_type':
+            return self.table.fire_type_name(self.index)
+        value = getattr(self.table, key)[self.index]
+        return value.tolist()
+
+    def __setitem__(self, key, value):
+        if key not in FIELD_NAMES:
+            raise KeyError(key)
+        if key == 'fire_type':
+            value = self.table.fire_type_codes[value]
+        getattr(self.table, key)[self.index] = value
+
+    def __delitem__(self, key):
+        raise TypeError("Cannot delete %r: house columns are fixed" % (key,))
+
+    def __iter__(self):
+        return iter(FIELD_NAMES)
+
+    def __len__(self):
+        return len(FIELD_NAMES)
+
+    def __repr__(self):
+        return '%s(%d, %r)' % (self.__class__.__name__, self.index, dict(self))
@@ -0,0 +1,165 @@
+"""Instanced drawing of many copies of one mesh
+
+Every object kind (tree, person, each hazard type) is one static mesh
+VBO plus one per-instance VBO of (x, y, z, yaw, r, g, b, a) rows.  A
+whole kind is drawn with a single glDrawArraysInstanced call, so moving
+every person is one buffer upload instead of one matrix stack each.
+
+The shader reads the fixed-function matrices and GL_LIGHT0, so instanced
+objects sit in the same camera and lighting as the immediate-mode scene.
+Needs GLSL 1.20 and instanced arrays (GL 3.3, or the ARB_draw_instanced
+and ARB_instanced_arrays extensions).
+"""
+import numpy as np
+
+from OpenGL import GL
+from OpenGL.GL import (
+    GL_ARRAY_BUFFER, GL_DYNAMIC_DRAW, GL_FALSE, GL_FLOAT, GL_FRAGMENT_SHADER,
+    GL_STATIC_DRAW, GL_TRIANGLES, GL_VERTEX_SHADER,
+    glBindBuffer, glDisableVertexAttribArray, glEnableVertexAttribArray,
+    glGetAttribLocation, glUseProgram, glVertexAttribPointer,
+)
+from OpenGL.GL import shaders
+from OpenGL.GL.ARB.draw_instanced import glDrawArraysInstancedARB
+from OpenGL.GL.ARB.instanced_arrays import glVertexAttribDivisorARB
+from OpenGL.arrays import vbo
+from OpenGL.extensions import alternate
+
+from meshes import VERTEX_FLOATS
+
+glDrawArraysInstanced = alternate(GL.glDrawArraysInstanced, glDrawArraysInstancedARB)
+glVertexAttribDivisor = alternate(GL.glVertexAttribDivisor, glVertexAttribDivisorARB)
+
+INSTANCE_FLOATS = 8
+
+VERTEX_SHADER = """
+#version 120
+attribute vec3 vertex_position;
+attribute vec3 vertex_normal;
+attribute vec3 vertex_color;
+attribute vec4 instance_transform;  // x, y, z, yaw in degrees about +y
+attribute vec4 instance_color;      // multiplies the mesh colour
+varying vec4 color;
+
+void main() {
+    float yaw = radians(instance_transform.w);
+    float c = cos(yaw);
+    float s = sin(yaw);
+    mat3 rotation = mat3(c, 0.0, -s, 0.0, 1.0, 0.0, s, 0.0, c);
+    vec4 eye = gl_ModelViewMatrix * vec4(rotation * vertex_position + instance_transform.xyz, 1.0);
+    vec3 normal = gl_NormalMatrix * (rotation * vertex_normal);  // No GL_NORMALIZE in the game
+    vec4 light = gl_LightSource[0].position;
+    vec3 to_light = normalize(light.xyz - eye.xyz * light.w);
+    vec3 base = vertex_color * instance_color.rgb;
+    vec3 shade = gl_LightModel.ambient.rgb + gl_LightSource[0].ambient.rgb
+        + gl_LightSource[0].diffuse.rgb * max(dot(normal, to_light), 0.0);
+    color = vec4(base * shade, instance_color.a);
+    gl_Position = gl_ProjectionMatrix * eye;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+varying vec4 color;
+
+void main() {
+    gl_FragColor = color;
+}
+"""
+
+# (attribute, components, float offset) within a mesh row and an instance row
+_VERTEX_ATTRIBUTES = (('vertex_position', 3, 0), ('vertex_normal', 3, 3), ('vertex_color', 3, 6))
+_INSTANCE_ATTRIBUTES = (('instance_transform', 4, 0), ('instance_color', 4, 4))
+
+
+def instanced_drawing_supported():
+    """Whether the current context can run InstancedRenderer"""
+    return bool(glDrawArraysInstanced) and bool(glVertexAttribDivisor) and bool(GL.glCreateShader)
+
+
+def instance_rows(positions, yaw=0.0, color=(1.0, 1.0, 1.0, 1.0)):
+    """Pack (N, 3) positions plus yaw degrees and RGBA tint (scalars or per-instance) into instance rows"""
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+    rows = np.empty((len(positions), INSTANCE_FLOATS), dtype=np.float32)
+    rows[:, 0:3] = positions
+    rows[:, 3] = yaw
+    rows[:, 4:8] = color
+    return rows
+
+
+class InstancedRenderer(object):
+    """The shared shader program; draws any number of MeshBatch objects
+
+    Must be created with the GL context current.  Raises
+    shaders.ShaderCompilationError/ShaderValidationError (RuntimeError
+    subclasses) if the driver rejects the program.
+    """
+    def __init__(self):
+        self.program = shaders.compileProgram(
+            shaders.compileShader(VERTEX_SHADER, GL_VERTEX_SHADER),
+            shaders.compileShader(FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+            validate=False,
+        )
+        self.locations = dict(
+            (name, glGetAttribLocation(self.program, name))
+            for name, _, _ in _VERTEX_ATTRIBUTES + _INSTANCE_ATTRIBUTES
+        )
+
+    def batch(self, mesh):
+        return MeshBatch(self, mesh)
+
+    def _bind(self, buffer, attributes, row_floats, divisor):
+        buffer.bind()
+        stride = row_floats * 4
+        for name, size, offset in attributes:
+            location = self.locations[name]
+            if location < 0:
+                continue  # Optimised out by the driver
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, stride, buffer + offset * 4)
+            glVertexAttribDivisor(location, divisor)
+
+    def _release(self):
+        for name, _, _ in _VERTEX_ATTRIBUTES + _INSTANCE_ATTRIBUTES:
+            location = self.locations[name]
+            if location >= 0:
+                glVertexAttribDivisor(location, 0)
+                glDisableVertexAttribArray(location)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self, *batches):
+        """Draw every non-empty batch with one instanced call each"""
+        batches = [batch for batch in batches if batch.count]
+        if not batches:
+            return 0
+        glUseProgram(self.program)
+        try:
+            for batch in batches:
+                self._bind(batch.mesh, _VERTEX_ATTRIBUTES, VERTEX_FLOATS, 0)
+                self._bind(batch.instances, _INSTANCE_ATTRIBUTES, INSTANCE_FLOATS, 1)
+                glDrawArraysInstanced(GL_TRIANGLES, 0, batch.vertex_count, batch.count)
+        finally:
+            self._release()
+            glUseProgram(0)
+        return len(batches)
+
+
+class MeshBatch(object):
+    """One mesh (see meshes.py) and the instances to draw it at"""
+    def __init__(self, renderer, mesh):
+        mesh = np.ascontiguousarray(mesh, dtype=np.float32).reshape(-1, VERTEX_FLOATS)
+        self.renderer = renderer
+        self.vertex_count = len(mesh)
+        self.mesh = vbo.VBO(mesh, usage=GL_STATIC_DRAW)
+        self.instances = vbo.VBO(np.zeros((1, INSTANCE_FLOATS), dtype=np.float32), usage=GL_DYNAMIC_DRAW)
+        self.count = 0
+
+    def set_instances(self, rows):
+        """Replace every instance; uploaded once, on the next draw"""
+        rows = np.ascontiguousarray(rows, dtype=np.float32).reshape(-1, INSTANCE_FLOATS)
+        self.count = len(rows)
+        if self.count:
+            self.instances.set_array(rows)
+
+    def draw(self):
+        return self.renderer.draw(self)
@@ -1,140 +1,93 @@
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
-import random
+from OpenGL.GL.stateshadow import StateShadow
+from OpenGL import accounting, error as gl_error
+import atexit
+import contextlib
 import math
 import time
 import sys
 import numpy as np
 
-scene_time = 0.0  # 0.0 to 24.0, where 0 is midnight and 12 is noon
-last_houses_destroyed = 0  # Track destroyed houses for life loss
+from culling import LOD_LEVELS, Culler, Frustum
+from instancing import InstancedRenderer, instance_rows, instanced_drawing_supported
+from meshes import hazard_meshes, person_mesh, tree_mesh
+from particlerender import BillboardRenderer
+from profiler import FrameProfiler
+from scenecache import StaticSceneCache
+from textrender import TextRenderer
+from simulation import (
+    FixedTimestep, Simulation, parse_args, run_headless, report_headless, simulation_options,
+    MAX_HEALTH, NUM_HOUSES, SPRAY_DISTANCE, TIME_LIMIT, WATER_CAPACITY,
+    WORLD_SIZE, ROAD_WIDTH, ROAD_LENGTH, HAZARD_TYPES, tool_names,
+)
 
 # Camera-related variables
 camera_pos = (0, 30, 50)  # Increased height and distance
 fovY = 60  # Field of view
+CAMERA_ASPECT = 1.25
+CAMERA_NEAR = 0.1
+CAMERA_FAR = 1500
 GRID_LENGTH = 100  # Length of grid lines
 
-# Game parameters
-NUM_HOUSES = 8  # Number of houses in the game
-MAX_HEALTH = 100  # Maximum health of a house
-FIRE_DAMAGE = 0.04  # Fire damage per frame
-WATER_HEAL = 3.0  # Reduced water healing to make extinguishing take longer
-SPRAY_DISTANCE = 15.0  # Maximum distance to spray water
-FIRE_PROBABILITY = 0.001  # Increased for more frequent fires
-TRUCK_SPEED = 4.0  # Increased speed of the fire truck
-WORLD_SIZE = 100  # Size of the game world
-WATER_CAPACITY = 5000  # Maximum water capacity
-WATER_USAGE_RATE = 0.8  # Water usage per frame when spraying
-WATER_REFILL_RATE = 20  # Increased for faster refilling
-COLLISION_DISTANCE = 6.0  # Distance for collision detection
-WATER_REFILL_DISTANCE = 5.0  # Distance for automatic water refill
-FIRE_POP_INTERVAL = 6.0  # Minimum interval between fire pops in seconds
-
-# Game over parameters
-TIME_LIMIT = 60  # 5 minutes time limit
-MAX_LIVES = 3  # Number of lives
-SCORE_PER_HOUSE = 1000  # Points for saving a house
-SCORE_PER_SECOND = 10  # Points per second remaining
-DIFFICULTY_LEVELS = {
-    'EASY': {'fire_rate': 0.5, 'damage_rate': 0.5, 'time_limit': 400},
-    'NORMAL': {'fire_rate': 1.0, 'damage_rate': 1.0, 'time_limit': 300},
-    'HARD': {'fire_rate': 1.5, 'damage_rate': 1.5, 'time_limit': 200}
+# Game state lives in the simulation; this module only draws it and feeds it input
+sim = None
+scheduler = None  # Runs sim ticks at a fixed rate, independent of the frame rate
+last_time = 0  # Wall-clock time of the previous idle() call
+render_rng = None  # Flicker for the effects; its own stream so drawing never perturbs sim
+render_clock = time.time  # Seconds driving the flame animation; offscreen runs fix it per frame
+static_scene = None  # Display list of the ground, roads and water stations
+particle_renderer = None  # Batches every particle into one streaming VBO per frame
+text_renderer = None  # Glyph-atlas HUD text, one draw per frame (None: glutBitmapCharacter)
+HUD_FONTS = (GLUT_BITMAP_HELVETICA_18, GLUT_BITMAP_TIMES_ROMAN_24, GLUT_BITMAP_8_BY_13)
+# Instanced path for trees, people and hazards (None: draw them one by one)
+instancer = None
+instance_batches = {}  # 'tree', 'person' and each hazard type -> MeshBatch
+instanced_layout = None  # sim.layout_version tree_positions was built for
+tree_positions = None
+INSTANCE_MESH_DETAIL = 16  # Same tessellation as the glutSolidSphere calls
+# Drops GL state changes that change nothing (None: every call goes to GL)
+gl_state = None
+# Draw from client arrays they enable and disable behind the state shadow
+GLUT_SOLIDS = ('glutSolidCube', 'glutSolidSphere', 'glutSolidCylinder', 'glutSolidCone', 'glutSolidTorus')
+glut_solids = {}  # The unwrapped functions while the state shadow is installed
+gl_state_counts = (0, {})  # (calls passed to GL, {entry point: calls dropped}) last frame
+culler = Culler()  # Frustum test and sphere detail per object, rebuilt by setupCamera
+# Stage timings and entity counts per frame; disabled (and near free) unless --profile...
+profiler = FrameProfiler()
+profile_options = None  # Parsed options naming the export files
+show_profile = False  # Overlay of the rolling percentiles, toggled with P
+profile_lines = []  # Overlay text, refreshed every PROFILE_OVERLAY_REFRESH frames
+PROFILE_OVERLAY_REFRESH = 30
+SIM_STAGES = (
+    'update_wind', 'update_fire_spread', 'update_structural_integrity',
+    'update_particles', 'update_spray', 'update_people',
+)
+
+# Bounding spheres for culling: (centre offset from the object's position, radius)
+HOUSE_BOUNDS = ((0.0, 2.6, 0.0), 6.0)  # Walls, roof, flames and the bars above
+TREE_BOUNDS = ((0.0, 2.2, 0.0), 3.6)
+PERSON_BOUNDS = ((0.0, 1.0, 0.0), 1.2)
+HAZARD_BOUNDS = {
+    'fallen_tree': ((0.0, 0.0, 4.0), 4.2),
+    'power_line': ((0.0, 0.0, 0.0), 1.6),
+    'debris': ((0.0, 0.0, 0.0), 1.8),
+    'vehicle': ((0.0, 0.0, 0.0), 2.3),
+    'collapsed_structure': ((0.0, 0.0, 0.0), 2.6),
 }
 
-# Add new constants for roads and water stations
-ROAD_WIDTH = 10.0
-ROAD_LENGTH = 80.0
-WATER_STATION_DISTANCE = 40.0  # Distance between water stations
-
-# New fire simulation parameters
-WIND_DIRECTION = [1.0, 0.0, 0.0]  # Initial wind direction
-WIND_SPEED = 1.0  # Wind speed multiplier
-FIRE_SPREAD_RADIUS = 10.0  # Maximum distance for fire spread
-FIRE_SPREAD_PROBABILITY = 0.3  # Probability of fire spreading to nearby objects
-SMOKE_DENSITY = 0.5  # Base smoke density
-MAX_SMOKE_DENSITY = 1.0  # Maximum smoke density
-SMOKE_DISSIPATION_RATE = 0.1  # Rate at which smoke dissipates
-
-# Fire types and their properties
-FIRE_TYPES = {
-    'CLASS_A': {'color': (1.0, 0.3, 0.0), 'extinguisher': 'water', 'spread_rate': 1.0},
-    'CLASS_B': {'color': (1.0, 0.0, 0.0), 'extinguisher': 'foam', 'spread_rate': 1.5},
-    'CLASS_C': {'color': (0.0, 0.0, 1.0), 'extinguisher': 'dry_chemical', 'spread_rate': 1.2},
-    'CLASS_D': {'color': (1.0, 1.0, 0.0), 'extinguisher': 'dry_powder', 'spread_rate': 0.8}
-}
-
-# Game state variables
-houses = []
-fire_truck = {
-    'position': [0, 0, 0],
-    'rotation': 0,
-    'spraying': False,
-    'water': WATER_CAPACITY,
-    'equipment': {
-        'water_hose': {'condition': 100, 'effectiveness': 1.0},
-        'foam_sprayer': {'condition': 100, 'effectiveness': 1.0},
-        'dry_chemical': {'condition': 100, 'effectiveness': 1.0},
-        'dry_powder': {'condition': 100, 'effectiveness': 1.0}
-    }
-}
-
-tool_names = {
-    'water_hose': 'Standard Hose',
-    'foam_sprayer': 'Foam Sprayer',
-    'dry_chemical': 'Dry Chemical Extinguisher',
-    'dry_powder': 'Dry Powder Extinguisher',
-    'fire_axe': 'Fire Axe'
-}
-tool_keys = ['water_hose', 'foam_sprayer', 'dry_chemical', 'dry_powder', 'fire_axe']
-tool_index = 0
-current_equipment = tool_keys[tool_index]
-
-score = 0
-game_over = False
-game_time = 0
-last_time = 0
-houses_saved = 0
-game_started = False
-lives = MAX_LIVES
-current_difficulty = 'NORMAL'
-performance_rating = 0  # 0-100 rating based on performance
-water_stations = []  # Water refill stations
-hazards = []  # Environmental hazards
-smoke_particles = []  # Smoke particle system
-fire_particles = []  # Fire particle system
-wind_particles = []  # Wind visualization particles
-last_fire_pop_time = 0  # Track the last time a fire popped up
-fires_occurred = False  # Track if any fires have occurred during gameplay
-trees = []  # List to store tree positions
-people = []  # List to store people positions
-
-# Notification system
-notifications = []  # List to store active notifications
-last_notification_time = 0  # Track last notification time
-NOTIFICATION_DURATION = 3.0  # How long notifications stay on screen
-
 # Add new camera-related variables
 view_mode_fps = False  # False for third-person, True for first-person
 cam_distance = 30.0  # Distance for third-person view
 cam_elevation = 25.0  # Height for third-person view
 cam_rotation = 0  # Camera rotation around the truck
 
-def pop_random_fire():
-    global fires_occurred
-    # Find houses that are not on fire and not destroyed
-    valid_houses = [h for h in houses if not h['on_fire'] and h['health'] > 0]
-    
-    if valid_houses:
-        # Select a random house to set on fire
-        house = random.choice(valid_houses)
-        house['on_fire'] = True
-        house['fire_intensity'] = 0.3  # Start with moderate intensity
-        house['fire_type'] = random.choice(list(FIRE_TYPES.keys()))
-        fires_occurred = True
-        print(f"Fire started at house at position {house['position']}")
-
-def draw_text(x, y, text, font=GLUT_BITMAP_HELVETICA_18):
+def draw_text(x, y, text, font=GLUT_BITMAP_HELVETICA_18, color=(1.0, 1.0, 1.0)):
+    if text_renderer is not None:
+        # Queued; drawn with the rest of the HUD by text_renderer.flush()
+        text_renderer.add(x, y, text, font, color)
+        return
 
     glMatrixMode(GL_PROJECTION)
     glPushMatrix()
@@ -143,6 +96,7 @@ def draw_text(x, y, text, font=GLUT_BITMAP_HELVETICA_18):
     glMatrixMode(GL_MODELVIEW)
     glPushMatrix()
     glLoadIdentity()
+    glColor3f(*color)
     glRasterPos2f(x, y)
     for ch in text:
         glutBitmapCharacter(font, ord(ch))
@@ -151,6 +105,12 @@ def draw_text(x, y, text, font=GLUT_BITMAP_HELVETICA_18):
     glPopMatrix()
     glMatrixMode(GL_MODELVIEW)
 
+def text_width(text, font=GLUT_BITMAP_HELVETICA_18):
+    """Width of text in pixels, exactly as drawn"""
+    if text_renderer is not None:
+        return text_renderer.width(text, font)
+    return glutBitmapLength(font, text.encode('latin-1'))
+
 def draw_road():
     glDisable(GL_LIGHTING)
     # Main road (horizontal)
@@ -241,7 +201,7 @@ def draw_water_extension_station(position):
     
     glPopMatrix()
 
-def draw_tree(position):
+def draw_tree(position, detail=16):
     x, y, z = position
     glPushMatrix()
     glTranslatef(x, y, z)
@@ -258,24 +218,24 @@ def draw_tree(position):
     # Bottom layer
     glPushMatrix()
     glTranslatef(0, 2.5, 0)
-    glutSolidSphere(1.5, 16, 16)
+    glutSolidSphere(1.5, detail, detail)
     glPopMatrix()
     
     # Middle layer
     glPushMatrix()
     glTranslatef(0, 3.5, 0)
-    glutSolidSphere(1.2, 16, 16)
+    glutSolidSphere(1.2, detail, detail)
     glPopMatrix()
     
     # Top layer
     glPushMatrix()
     glTranslatef(0, 4.5, 0)
-    glutSolidSphere(0.8, 16, 16)
+    glutSolidSphere(0.8, detail, detail)
     glPopMatrix()
     
     glPopMatrix()
 
-def draw_person(position, rotation=0):
+def draw_person(position, rotation=0, detail=16):
     x, y, z = position
     glPushMatrix()
     glTranslatef(x, y, z)
@@ -293,7 +253,7 @@ def draw_person(position, rotation=0):
     glColor3f(0.8, 0.6, 0.5)  # Skin tone
     glPushMatrix()
     glTranslatef(0, 1.8, 0)
-    glutSolidSphere(0.2, 16, 16)
+    glutSolidSphere(0.2, detail, detail)
     glPopMatrix()
     
     # Arms
@@ -343,9 +303,12 @@ def draw_ground():
     glEnd()
 
 def draw_all_hazards():
-    for hazard in hazards:
-        if not hazard['cleared']:
-            draw_hazard(hazard)
+    standing = [hazard for hazard in sim.hazards if not hazard['cleared']]
+    for kind in HAZARD_TYPES:
+        of_kind = [hazard for hazard in standing if hazard['type'] == kind]
+        visible, _ = culler.select('hazard', [hazard['position'] for hazard in of_kind], *HAZARD_BOUNDS[kind])
+        for i in visible:
+            draw_hazard(of_kind[i])
 
 def draw_hazard(hazard):
     x, y, z = hazard['position']
@@ -376,12 +339,13 @@ def draw_all_roads():
     draw_road()
 
 def draw_all_water_stations():
-    for station in water_stations:
+    for station in sim.water_stations:
         draw_water_extension_station(station['position'])
 
 def draw_all_houses():
-    for house in houses:
-        draw_single_house(house)
+    visible, _ = culler.select('house', [house['position'] for house in sim.houses], *HOUSE_BOUNDS)
+    for i in visible:
+        draw_single_house(sim.houses[i])
 
 def draw_single_house(house):
     x, y, z = house['position']
@@ -437,26 +401,40 @@ def draw_single_house(house):
 
     glPopMatrix()
 
-def draw_fire_effect(fire_intensity, fire_type):
+# Flame colours picked with probability 0.3 / 0.4 / 0.3
+FIRE_EFFECT_PALETTE = np.array([[1.0, 1.0, 0.0], [1.0, 0.5, 0.0], [1.0, 0.0, 0.0]], dtype=np.float32)
+FIRE_EFFECT_THRESHOLDS = (0.3, 0.7)
+WATER_SPRAY_COLOR = (0.0, 0.7, 1.0)
+WATER_SPRAY_PARTICLES = 100
+
+def fire_effect_points(fire_intensity, now, rng):
+    """Vertices and colours (float32 N x 3) of the flame cloud above one house"""
+    count = int(fire_intensity * 50) + 30
+    phase = now * 3 + np.arange(count)
+    vertices = np.empty((count, 3), dtype=np.float32)
+    vertices[:, 0] = fire_intensity * np.sin(phase) * 2
+    vertices[:, 1] = rng.random(count) * (fire_intensity * 3) + 3
+    vertices[:, 2] = fire_intensity * np.cos(phase) * 2
+    shade = np.searchsorted(FIRE_EFFECT_THRESHOLDS, rng.random(count), side='right')
+    return vertices, FIRE_EFFECT_PALETTE[shade]
+
+def draw_point_cloud(vertices, colors, size):
+    """Draw N points from vertex/colour arrays in a single glDrawArrays call"""
     glDisable(GL_LIGHTING)
-    glPointSize(8.0)
-    glBegin(GL_POINTS)
-    num_particles = int(fire_intensity * 50) + 30
-    for i in range(num_particles):
-        x = fire_intensity * math.sin(time.time() * 3 + i) * 2
-        y = random.uniform(0, fire_intensity * 3) + 3
-        z = fire_intensity * math.cos(time.time() * 3 + i) * 2
-        t = random.uniform(0, 1)
-        if t < 0.3:
-            glColor3f(1.0, 1.0, 0.0)
-        elif t < 0.7:
-            glColor3f(1.0, 0.5, 0.0)
-        else:
-            glColor3f(1.0, 0.0, 0.0)
-        glVertex3f(x, y, z)
-    glEnd()
+    glPointSize(size)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, vertices)
+    glColorPointer(3, GL_FLOAT, 0, colors)
+    glDrawArrays(GL_POINTS, 0, len(vertices))
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
     glEnable(GL_LIGHTING)
 
+def draw_fire_effect(fire_intensity, fire_type):
+    vertices, colors = fire_effect_points(fire_intensity, render_clock(), render_rng)
+    draw_point_cloud(vertices, colors, 8.0)
+
 def draw_house_bars(health, structural_integrity):
     health_pct = health / MAX_HEALTH
     structural_pct = structural_integrity / MAX_HEALTH
@@ -501,16 +479,23 @@ def draw_house_bars(health, structural_integrity):
     glPopMatrix()
 
 def draw_all_trees():
-    for tree_pos in trees:
-        draw_tree(tree_pos)
+    visible, details = culler.select('tree', sim.trees, *TREE_BOUNDS)
+    for i, detail in zip(visible, details):
+        draw_tree(sim.trees[i], detail)
+
+def people_positions():
+    """(N x 3) positions of the people, interpolated for this frame"""
+    return [(x, person['position'][1], z) for person, (x, z) in zip(sim.people, scheduler.people_positions())]
 
 def draw_all_people():
-    for person in people:
-        draw_person(person['position'], person['rotation'])
+    positions = people_positions()
+    visible, details = culler.select('person', positions, *PERSON_BOUNDS)
+    for i, detail in zip(visible, details):
+        draw_person(positions[i], sim.people[i]['rotation'], detail)
 
 def draw_fire_truck_and_effects():
-    x, y, z = fire_truck['position']
-    rotation = fire_truck['rotation']
+    x, y, z = sim.fire_truck['position']
+    rotation = sim.fire_truck['rotation']
     glPushMatrix()
     glTranslatef(x, y, z)
     glRotatef(rotation, 0, 1, 0)
@@ -558,43 +543,33 @@ def draw_fire_truck_and_effects():
     glutSolidCone(0.4, 0.8, 10, 5)
     glPopMatrix()
     # Water spray
-    if fire_truck['spraying'] and fire_truck['water'] > 0:
+    if sim.fire_truck['spraying'] and sim.fire_truck['water'] > 0:
         draw_water_spray(rotation)
     # Water level indicator
     draw_truck_water_level()
     glPopMatrix()
 
-def draw_water_spray(rotation):
-    glDisable(GL_LIGHTING)
-    glPointSize(4.0)
-    glBegin(GL_POINTS)
-    angle_rad = math.radians(rotation)
-    spray_start = [1.0 * math.sin(1), 1.5, 1.0 * math.cos(1)]
-    spray_target = [SPRAY_DISTANCE * math.sin(1), 1.0, SPRAY_DISTANCE * math.cos(1)]
-    direction = [
-        spray_target[0] - spray_start[0],
-        spray_target[1] - spray_start[1],
-        spray_target[2] - spray_start[2]
-    ]
-    length = math.sqrt(direction[0]**2 + direction[1]**2 + direction[2]**2)
+def water_spray_points(rng, count=WATER_SPRAY_PARTICLES):
+    """Vertices and colours (float32 N x 3) of the water arc in truck space"""
+    spray_start = np.array([1.0 * math.sin(1), 1.5, 1.0 * math.cos(1)])
+    spray_target = np.array([SPRAY_DISTANCE * math.sin(1), 1.0, SPRAY_DISTANCE * math.cos(1)])
+    direction = spray_target - spray_start
+    length = np.sqrt(direction.dot(direction))
     if length > 0:
-        direction = [direction[0]/length, direction[1]/length, direction[2]/length]
-    particles = 100
-    for i in range(particles):
-        t = random.uniform(0, 1)
-        x_p = spray_start[0] + direction[0] * SPRAY_DISTANCE * t
-        y_p = spray_start[1] + direction[1] * SPRAY_DISTANCE * t - 0.5 * 9.8 * t**2
-        z_p = spray_start[2] + direction[2] * SPRAY_DISTANCE * t
-        x_p += random.uniform(-0.2, 0.2)
-        y_p += random.uniform(-0.2, 0.2)
-        z_p += random.uniform(-0.2, 0.2)
-        glColor3f(0.0, 0.7, 1.0)
-        glVertex3f(x_p, y_p, z_p)
-    glEnd()
-    glEnable(GL_LIGHTING)
+        direction = direction / length
+    t = rng.random((count, 1))
+    vertices = spray_start + direction * (SPRAY_DISTANCE * t) + rng.uniform(-0.2, 0.2, (count, 3))
+    vertices[:, 1] -= 0.5 * 9.8 * t[:, 0]**2
+    colors = np.empty((count, 3), dtype=np.float32)
+    colors[:] = WATER_SPRAY_COLOR
+    return vertices.astype(np.float32), colors
+
+def draw_water_spray(rotation):
+    vertices, colors = water_spray_points(render_rng)
+    draw_point_cloud(vertices, colors, 4.0)
 
 def draw_truck_water_level():
-    water_pct = fire_truck['water'] / WATER_CAPACITY
+    water_pct = sim.fire_truck['water'] / WATER_CAPACITY
     glPushMatrix()
     glTranslatef(0, 3.0, 0)
     glColor3f(0.2, 0.2, 0.2)
@@ -615,74 +590,116 @@ def draw_truck_water_level():
     glPopMatrix()
     glPopMatrix()
 
-def draw_shapes():
+def init_instancing():
+    """Set up the instanced renderer, returns False if this context can't run it"""
+    global instancer, instance_batches
+    if not instanced_drawing_supported():
+        print("Instanced drawing unavailable: needs GL 3.3 or ARB_instanced_arrays")
+        return False
+    try:
+        instancer = InstancedRenderer()
+    except RuntimeError as err:
+        print("Instanced drawing unavailable:", err)
+        return False
+    # Kinds with spheres get one batch per level of detail; hazards have none
+    instance_batches = {
+        'tree': dict((detail, instancer.batch(tree_mesh(detail))) for _, detail in LOD_LEVELS),
+        'person': dict((detail, instancer.batch(person_mesh(detail))) for _, detail in LOD_LEVELS),
+    }
+    for kind, mesh in hazard_meshes(INSTANCE_MESH_DETAIL).items():
+        instance_batches[kind] = {INSTANCE_MESH_DETAIL: instancer.batch(mesh)}
+    return True
+
+def set_visible_instances(kind, batches, positions, bounds, yaw=0.0):
+    """Upload the instances of one kind that pass the frustum test, split by detail"""
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+    visible, details = culler.select(kind, positions, *bounds)
+    yaw = np.broadcast_to(np.asarray(yaw, dtype=np.float32), (len(positions),))
+    for detail, batch in batches.items():
+        chosen = visible if len(batches) == 1 else visible[details == detail]
+        batch.set_instances(instance_rows(positions[chosen], yaw[chosen]))
+
+def draw_instanced_objects():
+    global instanced_layout, tree_positions
+    batches = instance_batches
+    if instanced_layout != sim.layout_version:
+        tree_positions = np.array(sim.trees, dtype=np.float32).reshape(-1, 3)
+        instanced_layout = sim.layout_version
+    # Re-culled every frame, so only what the camera sees is uploaded and drawn
+    set_visible_instances('tree', batches['tree'], tree_positions, TREE_BOUNDS)
+    set_visible_instances(
+        'person', batches['person'], people_positions(), PERSON_BOUNDS,
+        [person['rotation'] for person in sim.people],
+    )
+    standing = [hazard for hazard in sim.hazards if not hazard['cleared']]
+    for kind in HAZARD_TYPES:
+        set_visible_instances(
+            'hazard', batches[kind],
+            [hazard['position'] for hazard in standing if hazard['type'] == kind], HAZARD_BOUNDS[kind],
+        )
+    instancer.draw(*[batch for levels in batches.values() for batch in levels.values()])
+
+def foreign_gl():
+    """Context for GL calls the state shadow can't see (display lists, other modules)"""
+    if gl_state is None:
+        return contextlib.nullcontext()
+    return gl_state.foreign()
+
+def draw_static_scene():
     draw_ground()
     draw_all_roads()
     draw_all_water_stations()
+
+def draw_shapes():
+    # Recompiled only when the simulation swaps in a new layout
+    with foreign_gl():
+        static_scene(sim.layout_version)
     draw_all_houses()
-    draw_all_trees()
-    draw_all_hazards()
-    draw_all_people()
+    if instancer is not None:
+        with foreign_gl():
+            draw_instanced_objects()
+    else:
+        draw_all_trees()
+        draw_all_hazards()
+        draw_all_people()
     draw_fire_truck_and_effects()
 
 
 def keyboardListener(key, x, y):
-    global game_started, game_over, score, game_time, houses_saved, fire_truck
-    global view_mode_fps, cam_rotation, cam_distance, cam_elevation, last_time
-    global current_difficulty, lives
-    global tool_index, current_equipment
-    
-    if game_over:
+    global view_mode_fps, last_time, show_profile
+
+    if sim.game_over:
         if key == b'r' or key == b'R':
             # Restart the game
-            init_houses()
-            init_water_stations()
-            init_hazards()
-            fire_truck['position'] = [0, 0, 0]
-            fire_truck['rotation'] = 0
-            fire_truck['spraying'] = False
-            fire_truck['water'] = WATER_CAPACITY
-            score = 0
-            game_time = 0
-            houses_saved = 0
-            lives = MAX_LIVES
-            game_over = False
-            game_started = False
-            current_equipment = 'water_hose'
-            tool_index = 0
-            current_equipment = tool_keys[tool_index]
+            sim.restart()
     else:
         if key == b' ':  # Space bar
-            if not game_started:
-                game_started = True
+            if not sim.game_started:
                 last_time = time.time()
-                init_houses()
-                init_water_stations()
-                init_hazards()
+                sim.start()
             else:
-                fire_truck['spraying'] = not fire_truck['spraying']
+                sim.toggle_spray()
         elif key == b'v' or key == b'V':  # Toggle view mode
             view_mode_fps = not view_mode_fps
         elif key == b'd' or key == b'D':  # Change difficulty
-            difficulties = list(DIFFICULTY_LEVELS.keys())
-            current_index = difficulties.index(current_difficulty)
-            current_difficulty = difficulties[(current_index + 1) % len(difficulties)]
+            sim.cycle_difficulty()
         elif key == b'e' or key == b'E':  # 'E' to clear hazard
-            clear_hazard()
+            sim.clear_hazard()
         elif key == b'x' or key == b'X':  # Tab key cycles tools
-            tool_index = (tool_index + 1) % len(tool_keys)
-            current_equipment = tool_keys[tool_index]
-            notifications.append({'message': f"Selected: {tool_names.get(current_equipment, 'Unknown')}", 'timestamp': time.time()})
+            sim.cycle_tool()
+        elif (key == b'p' or key == b'P') and profiler.enabled:  # Profiler overlay
+            show_profile = not show_profile
         elif key == b'\x1b':  # ESC key
+            finish_profiling()
             sys.exit()
     
     # Force screen update
     glutPostRedisplay()
 
 def specialKeyListener(key, x, y):
-    global fire_truck, cam_rotation, cam_distance, cam_elevation
+    global cam_rotation, cam_distance, cam_elevation
     
-    if game_started and not game_over:
+    if sim.game_started and not sim.game_over:
         if not view_mode_fps:  # Third-person view controls
             if key == GLUT_KEY_UP:
                 cam_elevation = max(10.0, cam_elevation - 2.0)
@@ -697,35 +714,13 @@ def specialKeyListener(key, x, y):
         
         # Movement controls (same for both views)
         if key == GLUT_KEY_UP:
-            # Calculate movement based on current rotation
-            angle_rad = math.radians(fire_truck['rotation'])
-            # Move forward
-            new_x = fire_truck['position'][0] + TRUCK_SPEED * math.sin(angle_rad)
-            new_z = fire_truck['position'][2] + TRUCK_SPEED * math.cos(angle_rad)
-            
-            if not check_collision([new_x, 0, new_z]):
-                fire_truck['position'][0] = new_x
-                fire_truck['position'][2] = new_z
-        
+            sim.drive_truck(1)  # Move forward
         elif key == GLUT_KEY_DOWN:
-            
-            # Calculate movement based on current rotation
-            angle_rad = math.radians(fire_truck['rotation'])
-            # Move backward
-            new_x = fire_truck['position'][0] - TRUCK_SPEED * math.sin(angle_rad)
-            new_z = fire_truck['position'][2] - TRUCK_SPEED * math.cos(angle_rad)
-            
-            if not check_collision([new_x, 0, new_z]):
-                fire_truck['position'][0] = new_x
-                fire_truck['position'][2] = new_z
-        
+            sim.drive_truck(-1)  # Move backward
         elif key == GLUT_KEY_LEFT:
-            # Turn left
-            fire_truck['rotation'] = (fire_truck['rotation'] + 5) % 360
-        
+            sim.turn_truck(5)  # Turn left
         elif key == GLUT_KEY_RIGHT:
-            # Turn right
-            fire_truck['rotation'] = (fire_truck['rotation'] - 5) % 360
+            sim.turn_truck(-5)  # Turn right
         
         glutPostRedisplay()
 
@@ -735,13 +730,13 @@ def mouseListener(button, state, x, y):
 def setupCamera():
     glMatrixMode(GL_PROJECTION)
     glLoadIdentity()
-    gluPerspective(fovY, 1.25, 0.1, 1500)
+    gluPerspective(fovY, CAMERA_ASPECT, CAMERA_NEAR, CAMERA_FAR)
     glMatrixMode(GL_MODELVIEW)
     glLoadIdentity()
     
     # Camera position based on fire truck
-    x, y, z = fire_truck['position']
-    rotation = fire_truck['rotation']
+    x, y, z = sim.fire_truck['position']
+    rotation = sim.fire_truck['rotation']
     
     if view_mode_fps:
         # First-person view - camera in driver's seat
@@ -755,11 +750,8 @@ def setupCamera():
         target_y = eye_y  # Keep same height
         target_z = z + 10.0 * math.cos(angle_rad)
         
-        gluLookAt(
-            eye_x, eye_y, eye_z,  # Camera position
-            target_x, target_y, target_z,  # Look at point
-            0, 1, 0   # Up vector
-        )
+        eye = (eye_x, eye_y, eye_z)
+        target = (target_x, target_y, target_z)
     else:
         # Third-person view - camera follows behind truck
         angle_rad = math.radians(rotation)
@@ -769,155 +761,29 @@ def setupCamera():
         cam_y = y + cam_elevation
         cam_z = z - cam_distance * math.cos(angle_rad)
         
-        gluLookAt(
-            cam_x, cam_y, cam_z,  # Camera position
-            x, y + 2.0, z,  # Look at truck
-            0, 1, 0   # Up vector
-        )
-
-def idle():
-    global game_time, last_time, houses_saved, game_over, fire_truck, last_fire_pop_time, scene_time
-    global notifications, last_notification_time, score, lives
-    global last_houses_destroyed  # Add this global tracker
-    global current_difficulty, lives, current_equipment, tool_index
-
-    # Calculate delta time
-    current_time = time.time()
-    delta_time = current_time - last_time
-    last_time = current_time
-    scene_time = (scene_time + 0.01) % 24.0
-
-    if not game_over and game_started:
-        game_time += delta_time
-
-        # Update score based on time remaining
-        score += int(SCORE_PER_SECOND * delta_time)
-
-        # --- 1. Game over if time runs out ---
-        if game_time >= DIFFICULTY_LEVELS[current_difficulty]['time_limit']:
-            game_over = True
-            notifications.append({
-                'message': "Game Over: Time's up!",
-                'timestamp': current_time
-            })
-
-        # Update wind, fire, particles, notifications, etc.
-        update_wind()
-        update_fire_spread()
-        update_structural_integrity()
-        update_particles()
-        update_notifications(current_time)
-
-        # Random fire popping with minimum interval
-        if current_time - last_fire_pop_time >= FIRE_POP_INTERVAL:
-            if random.random() < 0.1 * DIFFICULTY_LEVELS[current_difficulty]['fire_rate']:
-                pop_random_fire()
-                last_fire_pop_time = current_time
-
-        # Update fire truck water level if spraying
-        if fire_truck['spraying'] and fire_truck['water'] > 0:
-            fire_truck['water'] = max(0, fire_truck['water'] - WATER_USAGE_RATE)
-            for house in houses:
-                if house['on_fire']:
-                    dx = house['position'][0] - fire_truck['position'][0]
-                    dz = house['position'][2] - fire_truck['position'][2]
-                    distance = math.sqrt(dx*dx + dz*dz)
-                    if distance < SPRAY_DISTANCE:
-                        angle_rad = math.radians(fire_truck['rotation'])
-                        spray_dir_x = math.sin(angle_rad)
-                        spray_dir_z = math.cos(angle_rad)
-                        house_dir_x = dx / distance if distance > 0 else 0
-                        house_dir_z = dz / distance if distance > 0 else 0
-                        dot_product = house_dir_x * spray_dir_x + house_dir_z * spray_dir_z
-                        if dot_product > 0.7:
-                            # --- ENFORCE CORRECT TOOL ---
-                            fire_type = house['fire_type']
-                            required_equipment = None
-                            if fire_type == 'CLASS_A':
-                                required_equipment = 'water_hose'
-                            elif fire_type == 'CLASS_B':
-                                required_equipment = 'foam_sprayer'
-                            elif fire_type == 'CLASS_C':
-                                required_equipment = 'dry_chemical'
-                            elif fire_type == 'CLASS_D':
-                                required_equipment = 'dry_powder'
-                            # Check if correct tool is selected
-                            if current_equipment == required_equipment and fire_truck['equipment'][current_equipment]['condition'] > 0:
-                                house['fire_intensity'] = max(0, house['fire_intensity'] - WATER_HEAL * delta_time * 0.5)
-                                if house['fire_intensity'] <= 0:
-                                    house['on_fire'] = False
-                                    house['fire_intensity'] = 0
-                                    houses_saved += 1
-                                    score += SCORE_PER_HOUSE
-                                fire_truck['equipment'][current_equipment]['condition'] -= 0.1
-                                if fire_truck['equipment'][current_equipment]['condition'] <= 0:
-                                    fire_truck['equipment'][current_equipment]['effectiveness'] = 0
-                            else:
-                                # Wrong tool: show notification (only once per attempt)
-                                if not hasattr(idle, "last_wrong_tool_time"):
-                                    idle.last_wrong_tool_time = 0
-                                if time.time() - idle.last_wrong_tool_time > 1.5:
-                                    tool_hint = tool_names.get(required_equipment, "Correct Tool")
-                                    fire_class = fire_type.replace('CLASS_', 'Class ')
-                                    notifications.append({
-                                        'message': f"Wrong tool! Use {tool_hint} for {fire_class} fire.",
-                                        'timestamp': time.time()
-                                    })
-                                    idle.last_wrong_tool_time = time.time()
-
-
-        # Automatic water refill when near water stations
-        for station in water_stations:
-            dx = station['position'][0] - fire_truck['position'][0]
-            dz = station['position'][2] - fire_truck['position'][2]
-            distance = math.sqrt(dx*dx + dz*dz)
-            if distance < WATER_REFILL_DISTANCE:
-                fire_truck['water'] = WATER_CAPACITY
-                break
-
-        houses_destroyed = sum(1 for house in houses if house['health'] <= 0)
-        if not hasattr(idle, "last_houses_destroyed"):
-            idle.last_houses_destroyed = 0  # static variable for tracking
-
-        if houses_destroyed > NUM_HOUSES / 2 and not game_over:
-            # Only lose a life when a new house is destroyed past the threshold
-            if houses_destroyed > idle.last_houses_destroyed:
-                lives -= 1
-                print("Lives decremented! Now:", lives)  
-                if lives <= 0:
-                    game_over = True
-                    notifications.append({
-                        'message': "Game Over: All lives lost!",
-                        'timestamp': current_time
-                    })
-                else:
-                    notifications.append({
-                        'message': f"Lost a life! {lives} remaining",
-                        'timestamp': current_time
-                    })
-            idle.last_houses_destroyed = houses_destroyed
-
-        # If lives reach zero (from any cause), game over
-        if lives <= 0 and not game_over:
-            game_over = True
-            notifications.append({
-                'message': "Game Over: All lives lost!",
-                'timestamp': current_time
-            })
-
-        # Update people movement
-        update_people()
-
-    glutPostRedisplay()
+        eye = (cam_x, cam_y, cam_z)
+        target = (x, y + 2.0, z)  # Look at truck
+
+    sim.set_viewpoint(eye)
+    gluLookAt(
+        eye[0], eye[1], eye[2],  # Camera position
+        target[0], target[1], target[2],  # Look at point
+        0, 1, 0   # Up vector
+    )
+    # Same numbers as above, so culling matches what GL draws
+    culler.begin_frame(Frustum.from_camera(
+        fovY, CAMERA_ASPECT, CAMERA_NEAR, CAMERA_FAR, eye, target, (0, 1, 0),
+        viewport_height=glGetIntegerv(GL_VIEWPORT)[3],
+    ))
 
 
 def get_day_factor():
     # Returns 1.0 at noon, 0.0 at midnight
     # Shift so 6.0 is sunrise, 18.0 is sunset
-    return max(0.0, math.cos((scene_time - 6) / 12.0 * math.pi))
+    return max(0.0, math.cos((sim.scene_time - 6) / 12.0 * math.pi))
 
 def showScreen():
-    global camera_pos
+    global camera_pos, gl_state_counts
     
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
     glLoadIdentity()
@@ -941,12 +807,15 @@ def showScreen():
     setupCamera()
     
     # Draw the scene
-    draw_shapes()
+    with profiler.zone('draw_shapes'):
+        draw_shapes()
     
     # Draw particles
-    draw_particles()
+    with profiler.zone('draw_particles'):
+        draw_particles()
     
     # Draw HUD
+    profiler.begin('hud')
     glMatrixMode(GL_PROJECTION)
     glPushMatrix()
     glLoadIdentity()
@@ -958,504 +827,148 @@ def showScreen():
     # Left side: All game stats
 
     # Water level calculation
-    water_level = int(fire_truck['water'])
-    water_pct = fire_truck['water'] / WATER_CAPACITY
+    water_level = int(sim.fire_truck['water'])
+    water_pct = sim.fire_truck['water'] / WATER_CAPACITY
 
     # Choose color for water level (blue if safe, red if low)
     if water_level > 60:
-        glColor3f(0.0, 0.7, 1.0)  # Blue
+        water_color = (0.0, 0.7, 1.0)  # Blue
     else:
-        glColor3f(1.0, 0.0, 0.0)  # Red
+        water_color = (1.0, 0.0, 0.0)  # Red
 
-    draw_text(10, 550, f"WATER: {water_level}")
+    draw_text(10, 550, f"WATER: {water_level}", color=water_color)
 
     # Show warning if water is low
-    if water_level <= 60:
-        glColor3f(1.0, 0.0, 0.0)  # Bright red for warning
-        # draw_text(10, 520, "REFILL WATER SOON!", GLUT_BITMAP_HELVETICA_18)
+    # if water_level <= 60:
+    #     draw_text(10, 520, "REFILL WATER SOON!", color=(1.0, 0.0, 0.0))  # Bright red
 
     # The rest of your HUD (keep yellow for other stats)
-    glColor3f(1.0, 1.0, 0.0)
-    draw_text(10, 750, f"TIME REMAINING: {int(TIME_LIMIT - game_time)}s")
-    draw_text(10, 700, f"SAVED: {houses_saved}/{NUM_HOUSES}")
-    draw_text(10, 650, f"SCORE: {score}")
-    draw_text(10, 600, f"LIVES: {lives}")
-    draw_text(10, 500, f"TOOL: {tool_names.get(current_equipment, 'Unknown')}")
-    draw_text(10, 60, f"CLOCK: {int(scene_time):02d}:00")
+    yellow = (1.0, 1.0, 0.0)
+    draw_text(10, 750, f"TIME REMAINING: {int(TIME_LIMIT - sim.game_time)}s", color=yellow)
+    draw_text(10, 700, f"SAVED: {sim.houses_saved}/{NUM_HOUSES}", color=yellow)
+    draw_text(10, 650, f"SCORE: {sim.score}", color=yellow)
+    draw_text(10, 600, f"LIVES: {sim.lives}", color=yellow)
+    draw_text(10, 500, f"TOOL: {tool_names.get(sim.current_equipment, 'Unknown')}", color=yellow)
+    draw_text(10, 60, f"CLOCK: {int(sim.scene_time):02d}:00", color=yellow)
 
     # Show recent notifications (last 3, for example)
-    glColor3f(1.0, 0.5, 0.0)  # Orange for notifications
+    orange = (1.0, 0.5, 0.0)  # Orange for notifications
     y = 400  # Start near the center or top
-    for n in notifications[-3:]:
-        draw_text(20, y, n['message'])
+    for n in sim.notifications[-3:]:
+        draw_text(20, y, n['message'], color=orange)
         y -= 30  # Move down for each message
 
     
     # Center: Game state messages
-    if not game_started:
+    if not sim.game_started:
         # Center the start message
         text = "PRESS SPACE TO START"
-        text_width = len(text) * 12  # Approximate width of text
-        x_pos = (1000 - text_width) / 2
-        draw_text(x_pos, 400, text, GLUT_BITMAP_TIMES_ROMAN_24)
-    elif game_over:
+        x_pos = (1000 - text_width(text, GLUT_BITMAP_TIMES_ROMAN_24)) / 2
+        draw_text(x_pos, 400, text, GLUT_BITMAP_TIMES_ROMAN_24, orange)
+    elif sim.game_over:
         # Calculate final performance rating
-        calculate_performance_rating()
+        sim.calculate_performance_rating()
         
         # Center the game over message with performance rating
-        if houses_saved == NUM_HOUSES:
-            text = f"VICTORY! Score: {score} Rating: {performance_rating}%"
+        if sim.houses_saved == NUM_HOUSES:
+            text = f"VICTORY! Score: {sim.score} Rating: {sim.performance_rating}%"
         else:
-            text = f"GAME OVER! Score: {score} Rating: {performance_rating}%"
-        text_width = len(text) * 12  # Approximate width of text
-        x_pos = (1000 - text_width) / 2
-        draw_text(x_pos, 400, text, GLUT_BITMAP_TIMES_ROMAN_24)
+            text = f"GAME OVER! Score: {sim.score} Rating: {sim.performance_rating}%"
+        x_pos = (1000 - text_width(text, GLUT_BITMAP_TIMES_ROMAN_24)) / 2
+        draw_text(x_pos, 400, text, GLUT_BITMAP_TIMES_ROMAN_24, orange)
+
+    if show_profile:
+        draw_profile_overlay()
+
+    if text_renderer is not None:
+        with foreign_gl():
+            text_renderer.flush()
     
     glPopMatrix()
     glMatrixMode(GL_PROJECTION)
     glPopMatrix()
     glMatrixMode(GL_MODELVIEW)
-    
-    glutSwapBuffers()
 
-def init_houses():
-    global houses
-    houses = []
-    
-    # House positions along the roads
-    house_positions = [
-        # Houses along horizontal road
-        (-60, -15), (-40, -15), (-20, -15), (20, -15), (40, -15), (60, -15),  # Left side
-        (-60, 15), (-40, 15), (-20, 15), (20, 15), (40, 15), (60, 15),  # Right side
-        
-        # Houses along vertical road
-        (-15, -60), (-15, -40), (-15, -20), (-15, 20), (-15, 40), (-15, 60),  # Bottom side
-        (15, -60), (15, -40), (15, -20), (15, 20), (15, 40), (15, 60),  # Top side
-    ]
-    
-    # Select random positions for the initial houses
-    selected_positions = random.sample(house_positions, NUM_HOUSES)
-    
-    for i, (x, z) in enumerate(selected_positions):
-        # Random fire type for the house
-        fire_type = random.choice(list(FIRE_TYPES.keys()))
-        
-        # Start with no houses on fire
-        house = {
-            'position': [x, 0, z],
-            'health': MAX_HEALTH,
-            'structural_integrity': MAX_HEALTH,
-            'on_fire': False,  # Start with no houses on fire
-            'fire_intensity': 0,
-            'fire_type': fire_type,
-            'smoke_level': 0,
-            'flammability': random.uniform(0.5, 1.0),
-            'fire_spread_timer': 0,
-            'fire_spread_cooldown': random.uniform(1.0, 3.0),
-            'collapse_risk': 0
-        }
-        houses.append(house)
-
-def init_water_stations():
-    global water_stations
-    water_stations = []
-    
-    # Add water stations at intersections
-    water_stations.append({'position': [0, 0, 0], 'capacity': WATER_CAPACITY})  # Center
-    water_stations.append({'position': [WATER_STATION_DISTANCE, 0, WATER_STATION_DISTANCE], 'capacity': WATER_CAPACITY})  # Top right
-    water_stations.append({'position': [-WATER_STATION_DISTANCE, 0, WATER_STATION_DISTANCE], 'capacity': WATER_CAPACITY})  # Top left
-    water_stations.append({'position': [WATER_STATION_DISTANCE, 0, -WATER_STATION_DISTANCE], 'capacity': WATER_CAPACITY})  # Bottom right
-    water_stations.append({'position': [-WATER_STATION_DISTANCE, 0, -WATER_STATION_DISTANCE], 'capacity': WATER_CAPACITY})  # Bottom left
-
-def init_hazards():
-    global hazards
-    hazards = []
-    hazard_types = ['fallen_tree', 'power_line', 'debris', 'vehicle', 'collapsed_structure']
-    for _ in range(7):  # Add as many as you want
-        x = random.randint(-WORLD_SIZE//2 + 5, WORLD_SIZE//2 - 5)
-        z = random.randint(-WORLD_SIZE//2 + 5, WORLD_SIZE//2 - 5)
-        hazard_type = random.choice(hazard_types)
-        hazards.append({'position': [x, 0, z], 'type': hazard_type, 'cleared': False})
-
-def check_collision(new_pos):
-    # Check collision with houses
-    for house in houses:
-        if house['health'] > 0:  # Only consider standing houses
-            house_pos = house['position']
-            dx = new_pos[0] - house_pos[0]
-            dz = new_pos[2] - house_pos[2]
-            distance = math.sqrt(dx**2 + dz**2)
-            if distance < COLLISION_DISTANCE:
-                return True
-
-    # Check collision with trees
-    for tree_pos in trees:
-        dx = new_pos[0] - tree_pos[0]
-        dz = new_pos[2] - tree_pos[2]
-        distance = math.sqrt(dx**2 + dz**2)
-        if distance < COLLISION_DISTANCE:
-            return True
-        
-        # Check collision with hazards
-    for hazard in hazards:
-        if not hazard['cleared']:
-            hx, hy, hz = hazard['position']
-            dx = new_pos[0] - hx
-            dz = new_pos[2] - hz
-            distance = math.sqrt(dx**2 + dz**2)
-            if distance < COLLISION_DISTANCE:
-                return True
-
-    # Check world boundaries
-    if (abs(new_pos[0]) > WORLD_SIZE - 5 or
-        abs(new_pos[2]) > WORLD_SIZE - 5):
-        return True
-
-    return False
-
-
-def create_fire_particle(position, fire_type):
-    return {
-        'position': list(position),
-        'velocity': [
-            random.uniform(-0.2, 0.2) + WIND_DIRECTION[0] * WIND_SPEED * random.uniform(0.8, 1.2),
-            random.uniform(0.2, 0.5),
-            random.uniform(-0.2, 0.2) + WIND_DIRECTION[2] * WIND_SPEED * random.uniform(0.8, 1.2)
-        ],
-        'size': random.uniform(0.15, 0.35),
-        'life': 1.0,
-        'color': FIRE_TYPES[fire_type]['color'],
-        'type': fire_type
-    }
-
-def create_smoke_particle(position):
-    return {
-        'position': list(position),
-        'velocity': [
-            random.uniform(-0.1, 0.1) + WIND_DIRECTION[0] * WIND_SPEED,
-            random.uniform(0.1, 0.25),
-            random.uniform(-0.1, 0.1) + WIND_DIRECTION[2] * WIND_SPEED
-        ],
-        'size': random.uniform(0.25, 0.5),
-        'life': 1.0,
-        'density': random.uniform(0.3, 0.7)
+    profiler.end('hud')
+
+    if gl_state is not None:
+        gl_state_counts = gl_state.reset_counters()
+    with profiler.zone('swap'):
+        glutSwapBuffers()
+    if profiler.enabled:
+        profiler.end_frame(**entity_counts())
+
+def entity_counts():
+    """Load of the frame just drawn, recorded with its timings"""
+    drawn, culled = culler.totals()
+    counts = {
+        'burning_houses': int(np.count_nonzero(sim.houses.on_fire)),
+        'fire_particles': len(sim.fire_particles),
+        'smoke_particles': len(sim.smoke_particles),
+        'people': len(sim.people),
+        'hazards': sum(1 for hazard in sim.hazards if not hazard['cleared']),
+        'objects_drawn': drawn,
+        'objects_culled': culled,
+        'gl_calls_dropped': sum(gl_state_counts[1].values()),
     }
-
-
-def update_particles():
-    global fire_particles, smoke_particles
-    # Fire particles
-    new_fire_particles = []
-    for particle in fire_particles:
-        particle['life'] -= 0.025
-        # Flicker
-        particle['position'][0] += particle['velocity'][0] + random.uniform(-0.02, 0.02)
-        particle['position'][1] += particle['velocity'][1] + random.uniform(-0.01, 0.03)
-        particle['position'][2] += particle['velocity'][2] + random.uniform(-0.02, 0.02)
-        if particle['life'] > 0:
-            new_fire_particles.append(particle)
-    fire_particles = new_fire_particles
-    # Smoke particles
-    new_smoke_particles = []
-    for particle in smoke_particles:
-        particle['life'] -= 0.012
-        particle['density'] -= SMOKE_DISSIPATION_RATE * random.uniform(0.8, 1.2)
-        for i in range(3):
-            particle['position'][i] += particle['velocity'][i] + random.uniform(-0.01, 0.01)
-        if particle['life'] > 0 and particle['density'] > 0:
-            new_smoke_particles.append(particle)
-    smoke_particles = new_smoke_particles
-
+    if accounting.enabled():
+        counts['gl_calls'] = accounting.stats.frameCalls()
+    return counts
+
+def draw_profile_overlay():
+    global profile_lines
+    if not profile_lines or len(profiler.records) % PROFILE_OVERLAY_REFRESH == 0:
+        profile_lines = profiler.summary_lines()
+    y = 780
+    for line in profile_lines:
+        draw_text(560, y, line, GLUT_BITMAP_8_BY_13, (1.0, 1.0, 1.0))
+        y -= 16
+
+def finish_profiling():
+    """Write the --profile-json/--profile-csv exports (once)"""
+    global profile_options
+    if profile_options is None:
+        return
+    options, profile_options = profile_options, None
+    if options.profile_json:
+        profiler.export_json(options.profile_json)
+    if options.profile_csv:
+        profiler.export_csv(options.profile_csv)
+    if profiler.records:
+        frame = profiler.percentiles(profiler.records).get('frame_ms')
+        if frame:
+            print("Profiled %d frames: p50 %.2f ms, p95 %.2f ms, p99 %.2f ms" % (
+                len(profiler.records), frame['p50'], frame['p95'], frame['p99']))
+
+def report_gl_calls(count):
+    """Print the ``count`` GL entry points that took most time per frame"""
+    if accounting.stats.frames:
+        print(accounting.report(count))
+        print(accounting.report(count, key='count'))
 
 def draw_particles():
-    glDisable(GL_LIGHTING)
-    glEnable(GL_BLEND)
-    # Fire: Additive blending for glow
-    glBlendFunc(GL_SRC_ALPHA, GL_ONE)
-    for particle in fire_particles:
-        glPushMatrix()
-        glTranslatef(*particle['position'])
-        r, g, b = particle['color']
-        glColor4f(r, g, b, particle['life'])
-        size = particle['size']
-        glBegin(GL_QUADS)
-        glVertex3f(-size, -size, 0)
-        glVertex3f(size, -size, 0)
-        glVertex3f(size, size, 0)
-        glVertex3f(-size, size, 0)
-        glEnd()
-        glPopMatrix()
-    # Smoke: Alpha blending for softness
-    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-    for particle in smoke_particles:
-        glPushMatrix()
-        glTranslatef(*particle['position'])
-        alpha = particle['life'] * particle['density']
-        glColor4f(0.3, 0.3, 0.3, alpha)
-        size = particle['size']
-        glBegin(GL_QUADS)
-        glVertex3f(-size, -size, 0)
-        glVertex3f(size, -size, 0)
-        glVertex3f(size, size, 0)
-        glVertex3f(-size, size, 0)
-        glEnd()
-        glPopMatrix()
-    glDisable(GL_BLEND)
-    glEnable(GL_LIGHTING)
+    # Fire glows (additive), smoke softens (alpha blended); one draw call each
+    with foreign_gl():
+        particle_renderer.draw(
+            {'additive': [sim.fire_particles], 'alpha': [sim.smoke_particles]},
+            scheduler.particle_lead(),
+        )
 
-    
-    # Draw smoke particles
-    for particle in smoke_particles:
-        glPushMatrix()
-        glTranslatef(*particle['position'])
-        
-        # Set color with alpha based on life and density
-        alpha = particle['life'] * particle['density']
-        glColor4f(0.3, 0.3, 0.3, alpha)
-        
-        # Draw particle as a billboard
-        size = particle['size']
-        glBegin(GL_QUADS)
-        glVertex3f(-size, -size, 0)
-        glVertex3f(size, -size, 0)
-        glVertex3f(size, size, 0)
-        glVertex3f(-size, size, 0)
-        glEnd()
-        
-        glPopMatrix()
-    glEnable(GL_LIGHTING)
 
-def update_wind():
-    global WIND_DIRECTION, WIND_SPEED
-    # Randomly change wind direction and speed
-    if random.random() < 0.01:  # 1% chance per frame
-        angle = random.uniform(-math.pi/4, math.pi/4)
-        WIND_DIRECTION = [
-            WIND_DIRECTION[0] * math.cos(angle) - WIND_DIRECTION[2] * math.sin(angle),
-            0,
-            WIND_DIRECTION[0] * math.sin(angle) + WIND_DIRECTION[2] * math.cos(angle)
-        ]
-        # Normalize direction
-        length = math.sqrt(sum(x*x for x in WIND_DIRECTION))
-        WIND_DIRECTION = [x/length for x in WIND_DIRECTION]
-        
-        # Randomly change wind speed
-        WIND_SPEED = random.uniform(0.5, 2.0)
+def idle():
+    global last_time
 
-def update_fire_spread():
-    global houses, fire_particles, smoke_particles
-    
-    for house in houses:
-        if house['on_fire']:
-            # Update fire intensity - make it grow over time
-            house['fire_intensity'] = min(1.0, house['fire_intensity'] + 0.001)
-            
-            # Generate more fire and smoke particles
-            if random.random() < 0.5:  # Increased chance for particles
-                fire_particles.append(create_fire_particle(
-                    [house['position'][0] + random.uniform(-2, 2),
-                     house['position'][1] + random.uniform(2, 4),
-                     house['position'][2] + random.uniform(-2, 2)],
-                    house['fire_type']
-                ))
-            
-            if random.random() < 0.3:  # Increased chance for smoke
-                smoke_particles.append(create_smoke_particle(
-                    [house['position'][0] + random.uniform(-2, 2),
-                     house['position'][1] + random.uniform(3, 5),
-                     house['position'][2] + random.uniform(-2, 2)]
-                ))
-            
-            # Update smoke level
-            house['smoke_level'] = min(MAX_SMOKE_DENSITY, house['smoke_level'] + 0.01)
-            
-            # Try to spread fire to nearby houses
-            house['fire_spread_timer'] += 1
-            if house['fire_spread_timer'] >= house['fire_spread_cooldown']:
-                house['fire_spread_timer'] = 0
-                
-                for other_house in houses:
-                    if other_house != house and not other_house['on_fire']:
-                        # Calculate distance between houses
-                        dx = other_house['position'][0] - house['position'][0]
-                        dz = other_house['position'][2] - house['position'][2]
-                        distance = math.sqrt(dx*dx + dz*dz)
-                        
-                        if distance < FIRE_SPREAD_RADIUS:
-                            # Calculate spread probability based on distance, wind, and flammability
-                            wind_factor = (dx * WIND_DIRECTION[0] + dz * WIND_DIRECTION[2]) / distance
-                            spread_prob = (FIRE_SPREAD_PROBABILITY * 
-                                         (1 - distance/FIRE_SPREAD_RADIUS) * 
-                                         (1 + wind_factor) * 
-                                         other_house['flammability'])
-                            
-                            if random.random() < spread_prob:
-                                other_house['on_fire'] = True
-                                other_house['fire_intensity'] = 0.1
-                                other_house['fire_type'] = house['fire_type']
-
-def update_structural_integrity():
-    for house in houses:
-        if house['on_fire']:
-            # Reduce structural integrity based on fire intensity
-            damage = FIRE_DAMAGE * house['fire_intensity']
-            house['structural_integrity'] = max(0, house['structural_integrity'] - damage)
-            
-            # If structural integrity is too low, house collapses
-            if house['structural_integrity'] < 20:
-                house['health'] = 0
-                house['on_fire'] = False
-                house['fire_intensity'] = 0
-                house['smoke_level'] = 0
-
-def update_notifications(current_time):
-    global notifications, last_notification_time, NOTIFICATION_DURATION
-    
-    # Check for new notifications
-    # if current_time - last_notification_time >= NOTIFICATION_DURATION:
-    #     # Generate a new notification
-    #     # notification = {
-    #     #     'message': f"Time remaining: {int(TIME_LIMIT - game_time)}s",
-    #     #     'timestamp': current_time
-    #     # }
-    #     # notifications.append(notification)
-    #     last_notification_time = current_time
-
-def calculate_performance_rating():
-    global performance_rating
-    # Base rating on houses saved, time remaining, and lives
-    houses_ratio = houses_saved / NUM_HOUSES
-    time_ratio = (TIME_LIMIT - game_time) / TIME_LIMIT
-    lives_ratio = lives / MAX_LIVES
-    
-    # Weighted average
-    performance_rating = int((houses_ratio * 0.5 + time_ratio * 0.3 + lives_ratio * 0.2) * 100)
+    # Calculate delta time
+    current_time = time.time()
+    delta_time = current_time - last_time
+    last_time = current_time
 
-def init_trees_and_people():
-    global trees, people
-    
-    # Initialize trees
-    trees = []
-    for _ in range(20):  # Add 20 trees
-        # Random position, avoiding roads and houses
-        while True:
-            x = random.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10)
-            z = random.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10)
-            
-            # Check if position is not on road or too close to houses
-            if (abs(x) > ROAD_WIDTH/2 + 5 and abs(z) > ROAD_WIDTH/2 + 5 and
-                not any(abs(x - h['position'][0]) < 10 and abs(z - h['position'][2]) < 10 for h in houses)):
-                break
-        
-        trees.append([x, 0, z])
-    
-    # Initialize people
-    people = []
-    for _ in range(10):  # Add 10 people
-        # Random position, avoiding roads and houses
-        while True:
-            x = random.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10)
-            z = random.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10)
-            
-            # Check if position is not on road or too close to houses
-            if (abs(x) > ROAD_WIDTH/2 + 5 and abs(z) > ROAD_WIDTH/2 + 5 and
-                not any(abs(x - h['position'][0]) < 10 and abs(z - h['position'][2]) < 10 for h in houses)):
-                break
-        
-        people.append({
-            'position': [x, 0, z],
-            'rotation': random.uniform(0, 360),
-            'speed': random.uniform(0.1, 0.3),
-            'target': [random.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10),
-                     0,
-                     random.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10)]
-        })
-
-def update_people():
-    for person in people:
-        # Move person towards their target
-        dx = person['target'][0] - person['position'][0]
-        dz = person['target'][2] - person['position'][2]
-        distance = math.sqrt(dx*dx + dz*dz)
-        
-        if distance < 1.0:  # If reached target, set new target
-            person['target'] = [random.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10),
-                              0,
-                              random.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10)]
-        else:
-            # Move towards target
-            speed = person['speed']
-            person['position'][0] += (dx/distance) * speed
-            person['position'][2] += (dz/distance) * speed
-            
-            # Update rotation to face movement direction
-            person['rotation'] = math.degrees(math.atan2(dx, dz))
-
-def clear_hazard():
-    """
-    Attempts to clear the nearest uncleared hazard within range of the fire truck.
-    Optionally, you can add more logic for different hazard types or require a 'hold' action.
-    """
-    global hazards, fire_truck, score, notifications
-
-    CLEAR_DISTANCE = COLLISION_DISTANCE + 2  # Allow some leeway for clearing
-
-    # Find all uncleared hazards within range
-    candidates = []
-    for hazard in hazards:
-        if not hazard['cleared']:
-            hx, hy, hz = hazard['position']
-            dx = fire_truck['position'][0] - hx
-            dz = fire_truck['position'][2] - hz
-            distance = math.sqrt(dx**2 + dz**2)
-            if distance < CLEAR_DISTANCE:
-                candidates.append((distance, hazard))
-
-    if candidates:
-        # Pick the closest hazard
-        candidates.sort(key=lambda tup: tup[0])
-        _, nearest_hazard = candidates[0]
-        nearest_hazard['cleared'] = True
-
-        # Optional: Award points or give feedback based on hazard type
-        hazard_type = nearest_hazard['type']
-        points = 0
-        msg = "Cleared obstacle!"
-        if hazard_type == 'fallen_tree':
-            points = 100
-            msg = "Fallen tree cleared!"
-        elif hazard_type == 'power_line':
-            points = 150
-            msg = "Power line hazard cleared!"
-        elif hazard_type == 'debris':
-            points = 80
-            msg = "Debris cleared!"
-        elif hazard_type == 'vehicle':
-            points = 120
-            msg = "Abandoned vehicle cleared!"
-        elif hazard_type == 'collapsed_structure':
-            points = 200
-            msg = "Collapsed structure cleared!"
-
-        score += points
-        notifications.append({'message': f"{msg} (+{points} pts)", 'timestamp': time.time()})
-        return True  # Successfully cleared a hazard
+    scheduler.advance(delta_time)
 
-    else:
-        # Optional: Feedback if no hazard is in range
-        notifications.append({'message': "No obstacle nearby to clear!", 'timestamp': time.time()})
-        return False
+    glutPostRedisplay()
 
-def main():
-    global last_time, last_fire_pop_time, fires_occurred
-    
-    glutInit(sys.argv)
-    glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
-    glutInitWindowSize(1000, 800)
-    glutInitWindowPosition(0, 0)
-    glutCreateWindow(b"Fire Fighter 3D")
-    
-    # Set up OpenGL
+def init_gl():
+    """Fixed GL state the game draws with; needs a current context"""
     glClearColor(0.53, 0.81, 0.92, 1.0)  # Sky blue background
     glEnable(GL_DEPTH_TEST)
     glEnable(GL_LIGHTING)
@@ -1465,17 +978,96 @@ def main():
     
     # Set up light position
     glLightfv(GL_LIGHT0, GL_POSITION, [10.0, 10.0, 10.0, 1.0])
+
+def init_game(args):
+    """Create the simulation and renderers for parsed options; needs a current context"""
+    global sim, scheduler, render_rng, static_scene, particle_renderer, text_renderer, gl_state
+    global profile_options, show_profile
+
+    if not args.no_state_shadow:
+        # Every glEnable, glColor3f, ... in this module now goes through the shadow
+        gl_state = StateShadow()
+        gl_state.install(globals())
+        for name in GLUT_SOLIDS:
+            glut_solids[name] = globals()[name]
+            globals()[name] = gl_state.foreign(server=False)(glut_solids[name])
+    sim = Simulation(**simulation_options(args))
+    scheduler = FixedTimestep(sim, args.tick_rate, args.max_catch_up)
+    render_rng = sim.streams.numpy('render')
+    with foreign_gl():
+        static_scene = StaticSceneCache(draw_static_scene)
+        particle_renderer = BillboardRenderer()
+        try:
+            text_renderer = TextRenderer(HUD_FONTS)
+        except ValueError as error:
+            print(f"Glyph atlas unavailable ({error}); drawing text with glutBitmapCharacter")
+        if not args.no_instancing:
+            init_instancing()
+    if args.profile or args.profile_overlay or args.profile_json or args.profile_csv:
+        profiler.enabled = True
+        profiler.instrument(scheduler, 'advance', zone='simulation')
+        profiler.instrument(sim, SIM_STAGES)
+        show_profile = args.profile_overlay
+        profile_options = args
+        atexit.register(finish_profiling)
+    debug_output = None
+    if args.gl_debug_output:
+        # Driver messages to the OpenGL.error.debug log instead of glGetError after every call
+        debug_output = gl_error.useDebugOutput(raiseErrors=False)
+        if debug_output is None:
+            print("GL debug output unavailable; checking glGetError instead")
+    if args.deferred_gl_errors and debug_output is None:
+        # Check glGetError once a frame (and after glEnd), logging the calls behind any error
+        gl_error.deferErrors(raiseErrors=False)
+    if args.gl_calls:
+        if accounting.enabled():
+            atexit.register(report_gl_calls, args.gl_calls)
+        else:
+            print("--gl-calls needs PYOPENGL_CALL_ACCOUNTING=1 in the environment; not counting GL calls")
+
+def release_game():
+    """Delete the GL objects init_game() made, while their context is still current"""
+    global gl_state
+    with foreign_gl():
+        for batches in instance_batches.values():
+            for batch in batches.values():
+                batch.mesh.delete()
+                batch.instances.delete()
+        instance_batches.clear()
+        if text_renderer is not None:
+            text_renderer.release()
+        particle_renderer.release()
+        static_scene.release()
+    profiler.uninstrument()
+    gl_error.stopDebugOutput()
+    gl_error.checkEveryCall()
+    if gl_state is not None:
+        gl_state.uninstall()
+        globals().update(glut_solids)
+        glut_solids.clear()
+        gl_state = None
+
+def main():
+    global last_time
+
+    args = parse_args(sys.argv[1:])
+    if args.headless:
+        report_headless(run_headless(args.ticks, tick_rate=args.tick_rate, **simulation_options(args)))
+        return
+
+    glutInit(sys.argv)
+    glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
+    glutInitWindowSize(1000, 800)
+    glutInitWindowPosition(0, 0)
+    glutCreateWindow(b"Fire Fighter 3D")
+    if bool(glutSetOption):
+        # Return from glutMainLoop on close, so atexit handlers (profile export) run
+        glutSetOption(GLUT_ACTION_ON_WINDOW_CLOSE, GLUT_ACTION_CONTINUE_EXECUTION)
+    init_gl()
+    init_game(args)
     
-    # Initialize game objects
-    init_houses()
-    init_water_stations()
-    init_hazards()
-    init_trees_and_people()
-    
-    # Initialize timers and flags
+    # Initialize timers
     last_time = time.time()
-    last_fire_pop_time = time.time()
-    fires_occurred = False
     
     # Register callbacks
     glutDisplayFunc(showScreen)
@@ -1490,4 +1082,4 @@ def main():
     glutMainLoop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,195 @@
+"""Triangle meshes of the scene objects, built with NumPy
+
+GL-free equivalents of the GLUT solids main.py draws (glutSolidCube,
+glutSolidSphere, glutSolidCylinder, glutSolidCone, glutSolidTorus),
+composed into one mesh per object kind with the same transforms and
+colours as the immediate-mode code.
+
+A mesh is a float32 array of shape (N, 9): one row per vertex of a
+GL_TRIANGLES list holding position (3), normal (3) and colour (3).
+"""
+import math
+
+import numpy as np
+
+VERTEX_FLOATS = 9
+
+TRUNK_COLOR = (0.55, 0.27, 0.07)
+FOLIAGE_COLOR = (0.0, 0.5, 0.0)
+CLOTHES_COLOR = (0.2, 0.2, 0.8)
+SKIN_COLOR = (0.8, 0.6, 0.5)
+PANTS_COLOR = (0.2, 0.2, 0.2)
+
+#: Default sphere/cylinder tessellation; GLUT calls in main.py use 16
+DETAIL = 8
+
+# Unit cube faces: outward normal and four corners, counter-clockwise
+_CUBE_FACES = (
+    ((0, 0, 1), ((-1, -1, 1), (1, -1, 1), (1, 1, 1), (-1, 1, 1))),
+    ((0, 0, -1), ((1, -1, -1), (-1, -1, -1), (-1, 1, -1), (1, 1, -1))),
+    ((1, 0, 0), ((1, -1, 1), (1, -1, -1), (1, 1, -1), (1, 1, 1))),
+    ((-1, 0, 0), ((-1, -1, -1), (-1, -1, 1), (-1, 1, 1), (-1, 1, -1))),
+    ((0, 1, 0), ((-1, 1, 1), (1, 1, 1), (1, 1, -1), (-1, 1, -1))),
+    ((0, -1, 0), ((-1, -1, -1), (1, -1, -1), (1, -1, 1), (-1, -1, 1))),
+)
+
+
+def _quads(grid):
+    """Split a (rows, cols, 3) grid of points into two triangles per cell"""
+    a = grid[:-1, :-1]
+    b = grid[1:, :-1]
+    c = grid[1:, 1:]
+    d = grid[:-1, 1:]
+    return np.stack([a, b, c, a, c, d], axis=2).reshape(-1, 3)
+
+
+def cube(size=1.0):
+    """(positions, normals) of glutSolidCube(size)"""
+    positions, normals = [], []
+    for normal, corners in _CUBE_FACES:
+        a, b, c, d = corners
+        positions.extend((a, b, c, a, c, d))
+        normals.extend([normal] * 6)
+    return np.array(positions, dtype=np.float64) * (size / 2.0), np.array(normals, dtype=np.float64)
+
+
+def sphere(radius, slices=DETAIL, stacks=DETAIL):
+    """(positions, normals) of glutSolidSphere(radius, slices, stacks)"""
+    phi = np.linspace(0.0, math.pi, stacks + 1)[:, None]
+    theta = np.linspace(0.0, 2 * math.pi, slices + 1)[None, :]
+    grid = np.stack(np.broadcast_arrays(
+        np.sin(phi) * np.sin(theta), np.cos(phi), np.sin(phi) * np.cos(theta),
+    ), axis=-1)
+    normals = _quads(grid)
+    return normals * radius, normals
+
+
+def cylinder(radius, height, slices=DETAIL, stacks=1):
+    """(positions, normals) of glutSolidCylinder: along +z from 0 to height, capped"""
+    theta = np.linspace(0.0, 2 * math.pi, slices + 1)
+    ring = np.stack([np.cos(theta), np.sin(theta), np.zeros_like(theta)], axis=-1)
+    levels = np.linspace(0.0, height, stacks + 1)
+    grid = ring[None, :, :] * (radius, radius, 0) + levels[:, None, None] * (0, 0, 1)
+    side = _quads(grid)
+    side_normals = side * (1, 1, 0) / radius
+    positions, normals = [side], [side_normals]
+    for z, facing in ((0.0, -1.0), (height, 1.0)):
+        rim = ring * (radius, radius, 0) + (0, 0, z)
+        centre = np.broadcast_to((0.0, 0.0, z), (slices, 3))
+        if facing > 0:
+            fan = np.stack([centre, rim[:-1], rim[1:]], axis=1)
+        else:
+            fan = np.stack([centre, rim[1:], rim[:-1]], axis=1)
+        positions.append(fan.reshape(-1, 3))
+        normals.append(np.broadcast_to((0.0, 0.0, facing), (slices * 3, 3)))
+    return np.concatenate(positions), np.concatenate(normals)
+
+
+def cone(base, height, slices=DETAIL, stacks=1):
+    """(positions, normals) of glutSolidCone: base at z=0, apex at z=height, capped"""
+    theta = np.linspace(0.0, 2 * math.pi, slices + 1)
+    ring = np.stack([np.cos(theta), np.sin(theta), np.zeros_like(theta)], axis=-1)
+    levels = np.linspace(0.0, 1.0, stacks + 1)[:, None, None]
+    grid = ring[None, :, :] * base * (1.0 - levels) + levels * (0, 0, height)
+    side = _quads(grid)
+    # Side normals lean towards +z by the slope of the cone
+    slant = math.hypot(base, height)
+    normal_ring = ring * (height / slant) + (0, 0, base / slant)
+    side_normals = _quads(np.broadcast_to(normal_ring, grid.shape))
+    centre = np.zeros((slices, 3))
+    fan = np.stack([centre, ring[1:] * base, ring[:-1] * base], axis=1).reshape(-1, 3)
+    cap_normals = np.broadcast_to((0.0, 0.0, -1.0), fan.shape)
+    return np.concatenate([side, fan]), np.concatenate([side_normals, cap_normals])
+
+
+def torus(inner, outer, sides=DETAIL, rings=DETAIL):
+    """(positions, normals) of glutSolidTorus: tube radius inner around a ring of radius outer in xy"""
+    phi = np.linspace(0.0, 2 * math.pi, sides + 1)[None, :]
+    theta = np.linspace(0.0, 2 * math.pi, rings + 1)[:, None]
+    normal_grid = np.stack(np.broadcast_arrays(
+        np.cos(phi) * np.cos(theta), np.cos(phi) * np.sin(theta), np.sin(phi),
+    ), axis=-1)
+    centres = np.stack(np.broadcast_arrays(np.cos(theta), np.sin(theta), 0 * theta), axis=-1) * outer
+    normals = _quads(normal_grid)
+    positions = _quads(centres + normal_grid * inner)
+    return positions, normals
+
+
+def translate(x, y, z):
+    matrix = np.identity(4)
+    matrix[:3, 3] = (x, y, z)
+    return matrix
+
+
+def scale(x, y, z):
+    return np.diag((x, y, z, 1.0))
+
+
+def rotate(angle, x, y, z):
+    """Matrix of glRotatef(angle, x, y, z)"""
+    axis = np.array((x, y, z), dtype=np.float64)
+    axis /= np.linalg.norm(axis)
+    x, y, z = axis
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    matrix = np.identity(4)
+    matrix[:3, :3] = (
+        (x * x * (1 - c) + c, x * y * (1 - c) - z * s, x * z * (1 - c) + y * s),
+        (y * x * (1 - c) + z * s, y * y * (1 - c) + c, y * z * (1 - c) - x * s),
+        (x * z * (1 - c) - y * s, y * z * (1 - c) + x * s, z * z * (1 - c) + c),
+    )
+    return matrix
+
+
+def part(shape, color, *transforms):
+    """Mesh rows of ``shape`` with ``transforms`` applied in glTranslatef/glRotatef order"""
+    positions, normals = shape
+    matrix = np.identity(4)
+    for transform in transforms:
+        matrix = matrix @ transform
+    linear = matrix[:3, :3]
+    rows = np.empty((len(positions), VERTEX_FLOATS), dtype=np.float32)
+    rows[:, 0:3] = positions @ linear.T + matrix[:3, 3]
+    # Normals transform by the inverse transpose (row vectors: n @ M^-1).
+    # They are left unnormalised, as the fixed-function pipeline does without
+    # GL_NORMALIZE, so scaled parts shade the same as their glutSolid* originals.
+    rows[:, 3:6] = normals @ np.linalg.inv(linear)
+    rows[:, 6:9] = color
+    return rows
+
+
+def mesh(*parts):
+    return np.ascontiguousarray(np.concatenate(parts))
+
+
+def tree_mesh(detail=DETAIL):
+    """main.draw_tree as one mesh"""
+    return mesh(
+        part(cube(1.0), TRUNK_COLOR, scale(0.5, 2.0, 0.5)),
+        part(sphere(1.5, detail, detail), FOLIAGE_COLOR, translate(0, 2.5, 0)),
+        part(sphere(1.2, detail, detail), FOLIAGE_COLOR, translate(0, 3.5, 0)),
+        part(sphere(0.8, detail, detail), FOLIAGE_COLOR, translate(0, 4.5, 0)),
+    )
+
+
+def person_mesh(detail=DETAIL):
+    """main.draw_person as one mesh, facing +z before rotation"""
+    return mesh(
+        part(cube(1.0), CLOTHES_COLOR, translate(0, 1.0, 0), scale(0.4, 0.8, 0.2)),
+        part(sphere(0.2, detail, detail), SKIN_COLOR, translate(0, 1.8, 0)),
+        part(cube(1.0), CLOTHES_COLOR, translate(0.3, 1.2, 0), rotate(30, 0, 0, 1), scale(0.15, 0.6, 0.15)),
+        part(cube(1.0), CLOTHES_COLOR, translate(-0.3, 1.2, 0), rotate(-30, 0, 0, 1), scale(0.15, 0.6, 0.15)),
+        part(cube(1.0), PANTS_COLOR, translate(0.15, 0.4, 0), scale(0.15, 0.8, 0.15)),
+        part(cube(1.0), PANTS_COLOR, translate(-0.15, 0.4, 0), scale(0.15, 0.8, 0.15)),
+    )
+
+
+def hazard_meshes(detail=DETAIL):
+    """main.draw_hazard as one mesh per hazard type"""
+    return {
+        'fallen_tree': mesh(part(cylinder(1, 8, detail, 2), (0.4, 0.2, 0.1), rotate(90, 0, 0, 1))),
+        'power_line': mesh(part(cube(1), (0.8, 0.8, 0.8), scale(0.3, 3, 0.3))),
+        'debris': mesh(part(cube(2), (0.5, 0.5, 0.5))),
+        'vehicle': mesh(part(cube(2), (0.7, 0.1, 0.1), scale(1, 0.5, 2))),
+        'collapsed_structure': mesh(part(cube(3), (0.7, 0.5, 0.3))),
+    }
@@ -0,0 +1,167 @@
+"""Offscreen OpenGL context for headless rendering and benchmarks
+
+Creates a window-less context and renders into a framebuffer object, so
+the game's drawing code can run on machines with no X server or GPU
+(Mesa's llvmpipe software rasterizer is enough).  Two platforms work:
+
+    egl     Mesa's surfaceless EGL platform, falling back to the default
+            EGL display (the default here)
+    osmesa  Mesa's OSMesa off-screen library (PYOPENGL_PLATFORM=osmesa)
+
+PyOpenGL chooses its platform when OpenGL is first imported, so this
+module must be imported before main.py or anything else that imports
+OpenGL; it selects EGL unless PYOPENGL_PLATFORM is already set.
+
+freeglut refuses to draw its solids before glutInit, which needs a
+display, so install_glut_stand_ins() provides vertex-array versions of
+the glutSolid* functions main.py uses, built from meshes.py.
+"""
+import ctypes
+import functools
+import os
+
+os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+
+import numpy as np
+
+from OpenGL.GL import (
+    GL_COLOR_ATTACHMENT0, GL_DEPTH_ATTACHMENT, GL_DEPTH_COMPONENT24, GL_FLOAT,
+    GL_FRAMEBUFFER, GL_NORMAL_ARRAY, GL_PACK_ALIGNMENT, GL_RENDERBUFFER,
+    GL_RGB, GL_RGBA8, GL_TRIANGLES, GL_UNSIGNED_BYTE, GL_VERTEX_ARRAY,
+    glDisableClientState, glDrawArrays, glEnableClientState, glNormalPointer,
+    glPixelStorei, glReadPixels, glVertexPointer, glViewport,
+)
+from OpenGL.GL.framebufferobjects import (
+    checkFramebufferStatus, glBindFramebuffer, glBindRenderbuffer,
+    glDeleteFramebuffers, glDeleteRenderbuffers, glFramebufferRenderbuffer,
+    glGenFramebuffers, glGenRenderbuffers, glRenderbufferStorage,
+)
+
+import meshes
+
+PLATFORM = os.environ['PYOPENGL_PLATFORM']
+if PLATFORM == 'osmesa':
+    from OpenGL import arrays, osmesa
+else:
+    from OpenGL import EGL
+    from OpenGL.EGL.EXT.platform_base import eglGetPlatformDisplayEXT
+
+EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+
+
+def _egl_display():
+    """Surfaceless display if Mesa offers it, else the default display"""
+    try:
+        display = eglGetPlatformDisplayEXT(EGL_PLATFORM_SURFACELESS_MESA, EGL.EGL_DEFAULT_DISPLAY, None)
+    except Exception:
+        display = None
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if display and EGL.eglInitialize(display, major, minor):
+        return display
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not display or not EGL.eglInitialize(display, major, minor):
+        raise RuntimeError("Could not initialise an EGL display for offscreen rendering")
+    return display
+
+
+class OffscreenContext(object):
+    """Current GL context plus a width x height colour+depth FBO bound for drawing"""
+    def __init__(self, width=1000, height=800):
+        self.width = width
+        self.height = height
+        if PLATFORM == 'osmesa':
+            self._create_osmesa()
+        else:
+            self._create_egl()
+
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        self.renderbuffers = []
+        for storage, attachment in ((GL_RGBA8, GL_COLOR_ATTACHMENT0), (GL_DEPTH_COMPONENT24, GL_DEPTH_ATTACHMENT)):
+            renderbuffer = glGenRenderbuffers(1)
+            glBindRenderbuffer(GL_RENDERBUFFER, renderbuffer)
+            glRenderbufferStorage(GL_RENDERBUFFER, storage, width, height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment, GL_RENDERBUFFER, renderbuffer)
+            self.renderbuffers.append(renderbuffer)
+        checkFramebufferStatus()
+        glViewport(0, 0, width, height)
+
+    def _create_osmesa(self):
+        self.context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        if not self.context:
+            raise RuntimeError("Could not create an OSMesa context")
+        # OSMesa needs a client-side buffer to make the context current; we draw to the FBO
+        self.buffer = arrays.GLubyteArray.zeros((self.height, self.width, 4))
+        if not osmesa.OSMesaMakeCurrent(self.context, self.buffer, GL_UNSIGNED_BYTE, self.width, self.height):
+            raise RuntimeError("Could not make the OSMesa context current")
+
+    def _create_egl(self):
+        self.display = _egl_display()
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        attributes = (EGL.EGLint * 5)(
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_SURFACE_TYPE, 0,
+            EGL.EGL_NONE,
+        )
+        if not EGL.eglChooseConfig(self.display, attributes, ctypes.pointer(config), 1, count) or not count.value:
+            raise RuntimeError("No EGL config supports desktop OpenGL")
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, None)
+        if not self.context:
+            raise RuntimeError("Could not create an EGL OpenGL context")
+        if not EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context):
+            raise RuntimeError("Could not make the EGL context current without a surface")
+
+    def read_pixels(self):
+        """The colour buffer as a (height, width, 3) uint8 array, top row first"""
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)[::-1]
+
+    def release(self):
+        if self.framebuffer is not None:
+            glBindFramebuffer(GL_FRAMEBUFFER, 0)
+            glDeleteRenderbuffers(len(self.renderbuffers), self.renderbuffers)
+            glDeleteFramebuffers(1, [self.framebuffer])
+            self.framebuffer = None
+        if PLATFORM == 'osmesa':
+            osmesa.OSMesaDestroyContext(self.context)
+        else:
+            EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroyContext(self.display, self.context)
+
+
+@functools.lru_cache(maxsize=None)
+def _solid_arrays(shape, *args):
+    positions, normals = getattr(meshes, shape)(*args)
+    return np.ascontiguousarray(positions, dtype=np.float32), np.ascontiguousarray(normals, dtype=np.float32)
+
+
+def _draw_solid(shape, *args):
+    """One meshes.py shape as GL_TRIANGLES from client arrays, cached per argument set"""
+    positions, normals = _solid_arrays(shape, *args)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, positions)
+    glNormalPointer(GL_FLOAT, 0, normals)
+    glDrawArrays(GL_TRIANGLES, 0, len(positions))
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+
+def glut_stand_ins():
+    """{name: function} drop-ins for the glutSolid* calls, usable without glutInit"""
+    return {
+        'glutSolidCube': lambda size: _draw_solid('cube', size),
+        'glutSolidSphere': lambda radius, slices, stacks: _draw_solid('sphere', radius, slices, stacks),
+        'glutSolidCylinder': lambda radius, height, slices, stacks: _draw_solid(
+            'cylinder', radius, height, slices, stacks),
+        'glutSolidCone': lambda base, height, slices, stacks: _draw_solid('cone', base, height, slices, stacks),
+        'glutSolidTorus': lambda inner, outer, sides, rings: _draw_solid('torus', inner, outer, sides, rings),
+    }
+
+
+def install_glut_stand_ins(namespace):
+    """Replace the glutSolid* functions in ``namespace`` (e.g. vars(main))"""
+    namespace.update(glut_stand_ins())
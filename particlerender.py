@@ -0,0 +1,126 @@
+"""Batched, camera-facing drawing of the particle pools
+
+All particles of a frame are expanded into one interleaved float32 quad
+buffer (x, y, z, r, g, b, a per corner), uploaded once into a streaming
+VBO and drawn with one glDrawArrays per blend mode: additive for fire,
+alpha blending for smoke.  Quads are billboards built from the camera's
+right and up vectors, so they face the viewer from any angle.
+"""
+import numpy as np
+
+from OpenGL.GL import (
+    GL_ARRAY_BUFFER, GL_BLEND, GL_COLOR_ARRAY, GL_FLOAT, GL_LIGHTING,
+    GL_MODELVIEW_MATRIX, GL_ONE, GL_ONE_MINUS_SRC_ALPHA, GL_QUADS,
+    GL_SRC_ALPHA, GL_STREAM_DRAW, GL_VERTEX_ARRAY,
+    glBindBuffer, glBlendFunc, glColorPointer, glDisable, glDisableClientState,
+    glDrawArrays, glEnable, glEnableClientState, glGetFloatv, glVertexPointer,
+)
+from OpenGL.arrays import vbo
+
+VERTEX_FLOATS = 7  # x, y, z, r, g, b, a
+
+#: glBlendFunc arguments per blend mode, in drawing order
+BLEND_MODES = (
+    ('additive', (GL_SRC_ALPHA, GL_ONE)),
+    ('alpha', (GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)),
+)
+
+# Corner offsets (along right, along up) in GL_QUADS order
+_CORNERS = np.array([(-1, -1), (1, -1), (1, 1), (-1, 1)], dtype=np.float32)
+
+
+def camera_axes(modelview=None):
+    """World-space (right, up) unit vectors of a view matrix
+
+    ``modelview`` defaults to the current GL_MODELVIEW_MATRIX, which must
+    hold only the camera transform (as set up by gluLookAt).
+    """
+    if modelview is None:
+        modelview = glGetFloatv(GL_MODELVIEW_MATRIX)
+    # GL returns column-major; the rows of the view rotation are the camera axes
+    matrix = np.asarray(modelview, dtype=np.float32).reshape(4, 4)
+    return matrix[:3, 0].copy(), matrix[:3, 1].copy()
+
+
+def expand_billboards(out, position, color, alpha, size, right, up):
+    """Write 4 corners per particle into ``out`` (at least 4N x 7), returns 4N"""
+    n = len(position)
+    quads = out[:4 * n].reshape(n, 4, VERTEX_FLOATS)
+    # corner = position + size * (cx * right + cy * up)
+    offsets = _CORNERS[:, :1] * right + _CORNERS[:, 1:] * up  # (4, 3)
+    np.multiply(size[:, None, None], offsets, out=quads[:, :, 0:3])
+    quads[:, :, 0:3] += position[:, None, :]
+    quads[:, :, 3:6] = color[:, None, :]
+    quads[:, :, 6] = alpha[:, None]
+    return 4 * n
+
+
+class BillboardRenderer(object):
+    """Draw sets of particle pools, one glDrawArrays per blend mode
+
+    The CPU-side staging array only grows, so steady-state frames do no
+    allocation; the VBO is re-specified every frame (GL_STREAM_DRAW), which
+    lets the driver orphan the previous frame's storage instead of stalling.
+    """
+    def __init__(self, initial_particles=1024):
+        self.staging = np.zeros((4 * initial_particles, VERTEX_FLOATS), dtype=np.float32)
+        self.buffer = vbo.VBO(self.staging[:4], usage=GL_STREAM_DRAW)
+        self.draw_calls = 0
+        self.vertices = 0
+
+    def _reserve(self, particles):
+        if 4 * particles > len(self.staging):
+            grown = max(4 * particles, 2 * len(self.staging))
+            self.staging = np.zeros((grown, VERTEX_FLOATS), dtype=np.float32)
+
+    def draw(self, modes, ahead=0.0, axes=None):
+        """Draw ``modes``: {blend mode name: [particle pools]}
+
+        ``ahead`` is passed to each pool's arrays(); ``axes`` overrides the
+        (right, up) camera vectors read from the modelview matrix.
+        """
+        right, up = axes if axes is not None else camera_axes()
+        batches = []
+        for name, _ in BLEND_MODES:
+            batches.append([pool.arrays(ahead) for pool in modes.get(name, ())])
+        self._reserve(sum(len(arrays[0]) for batch in batches for arrays in batch))
+
+        ranges = []
+        filled = 0
+        for batch in batches:
+            start = filled
+            for position, color, alpha, size in batch:
+                filled += expand_billboards(self.staging[filled:], position, color, alpha, size, right, up)
+            ranges.append((start, filled - start))
+        self.draw_calls = 0
+        self.vertices = filled
+        if not filled:
+            return 0
+
+        buffer = self.buffer
+        buffer.set_array(self.staging[:filled])
+        buffer.bind()
+        stride = VERTEX_FLOATS * 4
+        glDisable(GL_LIGHTING)
+        glEnable(GL_BLEND)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        try:
+            glVertexPointer(3, GL_FLOAT, stride, buffer)
+            glColorPointer(4, GL_FLOAT, stride, buffer + 12)
+            for (_, blend), (first, count) in zip(BLEND_MODES, ranges):
+                if count:
+                    glBlendFunc(*blend)
+                    glDrawArrays(GL_QUADS, first, count)
+                    self.draw_calls += 1
+        finally:
+            glDisableClientState(GL_COLOR_ARRAY)
+            glDisableClientState(GL_VERTEX_ARRAY)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            glDisable(GL_BLEND)
+            glEnable(GL_LIGHTING)
+        return self.draw_calls
+
+    def release(self):
+        """Delete the VBO (needs the GL context it was created in)"""
+        self.buffer.delete()
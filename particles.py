@@ -0,0 +1,277 @@
+"""Structure-of-arrays particle pools for fire and smoke
+
+Each particle kind keeps its live particles packed at the front of a set
+of preallocated, contiguous float32 arrays (position, velocity, size,
+life, density, color).  Spawning, integration and removal of dead
+particles all happen as whole-array NumPy operations, so the per-frame
+cost no longer scales with Python-level work per particle.
+
+Pools never grow: slots freed by dead particles are reused by the next
+spawn, and when a spawn would exceed the hard cap the pool's eviction
+policy picks which live particles make room.
+"""
+import numpy as np
+
+SMOKE_COLOR = (0.3, 0.3, 0.3)
+
+#: Eviction policies understood by ParticleSystem
+EVICT_OLDEST = 'oldest'
+EVICT_LOWEST_ALPHA = 'lowest_alpha'
+EVICT_FARTHEST = 'farthest'
+EVICTION_POLICIES = (EVICT_OLDEST, EVICT_LOWEST_ALPHA, EVICT_FARTHEST)
+
+
+class ParticleSystem(object):
+    """Fixed-capacity float32 pool for one kind of particle
+
+    The first ``count`` rows of every array are live particles, in
+    spawn order; rows past ``count`` are free slots.  All storage is
+    allocated up front for ``max_particles`` particles.
+
+    When a spawn does not fit, ``eviction`` chooses the victims:
+
+        'oldest' -- the longest-lived particles
+        'lowest_alpha' -- the most transparent particles
+        'farthest' -- the particles farthest from ``viewpoint``
+
+    Subclasses set the per-tick behaviour through class attributes.  Like
+    the velocities, all of them are amounts per reference frame; update()
+    scales them by the number of reference frames the tick covers.
+
+        life_decay -- life lost per frame
+        jitter_low, jitter_high -- per-axis bounds of the random positional
+            flicker added on top of the velocity every frame
+        density_decay -- density lost per frame (scaled by U(0.8, 1.2))
+    """
+    life_decay = 0.0
+    jitter_low = (0.0, 0.0, 0.0)
+    jitter_high = (0.0, 0.0, 0.0)
+    density_decay = 0.0
+
+    def __init__(self, max_particles=20000, eviction=EVICT_OLDEST, rng=None):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(
+                "Unknown eviction policy %r, expected one of %s" % (eviction, EVICTION_POLICIES)
+            )
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.eviction = eviction
+        self.viewpoint = (0.0, 0.0, 0.0)
+        self.count = 0
+        self.spawned = 0
+        self.evicted = 0
+        self.expired = 0
+        self.capacity = max(1, int(max_particles))
+        self.position = np.zeros((self.capacity, 3), dtype=np.float32)
+        self.velocity = np.zeros((self.capacity, 3), dtype=np.float32)
+        self.color = np.zeros((self.capacity, 3), dtype=np.float32)
+        self.size = np.zeros(self.capacity, dtype=np.float32)
+        self.life = np.zeros(self.capacity, dtype=np.float32)
+        self.density = np.zeros(self.capacity, dtype=np.float32)
+        self._jitter_low = np.asarray(self.jitter_low, dtype=np.float32)
+        self._jitter_span = np.asarray(self.jitter_high, dtype=np.float32) - self._jitter_low
+
+    def _columns(self):
+        return (self.position, self.velocity, self.color, self.size, self.life, self.density)
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def stats(self):
+        """Counters for the pool since it was created"""
+        return {
+            'live': self.count,
+            'capacity': self.capacity,
+            'occupancy': self.count / self.capacity,
+            'spawned': self.spawned,
+            'evicted': self.evicted,
+            'expired': self.expired,
+        }
+
+    def add(self, position, velocity, size, color, density=1.0, life=1.0):
+        """Spawn a batch of particles; every argument broadcasts to the batch
+
+        Returns the slice of slots the new particles occupy.  A batch larger
+        than the whole pool keeps only its last ``capacity`` particles; the
+        ones it drops count as spawned and evicted, like any particle pushed
+        out by a newer one.
+        """
+        position = np.asarray(position, dtype=np.float32).reshape(-1, 3)
+        n = len(position)
+        skip = max(0, n - self.capacity)
+        n -= skip
+        self.spawned += skip
+        self.evicted += skip
+        if not n:
+            return slice(self.count, self.count)
+        overflow = self.count + n - self.capacity
+        if overflow > 0:
+            self.evict(overflow)
+        start = self.count
+        live = slice(start, start + n)
+        batch = slice(skip, None)
+        self.position[live] = position[batch]
+        self.velocity[live] = _batch(velocity, skip, 2)
+        self.size[live] = _batch(size, skip)
+        self.color[live] = _batch(color, skip, 2)
+        self.density[live] = _batch(density, skip)
+        self.life[live] = _batch(life, skip)
+        self.count = start + n
+        self.spawned += n
+        return live
+
+    def evict(self, k):
+        """Free ``k`` slots by removing live particles chosen by the eviction policy"""
+        n = self.count
+        k = min(k, n)
+        if k <= 0:
+            return
+        if self.eviction == EVICT_OLDEST:
+            # Live rows are kept in spawn order, so the oldest are at the front
+            for column in self._columns():
+                column[:n - k] = column[k:n]
+            self.count = n - k
+        else:
+            if self.eviction == EVICT_LOWEST_ALPHA:
+                victims = np.argpartition(self.alpha(), k - 1)[:k]
+            else:
+                offset = self.position[:n] - np.asarray(self.viewpoint, dtype=np.float32)
+                distance = np.einsum('ij,ij->i', offset, offset)
+                victims = np.argpartition(distance, n - k)[n - k:]
+            keep = np.ones(n, dtype=bool)
+            keep[victims] = False
+            self.compact(keep)
+        self.evicted += k
+
+    def alpha(self):
+        """Opacity of the live particles"""
+        return self.life[:self.count]
+
+    def arrays(self, ahead=0.0):
+        """(position, color, alpha, size) arrays of the live particles
+
+        ``ahead`` extrapolates positions that many reference frames along
+        the particles' velocities, for drawing between simulation ticks.
+        Without it the arrays are views into the pool.
+        """
+        n = self.count
+        position = self.position[:n]
+        if ahead:
+            position = position + self.velocity[:n] * np.float32(ahead)
+        return position, self.color[:n], self.alpha(), self.size[:n]
+
+    def rows(self, ahead=0.0):
+        """Iterate (position, color, alpha, size) of live particles as Python floats"""
+        return zip(*(column.tolist() for column in self.arrays(ahead)))
+
+    def alive(self):
+        """Mask of live particles that survive the current tick"""
+        return self.life[:self.count] > 0
+
+    def update(self, frames=1.0):
+        """Advance every live particle by ``frames`` reference frames and drop the dead ones"""
+        n = self.count
+        if not n:
+            return
+        rng = self.rng
+        self.life[:n] -= self.life_decay * frames
+        if self.density_decay:
+            self.density[:n] -= (self.density_decay * frames * rng.uniform(0.8, 1.2, n)).astype(np.float32)
+        jitter = rng.random((n, 3), dtype=np.float32)
+        jitter *= self._jitter_span
+        jitter += self._jitter_low
+        jitter += self.velocity[:n]
+        jitter *= frames
+        self.position[:n] += jitter
+        before = self.count
+        self.compact(self.alive())
+        self.expired += before - self.count
+
+    def compact(self, keep):
+        """Keep only the live particles selected by the boolean mask ``keep``"""
+        n = self.count
+        kept = int(np.count_nonzero(keep))
+        if kept == n:
+            return
+        dead = n - kept
+        if not keep[:dead].any():
+            # The usual case: the oldest particles died, shift the rest down
+            for column in self._columns():
+                column[:kept] = column[dead:n]
+        else:
+            for column in self._columns():
+                column[:kept] = column[:n][keep]
+        self.count = kept
+
+
+def _batch(value, skip, ndim=1):
+    """Drop the first ``skip`` rows of a per-particle argument
+
+    ``ndim`` is the rank of a per-particle array for this column; anything
+    of lower rank is a shared value that broadcasts to the whole batch.
+    """
+    if skip and np.ndim(value) == ndim:
+        return np.asarray(value)[skip:]
+    return value
+
+
+class FireParticles(ParticleSystem):
+    life_decay = 0.025
+    jitter_low = (-0.02, -0.01, -0.02)
+    jitter_high = (0.02, 0.03, 0.02)
+    #: Bounds of velocity x, y, z, size and wind gust factor at spawn
+    SPAWN_LOW = np.array((-0.2, 0.2, -0.2, 0.15, 0.8), dtype=np.float32)
+    SPAWN_SPAN = np.array((0.4, 0.3, 0.4, 0.2, 0.4), dtype=np.float32)
+
+    def spawn(self, positions, colors, wind_direction, wind_speed):
+        """Emit one fire particle at each of ``positions`` (N x 3)"""
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+        n = len(positions)
+        if not n:
+            return
+        # One draw per particle: velocity x, y, z, size, gust
+        draw = self.rng.random((n, 5), dtype=np.float32)
+        draw *= self.SPAWN_SPAN
+        draw += self.SPAWN_LOW
+        velocity = draw[:, :3]
+        velocity[:, 0] += draw[:, 4] * (wind_speed * wind_direction[0])
+        velocity[:, 2] += draw[:, 4] * (wind_speed * wind_direction[2])
+        self.add(positions, velocity, draw[:, 3], colors)
+
+
+class SmokeParticles(ParticleSystem):
+    life_decay = 0.012
+    jitter_low = (-0.01, -0.01, -0.01)
+    jitter_high = (0.01, 0.01, 0.01)
+    #: Bounds of velocity x, y, z (before wind), size and density at spawn
+    SPAWN_LOW = np.array((-0.1, 0.1, -0.1, 0.25, 0.3), dtype=np.float32)
+    SPAWN_SPAN = np.array((0.2, 0.15, 0.2, 0.25, 0.4), dtype=np.float32)
+
+    def __init__(self, max_particles=20000, eviction=EVICT_OLDEST, rng=None, density_decay=0.1):
+        super(SmokeParticles, self).__init__(max_particles, eviction, rng)
+        self.density_decay = density_decay
+
+    def spawn(self, positions, wind_direction, wind_speed):
+        """Emit one smoke particle at each of ``positions`` (N x 3)"""
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+        n = len(positions)
+        if not n:
+            return
+        # One draw per particle: velocity x, y, z, size, density
+        draw = self.rng.random((n, 5), dtype=np.float32)
+        draw *= self.SPAWN_SPAN
+        draw += self.SPAWN_LOW
+        velocity = draw[:, :3]
+        velocity[:, 0] += wind_direction[0] * wind_speed
+        velocity[:, 2] += wind_direction[2] * wind_speed
+        self.add(positions, velocity, draw[:, 3], SMOKE_COLOR, density=draw[:, 4])
+
+    def alpha(self):
+        n = self.count
+        return self.life[:n] * self.density[:n]
+
+    def alive(self):
+        n = self.count
+        return (self.life[:n] > 0) & (self.density[:n] > 0)
@@ -0,0 +1,228 @@
+"""Per-stage frame timing with rolling percentiles and CSV/JSON export
+
+Stages are timed with time.perf_counter_ns, either as zones
+
+    with profiler.zone('draw_shapes'):
+        draw_shapes()
+
+or with begin()/end() pairs, or by wrapping methods of an object with
+instrument() (e.g. the simulation's update_* stages).  A stage that runs
+several times in a frame (one sim tick per call) is summed.  end_frame()
+closes the frame, stores its stage times, the time since the previous
+end_frame() and any entity counts, so slow frames can be matched to
+load.
+
+Percentiles for the overlay cover the last ``window`` frames; exports
+cover every frame recorded.  A disabled profiler (the default) hands out
+one shared no-op zone, returns at once from begin/end/end_frame and
+instruments nothing, so leaving the calls in costs next to nothing.
+"""
+import csv
+import json
+import math
+import time
+
+import numpy as np
+
+FRAME_WINDOW = 600  # Frames behind the rolling percentiles (10 s at 60 fps)
+PERCENTILES = (50, 95, 99)
+#: Upper edges (ms) of the exported histogram bins; the last bin is open
+HISTOGRAM_EDGES_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 66, 100, 250, 1000)
+
+_now = time.perf_counter_ns
+
+
+class _NullZone(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_ZONE = _NullZone()
+
+
+class _Zone(object):
+    """Reused per name, so a zone must not be nested inside itself"""
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = _now()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, _now() - self.start)
+        return False
+
+
+class FrameProfiler(object):
+    """Stage times and entity counts per frame
+
+    ``records`` holds one dict per finished frame: 'frame', 'frame_ms'
+    (time since the previous end_frame), '<stage>_ms' for each stage that
+    ran, and the entity counts passed to end_frame().
+    """
+    def __init__(self, enabled=False, window=FRAME_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.stages = []  # In first-seen order
+        self.counters = []
+        self.records = []
+        self.current = {}
+        self._zones = {}
+        self._started = {}
+        self._instrumented = []
+        self._last_end = None
+
+    def zone(self, name):
+        if not self.enabled:
+            return NULL_ZONE
+        zone = self._zones.get(name)
+        if zone is None:
+            zone = self._zones[name] = _Zone(self, name)
+        return zone
+
+    def begin(self, name):
+        if self.enabled:
+            self._started[name] = _now()
+
+    def end(self, name):
+        if self.enabled:
+            self.add(name, _now() - self._started.pop(name))
+
+    def add(self, name, nanoseconds):
+        """Add time to a stage of the current frame"""
+        current = self.current
+        if name not in current:
+            current[name] = 0
+            if name not in self.stages:
+                self.stages.append(name)
+        current[name] += nanoseconds
+
+    def instrument(self, target, names, zone=None):
+        """Time calls of the methods ``names`` of ``target`` (an instance or module)
+
+        Each becomes a stage named after the method, or ``zone``.  Does
+        nothing while the profiler is disabled.
+        """
+        if not self.enabled:
+            return
+        if isinstance(names, str):
+            names = (names,)
+        for name in names:
+            method = getattr(target, name)
+            stage = zone or name
+
+            def timed(*args, _method=method, _stage=stage, **kwargs):
+                start = _now()
+                try:
+                    return _method(*args, **kwargs)
+                finally:
+                    self.add(_stage, _now() - start)
+            # Instance attribute for objects, module global for modules
+            self._instrumented.append((target, name, target.__dict__.get(name)))
+            setattr(target, name, timed)
+
+    def uninstrument(self):
+        """Undo every instrument()"""
+        while self._instrumented:
+            target, name, original = self._instrumented.pop()
+            if original is None:
+                delattr(target, name)
+            else:
+                setattr(target, name, original)
+
+    def end_frame(self, **counts):
+        """Close the current frame, recording ``counts`` (entities and the like) with it"""
+        if not self.enabled:
+            return
+        now = _now()
+        record = {'frame': len(self.records)}
+        record['frame_ms'] = (now - self._last_end) / 1e6 if self._last_end is not None else float('nan')
+        self._last_end = now
+        for name, nanoseconds in self.current.items():
+            record[name + '_ms'] = nanoseconds / 1e6
+        for name, value in counts.items():
+            if name not in self.counters:
+                self.counters.append(name)
+            record[name] = value
+        self.records.append(record)
+        self.current = {}
+
+    def columns(self):
+        """Record keys of the stage times, frame time first"""
+        return ['frame_ms'] + [name + '_ms' for name in self.stages]
+
+    def _series(self, records, key):
+        # A stage that did not run in a frame took no time in it
+        default = float('nan') if key == 'frame_ms' else 0.0
+        values = np.array([record.get(key, default) for record in records], dtype=float)
+        return values[~np.isnan(values)]
+
+    def percentiles(self, records=None):
+        """{column: {'p50': ms, 'p95': ms, 'p99': ms, 'mean': ms, 'max': ms}} (default: rolling window)"""
+        if records is None:
+            records = self.records[-self.window:]
+        result = {}
+        for key in self.columns():
+            values = self._series(records, key)
+            if not len(values):
+                continue
+            stats = dict(('p%d' % q, float(value)) for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)))
+            stats['mean'] = float(values.mean())
+            stats['max'] = float(values.max())
+            result[key] = stats
+        return result
+
+    def summary_lines(self):
+        """Text lines for an on-screen overlay: stage, p50 / p95 / p99 ms over the window"""
+        lines = ["%-28s %6s %6s %6s" % ('ms (last %d frames)' % min(len(self.records), self.window),
+                                       'p50', 'p95', 'p99')]
+        for key, stats in self.percentiles().items():
+            lines.append("%-28s %6.2f %6.2f %6.2f" % (key[:-3], stats['p50'], stats['p95'], stats['p99']))
+        if self.records:
+            latest = self.records[-1]
+            counts = ["%s=%s" % (name, latest[name]) for name in self.counters if name in latest]
+            for start in range(0, len(counts), 3):
+                lines.append(" ".join(counts[start:start + 3]))
+        return lines
+
+    def histograms(self):
+        """{column: counts per HISTOGRAM_EDGES_MS bin (plus one open bin)} over every frame"""
+        edges = np.array((0.0,) + HISTOGRAM_EDGES_MS + (math.inf,))
+        return dict(
+            (key, np.histogram(self._series(self.records, key), edges)[0].tolist())
+            for key in self.columns()
+        )
+
+    def export_json(self, path):
+        counts = {}
+        for name in self.counters:
+            values = np.array([record[name] for record in self.records if name in record], dtype=float)
+            if len(values):
+                counts[name] = {'mean': float(values.mean()), 'max': float(values.max())}
+        report = {
+            'frames': len(self.records),
+            'percentiles_ms': self.percentiles(self.records),
+            'histogram_edges_ms': list(HISTOGRAM_EDGES_MS),
+            'histograms': self.histograms(),
+            'entities': counts,
+        }
+        with open(path, 'w') as stream:
+            json.dump(report, stream, indent=2)
+
+    def export_csv(self, path):
+        """One row per frame: stage times and entity counts"""
+        fieldnames = ['frame'] + self.columns() + self.counters
+        with open(path, 'w', newline='') as stream:
+            writer = csv.DictWriter(stream, fieldnames=fieldnames, restval=0)
+            writer.writeheader()
+            writer.writerows(self.records)
@@ -0,0 +1,179 @@
+"""Render frames of a seeded game without a window
+
+Draws showScreen() into an offscreen framebuffer (surfaceless EGL by
+default, OSMesa with PYOPENGL_PLATFORM=osmesa; Mesa's software
+rasterizer is enough), with the truck driven by one of the balance.py
+policies, and reports the CPU time of every frame.  The flame animation
+follows game time, so the same seed renders the same frames.
+
+    python render_offscreen.py --frames 120 --seed 7 --output frames/
+    PYOPENGL_PLATFORM=osmesa python render_offscreen.py --frames 30 --times times.csv
+"""
+import offscreen  # Selects the offscreen platform before OpenGL is imported
+
+import collections
+import os
+import sys
+import time
+
+import numpy as np
+
+from OpenGL import accounting
+from OpenGL.GL import glFinish
+from OpenGL.GL.readback import PixelReadback
+
+import balance
+import main as game
+from simulation import build_arg_parser
+
+FRAME_RATE = 30  # Frames per game second
+
+
+def write_ppm(path, image):
+    """Write an (height, width, 3) uint8 image as binary PPM"""
+    height, width, _ = image.shape
+    with open(path, 'wb') as stream:
+        stream.write(b'P6\n%d %d\n255\n' % (width, height))
+        stream.write(np.ascontiguousarray(image).tobytes())
+
+
+def finish_frame():
+    """Stands in for glutSwapBuffers: wait for the frame and end it for GL call accounting"""
+    glFinish()
+    accounting.endFrame()
+
+
+def frames(context, args, count, frame_rate=FRAME_RATE, policy='scripted', first_person=False,
+           readback=None, out=None):
+    """Yield (index, image, cpu_seconds, wall_seconds) for ``count`` frames
+
+    ``context`` is the current OffscreenContext; ``args`` are parsed
+    simulation options (see simulation.build_arg_parser).  Times cover
+    showScreen() up to a glFinish, not the read-back of the image.
+
+    With a PixelReadback as ``readback`` images are captured through its
+    pack buffers and arrive ``readback.count - 1`` frames late (the last
+    ones after the final frame is drawn).  Each image is then a view of
+    mapped memory, valid until the next one is yielded, unless ``out``
+    (count x height x width x 3 uint8) is given to copy them into.
+    """
+    offscreen.install_glut_stand_ins(vars(game))
+    game.glutSwapBuffers = finish_frame  # No window to swap
+    game.init_gl()
+    game.init_game(args)
+    try:
+        sim = game.sim
+        game.render_clock = lambda: sim.game_time
+        game.view_mode_fps = first_person
+        act = balance.POLICY_FUNCTIONS[policy]
+        policy_rng = sim.streams.python('policy')
+        actions_every = max(1, int(round(balance.ACTION_INTERVAL * frame_rate)))
+        times = collections.deque()  # Of frames drawn but not yet yielded
+        captured = 0
+        sim.start()
+        for index in range(count):
+            if index % actions_every == 0 and not sim.game_over:
+                act(sim, policy_rng)
+            game.scheduler.advance(1.0 / frame_rate)
+            cpu, wall = time.process_time(), time.perf_counter()
+            game.showScreen()
+            cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+            if readback is None:
+                with game.foreign_gl():
+                    image = context.read_pixels()
+                yield index, image, cpu, wall
+                continue
+            times.append((cpu, wall))
+            with game.foreign_gl():
+                image = readback.read(None if out is None else out[captured])
+            if image is not None:
+                yield (captured, image) + times.popleft()
+                captured += 1
+        while times:
+            with game.foreign_gl():
+                image = readback.map(None if out is None else out[captured])
+            yield (captured, image) + times.popleft()
+            captured += 1
+    finally:
+        game.release_game()
+
+
+def render_frames(args, count, size=(1000, 800), **options):
+    """Render ``count`` frames in a fresh context: (N x height x width x 3 uint8, N CPU seconds)"""
+    context = offscreen.OffscreenContext(*size)
+    try:
+        images, cpu_times = [], []
+        for _, image, cpu, _ in frames(context, args, count, **options):
+            images.append(image)
+            cpu_times.append(cpu)
+        return np.array(images), np.array(cpu_times)
+    finally:
+        context.release()
+
+
+def build_parser():
+    parser = build_arg_parser()
+    parser.description = __doc__.splitlines()[0]
+    parser.add_argument('--frames', type=int, default=60, help="number of frames to render")
+    parser.add_argument('--frame-rate', type=float, default=FRAME_RATE, help="frames per game second")
+    parser.add_argument('--policy', choices=balance.POLICIES, default='scripted',
+                        help="how the truck is driven (see balance.py)")
+    parser.add_argument('--first-person', action='store_true', help="render from the driver's seat")
+    parser.add_argument('--size', type=int, nargs=2, default=(1000, 800), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--output', metavar='DIR', help="write frame_NNNN.ppm images here")
+    parser.add_argument('--npy', metavar='PATH', help="save every frame as one (N, H, W, 3) uint8 .npy array")
+    parser.add_argument('--times', metavar='PATH', help="write per-frame times as CSV ('-' for stdout)")
+    parser.add_argument('--readback', choices=('pbo', 'sync'), default='pbo',
+                        help="capture through a ring of pixel buffer objects (default) or with a plain glReadPixels")
+    parser.add_argument('--readback-buffers', type=int, default=2, metavar='N',
+                        help="pixel buffer objects in the ring; images arrive N - 1 frames late")
+    parser.set_defaults(seed=0)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    width, height = args.size
+    context = offscreen.OffscreenContext(width, height)
+    readback = out = None
+    if args.npy:
+        out = np.empty((args.frames, height, width, 3), dtype=np.uint8)
+    records = []
+    started = time.perf_counter()
+    try:
+        if args.readback == 'pbo':
+            readback = PixelReadback(width, height, count=args.readback_buffers)
+        for index, image, cpu, wall in frames(
+                context, args, args.frames, args.frame_rate, args.policy, args.first_person,
+                readback, out):
+            if args.output:
+                write_ppm(os.path.join(args.output, 'frame_%04d.ppm' % index), image)
+            if out is not None and not np.shares_memory(image, out[index]):
+                out[index] = image  # Not captured into out already (sync read-back)
+            records.append({'frame': index, 'cpu_ms': cpu * 1000, 'wall_ms': wall * 1000})
+    finally:
+        if readback is not None:
+            readback.release()
+        context.release()
+    elapsed = time.perf_counter() - started
+    if args.npy:
+        np.save(args.npy, out)
+    if args.times:
+        balance.write_csv(args.times, records, ['frame', 'cpu_ms', 'wall_ms'])
+
+    cpu = np.array([record['cpu_ms'] for record in records])
+    wall = np.array([record['wall_ms'] for record in records])
+    sys.stderr.write(
+        "%d frames at %dx%d on %s (seed %d): CPU ms/frame mean %.2f, median %.2f, max %.2f; "
+        "wall ms/frame median %.2f; %.2f ms/frame with %s capture and setup\n" % (
+            len(records), width, height, offscreen.PLATFORM, args.seed,
+            cpu.mean(), np.median(cpu), cpu.max(), np.median(wall),
+            elapsed * 1000 / max(len(records), 1), args.readback,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Display-list cache for geometry that only changes with the level
+
+The ground, roads and water stations are the same every frame until
+the simulation replaces a whole set of them (a new map or a restart).
+Recording their immediate-mode and GLUT calls once into a display list
+turns hundreds of Python-level GL calls per frame into a single
+glCallList.  Trees are not cached here: they are culled and drawn at a
+level of detail per frame (see culling.py).
+"""
+from OpenGL.GL import (
+    GL_COMPILE, glCallList, glDeleteLists, glEndList, glGenLists, glNewList,
+)
+
+
+class StaticSceneCache(object):
+    """Replay ``draw()`` from a display list, recompiling when ``version`` changes
+
+    ``draw`` is any callable issuing GL commands that are legal inside
+    a display list.  The list is created lazily on the first call, so the
+    cache can be built before there is a GL context.
+    """
+    def __init__(self, draw):
+        self.draw = draw
+        self.list_id = None
+        self.version = None
+        self.compiles = 0
+
+    def invalidate(self):
+        """Force a recompile on the next call"""
+        self.version = None
+
+    def __call__(self, version):
+        if self.list_id is None:
+            self.list_id = glGenLists(1)
+        if version != self.version or self.version is None:
+            glNewList(self.list_id, GL_COMPILE)
+            try:
+                self.draw()
+            finally:
+                glEndList()
+            self.version = version
+            self.compiles += 1
+        glCallList(self.list_id)
+
+    def release(self):
+        """Free the display list (needs the GL context it was created in)"""
+        if self.list_id is not None:
+            glDeleteLists(self.list_id, 1)
+            self.list_id = None
+            self.version = None
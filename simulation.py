@@ -0,0 +1,946 @@
+"""GL-free game simulation for Fire Fighter 3D
+
+Everything that changes the state of the world lives here, so the game
+can be stepped without a window (for benchmarking and CI runs) while
+main.py only reads the state back to draw it.
+
+    python simulation.py --ticks 100000
+    python main.py --headless --ticks 100000
+"""
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+from houses import HouseTable
+from particles import EVICT_OLDEST, EVICTION_POLICIES, FireParticles, SmokeParticles
+from randomstreams import RandomStreams
+from spatial import SpatialGrid, neighbor_table
+
+# Rates below that are "per frame" are per reference frame of this rate;
+# the simulation scales them by the real tick length, so game speed does
+# not depend on how often it is stepped.
+REFERENCE_FRAME_RATE = 60.0
+TICK_RATE = 60.0  # Default simulation ticks per game second
+MAX_CATCH_UP_TICKS = 5  # Most ticks run for one rendered frame before dropping time
+
+# Game parameters
+NUM_HOUSES = 8  # Number of houses in the game
+MAX_HEALTH = 100  # Maximum health of a house
+FIRE_DAMAGE = 0.04  # Fire damage per frame
+WATER_HEAL = 3.0  # Reduced water healing to make extinguishing take longer
+SPRAY_DISTANCE = 15.0  # Maximum distance to spray water
+FIRE_PROBABILITY = 0.001  # Increased for more frequent fires
+TRUCK_SPEED = 4.0  # Increased speed of the fire truck
+WORLD_SIZE = 100  # Size of the game world
+WATER_CAPACITY = 5000  # Maximum water capacity
+WATER_USAGE_RATE = 0.8  # Water usage per frame when spraying
+WATER_REFILL_RATE = 20  # Increased for faster refilling
+COLLISION_DISTANCE = 6.0  # Distance for collision detection
+WATER_REFILL_DISTANCE = 5.0  # Distance for automatic water refill
+FIRE_POP_INTERVAL = 6.0  # Minimum interval between fire pops in seconds
+CLEAR_DISTANCE = COLLISION_DISTANCE + 2  # Allow some leeway for clearing hazards
+OBSTACLE_CELL_SIZE = CLEAR_DISTANCE  # Grid cell size; at least the largest query radius
+
+# Game over parameters
+TIME_LIMIT = 60  # 5 minutes time limit
+MAX_LIVES = 3  # Number of lives
+SCORE_PER_HOUSE = 1000  # Points for saving a house
+SCORE_PER_SECOND = 10  # Points per second remaining
+DIFFICULTY_LEVELS = {
+    'EASY': {'fire_rate': 0.5, 'damage_rate': 0.5, 'time_limit': 400},
+    'NORMAL': {'fire_rate': 1.0, 'damage_rate': 1.0, 'time_limit': 300},
+    'HARD': {'fire_rate': 1.5, 'damage_rate': 1.5, 'time_limit': 200}
+}
+
+# Add new constants for roads and water stations
+ROAD_WIDTH = 10.0
+ROAD_LENGTH = 80.0
+WATER_STATION_DISTANCE = 40.0  # Distance between water stations
+
+# New fire simulation parameters
+WIND_DIRECTION = [1.0, 0.0, 0.0]  # Initial wind direction
+WIND_SPEED = 1.0  # Wind speed multiplier
+FIRE_SPREAD_RADIUS = 10.0  # Maximum distance for fire spread
+FIRE_SPREAD_PROBABILITY = 0.3  # Probability of fire spreading to nearby objects
+SMOKE_DENSITY = 0.5  # Base smoke density
+MAX_SMOKE_DENSITY = 1.0  # Maximum smoke density
+SMOKE_DISSIPATION_RATE = 0.1  # Rate at which smoke dissipates
+EMISSION_RATES = np.array((0.5, 0.3))  # Fire, smoke particles per burning house per frame
+MAX_FIRE_PARTICLES = 20000  # Hard cap on live fire particles
+MAX_SMOKE_PARTICLES = 20000  # Hard cap on live smoke particles
+PARTICLE_EVICTION = EVICT_OLDEST  # Which particles make room when a pool is full
+
+# Fire types and their properties
+FIRE_TYPES = {
+    'CLASS_A': {'color': (1.0, 0.3, 0.0), 'extinguisher': 'water', 'spread_rate': 1.0},
+    'CLASS_B': {'color': (1.0, 0.0, 0.0), 'extinguisher': 'foam', 'spread_rate': 1.5},
+    'CLASS_C': {'color': (0.0, 0.0, 1.0), 'extinguisher': 'dry_chemical', 'spread_rate': 1.2},
+    'CLASS_D': {'color': (1.0, 1.0, 0.0), 'extinguisher': 'dry_powder', 'spread_rate': 0.8}
+}
+
+# Fire types in HouseTable code order, with their particle colors
+FIRE_TYPE_NAMES = tuple(FIRE_TYPES)
+FIRE_TYPE_COLORS = np.array([FIRE_TYPES[name]['color'] for name in FIRE_TYPE_NAMES], dtype=np.float32)
+
+# Equipment needed to put out each class of fire
+REQUIRED_EQUIPMENT = {
+    'CLASS_A': 'water_hose',
+    'CLASS_B': 'foam_sprayer',
+    'CLASS_C': 'dry_chemical',
+    'CLASS_D': 'dry_powder',
+}
+
+tool_names = {
+    'water_hose': 'Standard Hose',
+    'foam_sprayer': 'Foam Sprayer',
+    'dry_chemical': 'Dry Chemical Extinguisher',
+    'dry_powder': 'Dry Powder Extinguisher',
+    'fire_axe': 'Fire Axe'
+}
+tool_keys = ['water_hose', 'foam_sprayer', 'dry_chemical', 'dry_powder', 'fire_axe']
+
+# The same equipment table as codes, indexed by fire type code
+EQUIPMENT_CODES = dict((name, code) for code, name in enumerate(tool_keys))
+REQUIRED_EQUIPMENT_CODES = np.array(
+    [EQUIPMENT_CODES[REQUIRED_EQUIPMENT[name]] for name in FIRE_TYPE_NAMES], dtype=np.int8,
+)
+
+# Points and messages for clearing each kind of hazard
+HAZARD_REWARDS = {
+    'fallen_tree': (100, "Fallen tree cleared!"),
+    'power_line': (150, "Power line hazard cleared!"),
+    'debris': (80, "Debris cleared!"),
+    'vehicle': (120, "Abandoned vehicle cleared!"),
+    'collapsed_structure': (200, "Collapsed structure cleared!"),
+}
+
+# Kinds of entries in the obstacle grid, and the ones the truck can hit
+OBSTACLE_KINDS = ('house', 'tree', 'hazard', 'station')
+HAZARD_TYPES = ('fallen_tree', 'power_line', 'debris', 'vehicle', 'collapsed_structure')
+BLOCKING_KINDS = ('house', 'tree', 'hazard')
+
+NOTIFICATION_DURATION = 3.0  # How long notifications stay on screen
+WRONG_TOOL_NOTICE_INTERVAL = 1.5  # Seconds between "wrong tool" notices
+
+
+
+def new_fire_truck():
+    return {
+        'position': [0, 0, 0],
+        'rotation': 0,
+        'spraying': False,
+        'water': WATER_CAPACITY,
+        'equipment': {
+            'water_hose': {'condition': 100, 'effectiveness': 1.0},
+            'foam_sprayer': {'condition': 100, 'effectiveness': 1.0},
+            'dry_chemical': {'condition': 100, 'effectiveness': 1.0},
+            'dry_powder': {'condition': 100, 'effectiveness': 1.0}
+        }
+    }
+
+
+def per_tick_chance(chance_per_frame, frames):
+    """Probability of an event with the given per-frame chance over ``frames`` frames"""
+    return 1.0 - (1.0 - chance_per_frame) ** frames
+
+
+class Simulation(object):
+    """Complete game state plus the rules that advance it
+
+    The simulation never touches OpenGL or GLUT; main.py drives it from
+    idle() and the input callbacks, the headless runner drives it from a
+    plain loop.  All timestamps (fire pops, notifications) are taken from
+    the simulation's own clock, never from the wall clock.
+
+    Randomness comes from ``streams``, one generator per subsystem derived
+    from ``seed`` (a fresh one if not given), so a seed and the same
+    sequence of inputs replay the same game.
+    """
+    def __init__(
+        self, difficulty='NORMAL', verbose=True,
+        max_fire_particles=MAX_FIRE_PARTICLES,
+        max_smoke_particles=MAX_SMOKE_PARTICLES,
+        particle_eviction=PARTICLE_EVICTION,
+        seed=None,
+    ):
+        self.verbose = verbose
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
+        self.current_difficulty = difficulty
+        self.clock = 0.0  # Game seconds since the simulation was created
+        self.scene_time = 0.0  # 0.0 to 24.0, where 0 is midnight and 12 is noon
+        self.wind_direction = list(WIND_DIRECTION)
+        self.wind_speed = WIND_SPEED
+        self.fire_truck = new_fire_truck()
+        self.houses = HouseTable([], FIRE_TYPE_NAMES)
+        self.water_stations = []
+        self.hazards = []
+        self.trees = []
+        self.people = []
+        self.obstacles = SpatialGrid(OBSTACLE_CELL_SIZE)
+        self.layout_version = 0  # Bumped whenever a static set (houses, trees, ...) is replaced
+        self.fire_particles = FireParticles(
+            max_fire_particles, particle_eviction, rng=self.streams.numpy('fire_particles'),
+        )
+        self.smoke_particles = SmokeParticles(
+            max_smoke_particles, particle_eviction, rng=self.streams.numpy('smoke_particles'),
+            density_decay=SMOKE_DISSIPATION_RATE,
+        )
+        self.notifications = []
+        self.score = 0
+        self.game_over = False
+        self.game_started = False
+        self.game_time = 0
+        self.time_score = 0.0  # Fractional points earned for time not yet added to score
+        self.houses_saved = 0
+        self.lives = MAX_LIVES
+        self.performance_rating = 0  # 0-100 rating based on performance
+        self.tool_index = 0
+        self.current_equipment = tool_keys[self.tool_index]
+        self.last_fire_pop_time = 0  # Track the last time a fire popped up
+        self.fires_occurred = False  # Track if any fires have occurred during gameplay
+        self.last_houses_destroyed = 0  # Track destroyed houses for life loss
+        self.last_wrong_tool_time = -WRONG_TOOL_NOTICE_INTERVAL
+
+        self.init_houses()
+        self.init_water_stations()
+        self.init_hazards()
+        self.init_trees_and_people()
+
+    def log(self, *args):
+        if self.verbose:
+            print(*args)
+
+    def notify(self, message):
+        self.notifications.append({'message': message, 'timestamp': self.clock})
+
+    def set_viewpoint(self, eye):
+        """Tell the particle pools where the camera is (for 'farthest' eviction)"""
+        self.fire_particles.viewpoint = eye
+        self.smoke_particles.viewpoint = eye
+
+    def particle_stats(self):
+        return {
+            'fire': self.fire_particles.stats(),
+            'smoke': self.smoke_particles.stats(),
+        }
+
+    # --- World construction ---
+
+    def init_houses(self):
+        rng = self.streams.python('houses')
+        houses = []
+
+        # House positions along the roads
+        house_positions = [
+            # Houses along horizontal road
+            (-60, -15), (-40, -15), (-20, -15), (20, -15), (40, -15), (60, -15),  # Left side
+            (-60, 15), (-40, 15), (-20, 15), (20, 15), (40, 15), (60, 15),  # Right side
+
+            # Houses along vertical road
+            (-15, -60), (-15, -40), (-15, -20), (-15, 20), (-15, 40), (-15, 60),  # Bottom side
+            (15, -60), (15, -40), (15, -20), (15, 20), (15, 40), (15, 60),  # Top side
+        ]
+
+        # Select random positions for the initial houses
+        selected_positions = rng.sample(house_positions, NUM_HOUSES)
+
+        for x, z in selected_positions:
+            # Random fire type for the house
+            fire_type = rng.choice(list(FIRE_TYPES.keys()))
+
+            # Start with no houses on fire
+            houses.append({
+                'position': [x, 0, z],
+                'health': MAX_HEALTH,
+                'structural_integrity': MAX_HEALTH,
+                'on_fire': False,
+                'fire_intensity': 0,
+                'fire_type': fire_type,
+                'smoke_level': 0,
+                'flammability': rng.uniform(0.5, 1.0),
+                'fire_spread_timer': 0,
+                'fire_spread_cooldown': rng.uniform(1.0, 3.0),
+                'collapse_risk': 0
+            })
+        self.houses = HouseTable(houses, FIRE_TYPE_NAMES)
+        self.build_spread_neighbors()
+        self.rebuild_obstacles()
+
+    def build_spread_neighbors(self):
+        """Precompute which houses each house can set alight (CSR arrays)
+
+        Houses never move, so the pairs within FIRE_SPREAD_RADIUS, their
+        distances and unit directions are computed once per map.
+        """
+        (
+            self.spread_offsets,
+            self.spread_neighbors,
+            self.spread_distance,
+            self.spread_direction,
+        ) = neighbor_table(
+            list(zip(self.houses.x.tolist(), self.houses.z.tolist())),
+            FIRE_SPREAD_RADIUS,
+        )
+        # Share of the base probability left after distance falloff, per pair
+        self.spread_falloff = FIRE_SPREAD_PROBABILITY * (1 - self.spread_distance / FIRE_SPREAD_RADIUS)
+
+    def init_water_stations(self):
+        # Add water stations at the center and around the intersections
+        self.water_stations = [
+            {'position': [x, 0, z], 'capacity': WATER_CAPACITY}
+            for x, z in [
+                (0, 0),  # Center
+                (WATER_STATION_DISTANCE, WATER_STATION_DISTANCE),  # Top right
+                (-WATER_STATION_DISTANCE, WATER_STATION_DISTANCE),  # Top left
+                (WATER_STATION_DISTANCE, -WATER_STATION_DISTANCE),  # Bottom right
+                (-WATER_STATION_DISTANCE, -WATER_STATION_DISTANCE),  # Bottom left
+            ]
+        ]
+        self.rebuild_obstacles()
+
+    def init_hazards(self):
+        rng = self.streams.python('hazards')
+        self.hazards = []
+        for _ in range(7):
+            x = rng.randint(-WORLD_SIZE//2 + 5, WORLD_SIZE//2 - 5)
+            z = rng.randint(-WORLD_SIZE//2 + 5, WORLD_SIZE//2 - 5)
+            hazard_type = rng.choice(HAZARD_TYPES)
+            self.hazards.append({'position': [x, 0, z], 'type': hazard_type, 'cleared': False})
+        self.rebuild_obstacles()
+
+    def _free_ground_position(self, rng):
+        # Random position, avoiding roads and houses
+        while True:
+            x = rng.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10)
+            z = rng.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10)
+            if (abs(x) > ROAD_WIDTH/2 + 5 and abs(z) > ROAD_WIDTH/2 + 5 and
+                not np.any((np.abs(x - self.houses.x) < 10) & (np.abs(z - self.houses.z) < 10))):
+                return x, z
+
+    def init_trees_and_people(self):
+        rng = self.streams.python('scenery')
+        self.trees = []
+        for _ in range(20):
+            x, z = self._free_ground_position(rng)
+            self.trees.append([x, 0, z])
+
+        self.people = []
+        for _ in range(10):
+            x, z = self._free_ground_position(rng)
+            self.people.append({
+                'position': [x, 0, z],
+                'rotation': rng.uniform(0, 360),
+                'speed': rng.uniform(0.1, 0.3),
+                'target': [rng.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10),
+                           0,
+                           rng.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10)]
+            })
+        self.rebuild_obstacles()
+
+    def rebuild_obstacles(self):
+        """Re-index every static obstacle; needed only when a whole set is replaced"""
+        self.layout_version += 1
+        grid = self.obstacles
+        grid.clear()
+        houses = self.houses
+        for index in np.flatnonzero(houses.standing()).tolist():
+            grid.insert(houses[index], houses.x[index], houses.z[index], 'house')
+        for tree_pos in self.trees:
+            grid.insert(tree_pos, tree_pos[0], tree_pos[2], 'tree')
+        for hazard in self.hazards:
+            if not hazard['cleared']:
+                grid.insert(hazard, hazard['position'][0], hazard['position'][2], 'hazard')
+        for station in self.water_stations:
+            grid.insert(station, station['position'][0], station['position'][2], 'station')
+
+    # --- Game flow ---
+
+    def start(self):
+        """Begin a game (the "PRESS SPACE TO START" transition)"""
+        self.game_started = True
+        self.init_houses()
+        self.init_water_stations()
+        self.init_hazards()
+
+    def restart(self):
+        """Reset to the pre-start state after a game over"""
+        self.init_houses()
+        self.init_water_stations()
+        self.init_hazards()
+        self.fire_truck['position'] = [0, 0, 0]
+        self.fire_truck['rotation'] = 0
+        self.fire_truck['spraying'] = False
+        self.fire_truck['water'] = WATER_CAPACITY
+        self.score = 0
+        self.game_time = 0
+        self.time_score = 0.0
+        self.houses_saved = 0
+        self.lives = MAX_LIVES
+        self.game_over = False
+        self.game_started = False
+        self.tool_index = 0
+        self.current_equipment = tool_keys[self.tool_index]
+
+    def cycle_difficulty(self):
+        difficulties = list(DIFFICULTY_LEVELS.keys())
+        current_index = difficulties.index(self.current_difficulty)
+        self.current_difficulty = difficulties[(current_index + 1) % len(difficulties)]
+
+    def cycle_tool(self):
+        self.select_tool(tool_keys[(self.tool_index + 1) % len(tool_keys)])
+
+    def select_tool(self, tool):
+        self.tool_index = tool_keys.index(tool)
+        self.current_equipment = tool
+        self.notify(f"Selected: {tool_names.get(self.current_equipment, 'Unknown')}")
+
+    def toggle_spray(self):
+        self.fire_truck['spraying'] = not self.fire_truck['spraying']
+
+    def drive_truck(self, direction):
+        """Move the truck forward (direction=1) or backward (direction=-1)"""
+        angle_rad = math.radians(self.fire_truck['rotation'])
+        new_x = self.fire_truck['position'][0] + direction * TRUCK_SPEED * math.sin(angle_rad)
+        new_z = self.fire_truck['position'][2] + direction * TRUCK_SPEED * math.cos(angle_rad)
+        if not self.check_collision([new_x, 0, new_z]):
+            self.fire_truck['position'][0] = new_x
+            self.fire_truck['position'][2] = new_z
+            return True
+        return False
+
+    def turn_truck(self, degrees):
+        self.fire_truck['rotation'] = (self.fire_truck['rotation'] + degrees) % 360
+
+    # --- Per-tick update ---
+
+    def step(self, dt):
+        """Advance the whole world by dt game seconds"""
+        frames = dt * REFERENCE_FRAME_RATE
+        self.clock += dt
+        self.scene_time = (self.scene_time + 0.01 * frames) % 24.0
+
+        if self.game_over or not self.game_started:
+            return
+
+        self.game_time += dt
+
+        # Update score based on time remaining, carrying fractions between ticks
+        self.time_score += SCORE_PER_SECOND * dt
+        whole = int(self.time_score)
+        self.score += whole
+        self.time_score -= whole
+
+        # Game over if time runs out
+        if self.game_time >= DIFFICULTY_LEVELS[self.current_difficulty]['time_limit']:
+            self.game_over = True
+            self.notify("Game Over: Time's up!")
+
+        self.update_wind(frames)
+        self.update_fire_spread(frames)
+        self.update_structural_integrity(frames)
+        self.update_particles(frames)
+
+        # Random fire popping with minimum interval
+        if self.clock - self.last_fire_pop_time >= FIRE_POP_INTERVAL:
+            chance = 0.1 * DIFFICULTY_LEVELS[self.current_difficulty]['fire_rate']
+            if self.streams.python('fire_pops').random() < per_tick_chance(chance, frames):
+                self.pop_random_fire()
+                self.last_fire_pop_time = self.clock
+
+        self.update_spray(dt, frames)
+        self.update_refill()
+        self.update_lives()
+        self.update_people(frames)
+
+    def pop_random_fire(self):
+        # Find houses that are not on fire and not destroyed
+        houses = self.houses
+        valid_houses = np.flatnonzero(~houses.on_fire & houses.standing()).tolist()
+        if valid_houses:
+            rng = self.streams.python('fire_pops')
+            house = houses[rng.choice(valid_houses)]
+            house['on_fire'] = True
+            house['fire_intensity'] = 0.3  # Start with moderate intensity
+            house['fire_type'] = rng.choice(FIRE_TYPE_NAMES)
+            self.fires_occurred = True
+            self.log(f"Fire started at house at position {house['position']}")
+
+    def update_wind(self, frames=1.0):
+        # Randomly change wind direction and speed
+        rng = self.streams.python('wind')
+        if rng.random() < per_tick_chance(0.01, frames):  # 1% chance per frame
+            angle = rng.uniform(-math.pi/4, math.pi/4)
+            wind = self.wind_direction
+            wind = [
+                wind[0] * math.cos(angle) - wind[2] * math.sin(angle),
+                0,
+                wind[0] * math.sin(angle) + wind[2] * math.cos(angle)
+            ]
+            length = math.sqrt(sum(x*x for x in wind))
+            self.wind_direction = [x/length for x in wind]
+            self.wind_speed = rng.uniform(0.5, 2.0)
+
+    def emit_particles(self, frames=1.0):
+        """Spawn fire and smoke particles above every burning house in one batch
+
+        Each burning house emits on average 0.5 fire and 0.3 smoke particles
+        per frame (EMISSION_RATES); counts are drawn per tick so any tick
+        length works.
+        """
+        houses = self.houses
+        burning = np.flatnonzero(houses.on_fire)
+        n = len(burning)
+        if not n:
+            return
+        rng = self.streams.numpy('emission')
+        # Fire and smoke counts per burning house in one draw; at full frame
+        # rate most ticks emit nothing, and end here
+        counts = rng.poisson(EMISSION_RATES * frames, (n, 2))
+        total = int(counts.sum())
+        if not total:
+            return
+        emitters = np.repeat(np.concatenate((burning, burning)), counts.T.ravel())
+        offsets = rng.random((total, 3), dtype=np.float32)
+        offsets *= (4, 2, 4)
+        offsets += houses.position[emitters]
+        k = int(counts[:, 0].sum())  # Fire particles come first
+        if k:
+            offsets[:k] += (-2, 2, -2)
+            self.fire_particles.spawn(
+                offsets[:k], FIRE_TYPE_COLORS[houses.fire_type[emitters[:k]]],
+                self.wind_direction, self.wind_speed,
+            )
+        if k < total:
+            offsets[k:] += (-2, 3, -2)
+            self.smoke_particles.spawn(offsets[k:], self.wind_direction, self.wind_speed)
+
+    def update_fire_spread(self, frames=1.0):
+        houses = self.houses
+        self.emit_particles(frames)
+        burning = houses.on_fire
+        if not burning.any():
+            return
+        # Update fire intensity - make it grow over time
+        houses.fire_intensity[burning] = np.minimum(1.0, houses.fire_intensity[burning] + 0.001 * frames)
+        houses.smoke_level[burning] = np.minimum(MAX_SMOKE_DENSITY, houses.smoke_level[burning] + 0.01 * frames)
+
+        # Try to spread fire to nearby houses (timer and cooldown count frames).
+        # A long tick can span several cooldowns: roll once for each, and
+        # carry the overshoot, so spread attempts per game second do not
+        # depend on the tick rate.
+        houses.fire_spread_timer[burning] += frames
+        sources = np.flatnonzero(burning)
+        cooldown = houses.fire_spread_cooldown[sources]
+        rolls = np.floor(houses.fire_spread_timer[sources] / cooldown).astype(np.intp)
+        if rolls.any():
+            houses.fire_spread_timer[sources] -= rolls * cooldown
+            self.spread_fire_from(np.repeat(sources, rolls))
+
+    def spread_fire_from(self, sources):
+        """Roll fire spread from every house in ``sources`` to its neighbors at once
+
+        A house listed several times rolls once per listing.
+        """
+        offsets = self.spread_offsets
+        starts = offsets[sources]
+        counts = offsets[sources + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            return
+        # Flatten the CSR rows of all sources into one list of candidate pairs
+        source_of_pair = np.repeat(sources, counts)
+        pairs = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        targets = self.spread_neighbors[pairs]
+
+        houses = self.houses
+        candidate = ~houses.on_fire[targets]
+        source_of_pair = source_of_pair[candidate]
+        pairs = pairs[candidate]
+        targets = targets[candidate]
+
+        # Spread probability based on distance, wind, and flammability
+        direction = self.spread_direction[pairs]
+        wind_factor = direction[:, 0] * self.wind_direction[0] + direction[:, 1] * self.wind_direction[2]
+        spread_prob = self.spread_falloff[pairs] * (1 + wind_factor) * houses.flammability[targets]
+        hit = self.streams.numpy('fire_spread').random(len(pairs)) < spread_prob
+
+        # A house caught by several fires takes the type of the first source
+        ignited, first = np.unique(targets[hit], return_index=True)
+        houses.on_fire[ignited] = True
+        houses.fire_intensity[ignited] = 0.1
+        houses.fire_type[ignited] = houses.fire_type[source_of_pair[hit][first]]
+
+    def update_structural_integrity(self, frames=1.0):
+        houses = self.houses
+        burning = houses.on_fire
+        if not burning.any():
+            return
+        # Reduce structural integrity based on fire intensity
+        damage = FIRE_DAMAGE * frames * houses.fire_intensity[burning]
+        houses.structural_integrity[burning] = np.maximum(0, houses.structural_integrity[burning] - damage)
+
+        # If structural integrity is too low, house collapses
+        collapsed = np.flatnonzero(burning & (houses.structural_integrity < 20))
+        if len(collapsed):
+            for index in collapsed.tolist():
+                self.obstacles.remove(houses[index])
+            houses.health[collapsed] = 0
+            houses.on_fire[collapsed] = False
+            houses.fire_intensity[collapsed] = 0
+            houses.smoke_level[collapsed] = 0
+
+    def update_particles(self, frames=1.0):
+        self.fire_particles.update(frames)
+        self.smoke_particles.update(frames)
+
+    def update_spray(self, dt, frames=None):
+        """Use water while spraying and knock down fires in the spray cone"""
+        if frames is None:
+            frames = dt * REFERENCE_FRAME_RATE
+        truck = self.fire_truck
+        if not (truck['spraying'] and truck['water'] > 0):
+            return
+        truck['water'] = max(0, truck['water'] - WATER_USAGE_RATE * frames)
+        houses = self.houses
+        burning = np.flatnonzero(houses.on_fire)
+        if not len(burning):
+            return
+        angle_rad = math.radians(truck['rotation'])
+        dx = houses.x[burning] - truck['position'][0]
+        dz = houses.z[burning] - truck['position'][2]
+        distance = np.hypot(dx, dz)
+        safe = np.where(distance > 0, distance, 1.0)
+        facing = (dx * math.sin(angle_rad) + dz * math.cos(angle_rad)) / safe
+        hit = burning[(distance < SPRAY_DISTANCE) & (facing > 0.7)]
+        if not len(hit):
+            return
+
+        # Only the correct tool for the fire class puts it out
+        right_tool = REQUIRED_EQUIPMENT_CODES[houses.fire_type[hit]] == EQUIPMENT_CODES.get(self.current_equipment, -1)
+        equipment = truck['equipment'].get(self.current_equipment)
+        treated = hit[right_tool]
+        notice_due = self.clock - self.last_wrong_tool_time > WRONG_TOOL_NOTICE_INTERVAL
+        if len(treated) and equipment['condition'] <= 0:
+            if notice_due:
+                tool_name = tool_names.get(self.current_equipment, "Equipment")
+                self.notify(f"{tool_name} is broken! It can no longer put out fires.")
+                self.last_wrong_tool_time = self.clock
+                notice_due = False
+        elif len(treated):
+            intensity = np.maximum(0, houses.fire_intensity[treated] - WATER_HEAL * dt * 0.5)
+            houses.fire_intensity[treated] = intensity
+            out = treated[intensity <= 0]
+            if len(out):
+                houses.on_fire[out] = False
+                houses.fire_intensity[out] = 0
+                self.houses_saved += len(out)
+                self.score += SCORE_PER_HOUSE * len(out)
+            equipment['condition'] -= 0.1 * frames * len(treated)
+            if equipment['condition'] <= 0:
+                equipment['effectiveness'] = 0
+
+        wrong = hit[~right_tool]
+        if len(wrong) and notice_due:
+            fire_type = houses.fire_type_name(wrong[0])
+            tool_hint = tool_names.get(REQUIRED_EQUIPMENT.get(fire_type), "Correct Tool")
+            fire_class = fire_type.replace('CLASS_', 'Class ')
+            self.notify(f"Wrong tool! Use {tool_hint} for {fire_class} fire.")
+            self.last_wrong_tool_time = self.clock
+
+    def update_refill(self):
+        # Automatic water refill when near water stations
+        x, _, z = self.fire_truck['position']
+        if self.obstacles.any_within(x, z, WATER_REFILL_DISTANCE, ('station',)):
+            self.fire_truck['water'] = WATER_CAPACITY
+
+    def update_lives(self):
+        houses_destroyed = int(np.count_nonzero(self.houses.health <= 0))
+        if houses_destroyed > NUM_HOUSES / 2 and not self.game_over:
+            # Only lose a life when a new house is destroyed past the threshold
+            if houses_destroyed > self.last_houses_destroyed:
+                self.lives -= 1
+                self.log("Lives decremented! Now:", self.lives)
+                if self.lives <= 0:
+                    self.game_over = True
+                    self.notify("Game Over: All lives lost!")
+                else:
+                    self.notify(f"Lost a life! {self.lives} remaining")
+            self.last_houses_destroyed = houses_destroyed
+
+        # If lives reach zero (from any cause), game over
+        if self.lives <= 0 and not self.game_over:
+            self.game_over = True
+            self.notify("Game Over: All lives lost!")
+
+    def update_people(self, frames=1.0):
+        rng = self.streams.python('people')
+        for person in self.people:
+            # Move person towards their target
+            dx = person['target'][0] - person['position'][0]
+            dz = person['target'][2] - person['position'][2]
+            distance = math.sqrt(dx*dx + dz*dz)
+
+            if distance < 1.0:  # If reached target, set new target
+                person['target'] = [rng.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10),
+                                    0,
+                                    rng.uniform(-WORLD_SIZE + 10, WORLD_SIZE - 10)]
+            else:
+                speed = min(person['speed'] * frames, distance)
+                person['position'][0] += (dx/distance) * speed
+                person['position'][2] += (dz/distance) * speed
+                # Face the movement direction
+                person['rotation'] = math.degrees(math.atan2(dx, dz))
+
+    # --- Queries and actions ---
+
+    def check_collision(self, new_pos):
+        # Check world boundaries
+        if (abs(new_pos[0]) > WORLD_SIZE - 5 or
+            abs(new_pos[2]) > WORLD_SIZE - 5):
+            return True
+
+        # Standing houses, trees and uncleared hazards block the truck
+        return self.obstacles.any_within(new_pos[0], new_pos[2], COLLISION_DISTANCE, BLOCKING_KINDS)
+
+    def clear_hazard(self):
+        """Clear the nearest uncleared hazard within range of the fire truck"""
+        x, _, z = self.fire_truck['position']
+        nearest = self.obstacles.nearest(x, z, CLEAR_DISTANCE, ('hazard',))
+        if nearest is None:
+            self.notify("No obstacle nearby to clear!")
+            return False
+
+        _, _, hazard = nearest
+        hazard['cleared'] = True
+        self.obstacles.remove(hazard)
+
+        points, msg = HAZARD_REWARDS.get(hazard['type'], (0, "Cleared obstacle!"))
+        self.score += points
+        self.notify(f"{msg} (+{points} pts)")
+        return True
+
+    def calculate_performance_rating(self):
+        # Base rating on houses saved, time remaining, and lives
+        houses_ratio = self.houses_saved / NUM_HOUSES
+        time_ratio = (TIME_LIMIT - self.game_time) / TIME_LIMIT
+        lives_ratio = self.lives / MAX_LIVES
+        # Weighted average
+        self.performance_rating = int((houses_ratio * 0.5 + time_ratio * 0.3 + lives_ratio * 0.2) * 100)
+        return self.performance_rating
+
+
+class FixedTimestep(object):
+    """Step a Simulation at a fixed rate from a variable-rate caller
+
+    The caller (GLUT's idle callback) reports elapsed wall-clock time to
+    advance(); whole ticks of ``1 / tick_rate`` seconds are run from the
+    accumulated time and the remainder carries over.  If the caller falls
+    more than ``max_catch_up`` ticks behind, the backlog is dropped (and
+    counted in ``dropped_time``) instead of spiralling.
+
+    ``alpha`` is how far the caller is between the last tick and the next
+    one, which the renderer uses to blend moving objects.
+    """
+    def __init__(self, sim, tick_rate=TICK_RATE, max_catch_up=MAX_CATCH_UP_TICKS):
+        if tick_rate <= 0:
+            raise ValueError("tick_rate must be positive, got %r" % (tick_rate,))
+        self.sim = sim
+        self.dt = 1.0 / tick_rate
+        self.max_catch_up = max(1, int(max_catch_up))
+        self.accumulator = 0.0
+        self.alpha = 0.0
+        self.ticks = 0
+        self.dropped_time = 0.0
+        self._previous_people = None
+
+    def _people_positions(self):
+        return [(person['position'][0], person['position'][2]) for person in self.sim.people]
+
+    def advance(self, elapsed):
+        """Account for ``elapsed`` seconds, returns the number of ticks run"""
+        self.accumulator += max(0.0, elapsed)
+        steps = 0
+        while self.accumulator >= self.dt:
+            if steps == self.max_catch_up:
+                dropped = self.accumulator - self.accumulator % self.dt
+                self.dropped_time += dropped
+                self.accumulator -= dropped
+                break
+            self._previous_people = self._people_positions()
+            self.sim.step(self.dt)
+            self.accumulator -= self.dt
+            steps += 1
+        self.ticks += steps
+        self.alpha = self.accumulator / self.dt
+        return steps
+
+    def people_positions(self):
+        """(x, z) of each person blended between the last two ticks by alpha"""
+        current = self._people_positions()
+        previous = self._previous_people
+        if previous is None or len(previous) != len(current):
+            return current
+        a = self.alpha
+        return [
+            (px + (cx - px) * a, pz + (cz - pz) * a)
+            for (px, pz), (cx, cz) in zip(previous, current)
+        ]
+
+    def particle_lead(self):
+        """Reference frames to extrapolate particles past the last tick"""
+        return self.alpha * self.dt * REFERENCE_FRAME_RATE
+
+
+def run_headless(ticks, tick_rate=TICK_RATE, difficulty='NORMAL', **options):
+    """Step a fresh game ticks times as fast as possible
+
+    Games that end are restarted immediately so the load stays
+    representative for the whole run.  Extra keyword arguments are
+    passed to Simulation.  Returns a dict of timing stats.
+    """
+    dt = 1.0 / tick_rate
+    sim = Simulation(difficulty=difficulty, verbose=False, **options)
+    sim.start()
+    games = 0
+    start = time.perf_counter()
+    for _ in range(ticks):
+        sim.step(dt)
+        if sim.game_over:
+            games += 1
+            sim.restart()
+            sim.start()
+    elapsed = time.perf_counter() - start
+    return {
+        'ticks': ticks,
+        'dt': dt,
+        'games_completed': games,
+        'wall_seconds': elapsed,
+        'ticks_per_second': ticks / elapsed if elapsed > 0 else float('inf'),
+        'game_seconds_per_second': ticks * dt / elapsed if elapsed > 0 else float('inf'),
+        'particles': sim.particle_stats(),
+        'seed': sim.seed,
+    }
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Fire Fighter 3D")
+    parser.add_argument(
+        '--headless', action='store_true',
+        help="run the simulation without a window at maximum speed",
+    )
+    parser.add_argument(
+        '--ticks', type=int, default=10000,
+        help="number of simulation ticks for --headless runs",
+    )
+    parser.add_argument(
+        '--tick-rate', type=float, default=TICK_RATE,
+        help="simulation ticks per game second; a coarse rate (e.g. 2) runs --headless "
+             "games about 20x faster, but samples the rules less finely",
+    )
+    parser.add_argument(
+        '--max-catch-up', type=int, default=MAX_CATCH_UP_TICKS,
+        help="most simulation ticks run per rendered frame",
+    )
+    parser.add_argument(
+        '--difficulty', choices=sorted(DIFFICULTY_LEVELS), default='NORMAL',
+    )
+    parser.add_argument(
+        '--max-fire-particles', type=int, default=MAX_FIRE_PARTICLES,
+        help="hard cap on live fire particles",
+    )
+    parser.add_argument(
+        '--max-smoke-particles', type=int, default=MAX_SMOKE_PARTICLES,
+        help="hard cap on live smoke particles",
+    )
+    parser.add_argument(
+        '--particle-eviction', choices=EVICTION_POLICIES, default=PARTICLE_EVICTION,
+        help="which particles are dropped when a pool is full",
+    )
+    parser.add_argument(
+        '--seed', type=int, default=None,
+        help="root seed of every random stream, for reproducible runs (default: random)",
+    )
+    parser.add_argument(
+        '--no-instancing', action='store_true',
+        help="draw trees, people and hazards one by one instead of with instanced arrays",
+    )
+    parser.add_argument(
+        '--no-state-shadow', action='store_true',
+        help="send every GL state change to the driver, even ones that change nothing",
+    )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help="time each simulation and drawing stage per frame (P toggles the overlay)",
+    )
+    parser.add_argument(
+        '--profile-overlay', action='store_true',
+        help="profile and start with the p50/p95/p99 overlay shown",
+    )
+    parser.add_argument(
+        '--profile-json', metavar='PATH',
+        help="profile and write percentiles, histograms and entity counts here on exit",
+    )
+    parser.add_argument(
+        '--profile-csv', metavar='PATH',
+        help="profile and write one row of stage times and entity counts per frame here on exit",
+    )
+    parser.add_argument(
+        '--deferred-gl-errors', action='store_true',
+        help="check for GL errors once a frame instead of after every call, "
+             "logging the recent calls when one turns up",
+    )
+    parser.add_argument(
+        '--gl-debug-output', action='store_true',
+        help="log the driver's debug messages (KHR_debug) instead of polling glGetError, "
+             "where the context supports it",
+    )
+    parser.add_argument(
+        '--gl-calls', type=int, default=0, metavar='N',
+        help="print the N GL entry points taking most time per frame on exit "
+             "(needs PYOPENGL_CALL_ACCOUNTING=1)",
+    )
+    return parser
+
+
+def simulation_options(args):
+    """Simulation keyword arguments taken from parsed command line options"""
+    return {
+        'difficulty': args.difficulty,
+        'max_fire_particles': args.max_fire_particles,
+        'max_smoke_particles': args.max_smoke_particles,
+        'particle_eviction': args.particle_eviction,
+        'seed': args.seed,
+    }
+
+
+def parse_args(argv=None):
+    """Parse our options, leaving anything else (e.g. GLUT flags) alone"""
+    args, _ = build_arg_parser().parse_known_args(argv)
+    return args
+
+
+def report_headless(stats, stream=None):
+    stream = stream or sys.stdout
+    stream.write(
+        "%(ticks)d ticks in %(wall_seconds).3fs: %(ticks_per_second).0f ticks/s, "
+        "%(game_seconds_per_second).0f game-s/s, %(games_completed)d games completed "
+        "(seed %(seed)d)\n" % stats
+    )
+    for kind, pool in sorted(stats['particles'].items()):
+        stream.write(
+            "  {} particles: {live}/{capacity} live ({occupancy:.0%}), "
+            "{spawned} spawned, {evicted} evicted, {expired} expired\n".format(kind, **pool)
+        )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report_headless(run_headless(args.ticks, tick_rate=args.tick_rate, **simulation_options(args)))
+
+
+if __name__ == "__main__":
+    main()
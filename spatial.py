@@ -0,0 +1,133 @@
+"""Uniform-grid spatial hash over the ground plane
+
+Static obstacles (houses, trees, hazards, water stations) are bucketed
+by the (x, z) cell they stand in.  A radius query only visits the cells
+overlapping the query circle, so as long as the cell size is at least
+the usual query radius a lookup touches at most 3x3 cells no matter how
+many obstacles the map holds.
+"""
+import math
+
+import numpy as np
+
+
+class SpatialGrid(object):
+    """Hash of ground-plane cells to the items standing in them
+
+    Items are arbitrary objects (usually the simulation's dicts) tagged
+    with a ``kind`` string so one grid can hold every obstacle type.
+    Items are tracked by identity, so unhashable objects are fine.
+    """
+    def __init__(self, cell_size):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive, got %r" % (cell_size,))
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self._where = {}
+
+    def __len__(self):
+        return len(self._where)
+
+    def _cell(self, x, z):
+        return (int(math.floor(x / self.cell_size)), int(math.floor(z / self.cell_size)))
+
+    def clear(self):
+        self.cells.clear()
+        self._where.clear()
+
+    def insert(self, item, x, z, kind=None):
+        """Add item standing at (x, z); re-inserting an item moves it"""
+        if id(item) in self._where:
+            self.remove(item)
+        key = self._cell(x, z)
+        entry = (x, z, kind, item)
+        self.cells.setdefault(key, []).append(entry)
+        self._where[id(item)] = (key, entry)
+
+    def remove(self, item):
+        """Drop item from the grid, returns whether it was present"""
+        location = self._where.pop(id(item), None)
+        if location is None:
+            return False
+        key, entry = location
+        bucket = self.cells[key]
+        bucket.remove(entry)
+        if not bucket:
+            del self.cells[key]
+        return True
+
+    def __contains__(self, item):
+        return id(item) in self._where
+
+    def query(self, x, z, radius, kinds=None):
+        """Yield (distance_squared, kind, item) for items strictly within radius of (x, z)"""
+        radius_sq = radius * radius
+        x0, z0 = self._cell(x - radius, z - radius)
+        x1, z1 = self._cell(x + radius, z + radius)
+        cells = self.cells
+        for ix in range(x0, x1 + 1):
+            for iz in range(z0, z1 + 1):
+                bucket = cells.get((ix, iz))
+                if not bucket:
+                    continue
+                for ex, ez, kind, item in bucket:
+                    if kinds is not None and kind not in kinds:
+                        continue
+                    dx = ex - x
+                    dz = ez - z
+                    distance_sq = dx * dx + dz * dz
+                    if distance_sq < radius_sq:
+                        yield distance_sq, kind, item
+
+    def any_within(self, x, z, radius, kinds=None):
+        for _ in self.query(x, z, radius, kinds):
+            return True
+        return False
+
+    def nearest(self, x, z, radius, kinds=None):
+        """Closest (distance, kind, item) within radius, or None"""
+        best = None
+        for found in self.query(x, z, radius, kinds):
+            if best is None or found[0] < best[0]:
+                best = found
+        if best is None:
+            return None
+        return (math.sqrt(best[0]), best[1], best[2])
+
+
+def neighbor_table(points, radius, cell_size=None):
+    """Compressed sparse rows of every point's neighbors within radius
+
+    ``points`` is a sequence of (x, z) pairs.  Returns NumPy arrays
+    ``(offsets, neighbors, distances, directions)`` where the neighbors
+    of point ``i`` are ``neighbors[offsets[i]:offsets[i+1]]``, in index
+    order, with their distances and the unit (dx, dz) direction from
+    point ``i`` towards each of them.  A point is never its own neighbor;
+    coincident points get a zero direction.
+    """
+    grid = SpatialGrid(cell_size or radius)
+    for index, (x, z) in enumerate(points):
+        grid.insert(index, x, z)
+    offsets = np.zeros(len(points) + 1, dtype=np.int64)
+    neighbors, distances, directions = [], [], []
+    for index, (x, z) in enumerate(points):
+        found = sorted(
+            (other, math.sqrt(distance_sq))
+            for distance_sq, _, other in grid.query(x, z, radius)
+            if other != index
+        )
+        for other, distance in found:
+            ox, oz = points[other]
+            neighbors.append(other)
+            distances.append(distance)
+            if distance > 0:
+                directions.append(((ox - x) / distance, (oz - z) / distance))
+            else:
+                directions.append((0.0, 0.0))
+        offsets[index + 1] = offsets[index] + len(found)
+    return (
+        offsets,
+        np.array(neighbors, dtype=np.int64),
+        np.array(distances, dtype=np.float64),
+        np.array(directions, dtype=np.float64).reshape(-1, 2),
+    )
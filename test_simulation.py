@@ -0,0 +1,49 @@
+"""Tests for rules of the simulation that must not depend on the tick rate
+
+    python -m pytest test_simulation.py
+"""
+import unittest
+
+import numpy as np
+
+from simulation import REFERENCE_FRAME_RATE, Simulation
+
+TICK_RATES = (240.0, 120.0, 60.0, 30.0, 15.0, 2.0)
+GAME_SECONDS = 30.0
+
+
+def count_spread_rolls(tick_rate, burning=(0, 1, 2), seed=7):
+    """Spread rolls per house over GAME_SECONDS with ``burning`` kept on fire"""
+    sim = Simulation(verbose=False, seed=seed)
+    houses = sim.houses
+    houses.on_fire[list(burning)] = True
+    rolls = np.zeros(len(houses), dtype=int)
+    # Count the rolls instead of spreading, so the burning set stays fixed
+    sim.spread_fire_from = lambda sources: np.add.at(rolls, sources, 1)
+    frames = REFERENCE_FRAME_RATE / tick_rate
+    for _ in range(int(round(GAME_SECONDS * tick_rate))):
+        sim.update_fire_spread(frames)
+    return sim, rolls
+
+
+class FireSpreadTest(unittest.TestCase):
+    def test_rolls_agree_across_tick_rates(self):
+        sim, reference = count_spread_rolls(REFERENCE_FRAME_RATE)
+        expected = np.floor(GAME_SECONDS * REFERENCE_FRAME_RATE / sim.houses.fire_spread_cooldown)
+        self.assertTrue(reference[:3].all())
+        for tick_rate in TICK_RATES:
+            _, rolls = count_spread_rolls(tick_rate)
+            # One roll per elapsed cooldown; at most one still pending at the end
+            difference = expected[:3] - rolls[:3]
+            self.assertTrue(((difference >= 0) & (difference <= 1)).all(), (tick_rate, rolls, expected))
+            self.assertFalse(rolls[3:].any())
+
+    def test_long_tick_keeps_overshoot(self):
+        sim, _ = count_spread_rolls(2.0, burning=(0,))
+        houses = sim.houses
+        self.assertLess(houses.fire_spread_timer[0], houses.fire_spread_cooldown[0])
+        self.assertGreaterEqual(houses.fire_spread_timer[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
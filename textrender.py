@@ -0,0 +1,429 @@
+"""Glyph-atlas text rendering for the HUD
+
+glutBitmapCharacter draws one glBitmap per character.  Here the glyph
+bitmaps of the GLUT bitmap fonts are captured once (drawn with
+glutBitmapCharacter into a framebuffer object and read back), packed
+into a single alpha texture, and every string queued during a frame is
+drawn as one batch of textured quads.  String layouts (quad
+corners and texture coordinates relative to the pen origin) are cached
+per (font, text), so unchanged HUD lines cost one dictionary lookup.
+
+Widths come from the fonts' own advances (glutBitmapWidth), so they
+match what GLUT draws exactly (glutBitmapLength).
+
+Offscreen runs never call glutInit, and freeglut refuses any font call
+before it; there the glyphs are read from freeglut's internal font
+tables instead, and a TextRenderer is only built if they look sane.
+"""
+import ctypes
+
+import numpy as np
+
+from OpenGL import platform
+from OpenGL.GL import (
+    GL_ALPHA, GL_ALPHA_TEST, GL_ARRAY_BUFFER, GL_BLEND, GL_CLIENT_PIXEL_STORE_BIT,
+    GL_CLIENT_VERTEX_ARRAY_BIT, GL_COLOR_ARRAY, GL_COLOR_ATTACHMENT0, GL_COLOR_BUFFER_BIT,
+    GL_CURRENT_BIT, GL_DEPTH_TEST, GL_ENABLE_BIT, GL_FLOAT, GL_FOG, GL_FRAMEBUFFER,
+    GL_FRAMEBUFFER_BINDING, GL_LIGHTING, GL_MAX_RENDERBUFFER_SIZE, GL_MODULATE, GL_NEAREST,
+    GL_ONE_MINUS_SRC_ALPHA, GL_PACK_ALIGNMENT, GL_QUADS, GL_RED, GL_RENDERBUFFER, GL_RGBA8,
+    GL_SCISSOR_TEST, GL_SRC_ALPHA, GL_STREAM_DRAW, GL_TEXTURE_2D, GL_TEXTURE_BIT,
+    GL_TEXTURE_COORD_ARRAY, GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_TEXTURE_MAG_FILTER,
+    GL_TEXTURE_MIN_FILTER, GL_UNPACK_ALIGNMENT, GL_UNSIGNED_BYTE, GL_VERTEX_ARRAY,
+    GL_VIEWPORT, GL_VIEWPORT_BIT,
+    glBindBuffer, glBindTexture, glBlendFunc, glClear, glClearColor, glColor3f,
+    glColorPointer, glDeleteTextures, glDisable, glDrawArrays, glEnable,
+    glEnableClientState, glGenTextures, glGetIntegerv, glPixelStorei, glPopAttrib,
+    glPopClientAttrib, glPushAttrib, glPushClientAttrib, glReadPixels, glTexCoordPointer,
+    glTexEnvi, glTexImage2D, glTexParameteri, glVertexPointer, glViewport, glWindowPos2i,
+)
+from OpenGL.GL.framebufferobjects import (
+    checkFramebufferStatus, glBindFramebuffer, glBindRenderbuffer,
+    glDeleteFramebuffers, glDeleteRenderbuffers, glFramebufferRenderbuffer,
+    glGenFramebuffers, glGenRenderbuffers, glRenderbufferStorage,
+)
+from OpenGL.GLUT import (
+    GLUT_INIT_STATE, glutBitmapCharacter, glutBitmapHeight, glutBitmapWidth, glutGet,
+)
+from OpenGL.arrays import vbo
+
+ATLAS_WIDTH = 512
+ATLAS_PADDING = 1  # Empty texels between glyphs so NEAREST sampling never bleeds
+GLYPH_COUNT = 256  # Latin-1, as GLUT's bitmap fonts cover
+MAX_GLYPH_SIZE = 256  # Larger glyph dimensions mean font data we misread
+LAYOUT_CACHE_SIZE = 256  # Cached string layouts before the cache is cleared
+VERTEX_FLOATS = 8  # x, y, u, v, r, g, b, a
+
+
+class _SFGFont(ctypes.Structure):
+    """freeglut's SFG_Font"""
+    _fields_ = [
+        ('name', ctypes.c_char_p),
+        ('quantity', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('characters', ctypes.POINTER(ctypes.POINTER(ctypes.c_ubyte))),
+        ('xorig', ctypes.c_float),
+        ('yorig', ctypes.c_float),
+    ]
+
+
+def _glut_font_struct(font):
+    """The SFG_Font behind a GLUT bitmap font constant (see OpenGL.GLUT.fonts)
+
+    fghFontByID is freeglut-internal, so the struct is only trusted if
+    its header looks like a bitmap font; raises ValueError otherwise.
+    """
+    library = platform.PLATFORM.GLUT
+    try:
+        by_id = library.fghFontByID
+    except AttributeError:
+        raise ValueError("GLUT library does not expose its font data (not freeglut?)")
+    by_id.restype = ctypes.POINTER(_SFGFont)
+    by_id.argtypes = [ctypes.c_void_p]
+    pointer = by_id(font)
+    if not pointer:
+        raise ValueError("%r is not a GLUT bitmap font" % (font,))
+    struct = pointer.contents
+    if not (
+        0 < struct.quantity <= GLYPH_COUNT and 0 < struct.height <= MAX_GLYPH_SIZE
+        and struct.characters and struct.name
+        and abs(struct.xorig) <= struct.height and abs(struct.yorig) <= struct.height
+    ):
+        raise ValueError("GLUT font data for %r has an unexpected layout" % (font,))
+    return struct
+
+
+def _draw_glyphs(draw, advances, height):
+    """Rasterize glyphs with ``draw(code)`` into an FBO and read them back
+
+    ``draw`` renders one glyph at the current raster position and moves
+    it on, like glutBitmapCharacter.  Each glyph gets a cell wide and
+    tall enough for GLUT's fonts, with the pen ``height`` pixels in from
+    its lower-left corner.  Returns ({code: bitmap}, {code: (x, y)}),
+    bitmaps cropped to their ink and bottom row first, (x, y) their
+    lower-left corner relative to the pen; glyphs without ink (spaces)
+    are left out.  Needs a current context with framebuffer objects.
+    """
+    cell_width = max(advances) + 2 * height
+    cell_height = 3 * height
+    columns = 16
+    rows = (len(advances) + columns - 1) // columns
+    width, image_height = columns * cell_width, rows * cell_height
+    if max(width, image_height) > glGetIntegerv(GL_MAX_RENDERBUFFER_SIZE):
+        raise ValueError("Glyphs of %d pixels do not fit in one framebuffer" % (height,))
+    previous = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+    framebuffer = glGenFramebuffers(1)
+    renderbuffer = glGenRenderbuffers(1)
+    glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_VIEWPORT_BIT | GL_CURRENT_BIT)
+    glPushClientAttrib(GL_CLIENT_PIXEL_STORE_BIT)
+    try:
+        glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+        glBindRenderbuffer(GL_RENDERBUFFER, renderbuffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, image_height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, renderbuffer)
+        checkFramebufferStatus()
+        glViewport(0, 0, width, image_height)
+        for capability in (GL_TEXTURE_2D, GL_LIGHTING, GL_DEPTH_TEST, GL_BLEND, GL_FOG,
+                           GL_ALPHA_TEST, GL_SCISSOR_TEST):
+            glDisable(capability)
+        glClearColor(0.0, 0.0, 0.0, 0.0)
+        glClear(GL_COLOR_BUFFER_BIT)
+        glColor3f(1.0, 1.0, 1.0)  # Latched as the raster colour by glWindowPos
+        for code, advance in enumerate(advances):
+            if advance:
+                row, column = divmod(code, columns)
+                glWindowPos2i(column * cell_width + height, row * cell_height + height)
+                draw(code)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, width, image_height, GL_RED, GL_UNSIGNED_BYTE)
+    finally:
+        glBindFramebuffer(GL_FRAMEBUFFER, previous)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        glDeleteRenderbuffers(1, [renderbuffer])
+        glDeleteFramebuffers(1, [framebuffer])
+        glPopClientAttrib()
+        glPopAttrib()
+    image = np.frombuffer(data, dtype=np.uint8).reshape(image_height, width)
+    bitmaps, origins = {}, {}
+    for code, advance in enumerate(advances):
+        row, column = divmod(code, columns)
+        cell = image[row * cell_height:(row + 1) * cell_height, column * cell_width:(column + 1) * cell_width]
+        ink_rows = np.flatnonzero(cell.any(axis=1))
+        if not advance or not len(ink_rows):
+            continue
+        ink_columns = np.flatnonzero(cell.any(axis=0))
+        y0, y1 = ink_rows[0], ink_rows[-1] + 1
+        x0, x1 = ink_columns[0], ink_columns[-1] + 1
+        if y0 == 0 or x0 == 0 or y1 == cell_height or x1 == cell_width:
+            raise ValueError("Glyph %d of a %d pixel font overflows its cell" % (code, height))
+        bitmaps[code] = np.where(cell[y0:y1, x0:x1], np.uint8(255), np.uint8(0))
+        origins[code] = (x0 - height, y0 - height)
+    return bitmaps, origins
+
+
+class BitmapFont(object):
+    """Advances and glyph bitmaps of one GLUT bitmap font
+
+    ``bitmaps[code]`` is a (height, width) uint8 array of 0/255, bottom row
+    first as glBitmap expects, or None for a glyph without one; its
+    lower-left corner sits at the pen position plus ``origins[code]``.
+    """
+    def __init__(self, name, height, advances, bitmaps, origins):
+        self.name = name
+        self.height = height
+        self.advances = list(advances)
+        self.bitmaps = bitmaps
+        self.origins = origins
+
+    @classmethod
+    def from_glut(cls, font):
+        """Load a GLUT bitmap font constant, raising ValueError if that fails
+
+        Once GLUT is initialised the glyphs are drawn with
+        glutBitmapCharacter (needs a current context); before that (as in
+        offscreen runs, which have no display for glutInit) they are read
+        from freeglut's font tables.
+        """
+        if glutGet(GLUT_INIT_STATE):
+            return cls.from_rendering(font)
+        return cls.from_font_tables(font)
+
+    @classmethod
+    def from_rendering(cls, font):
+        """Draw every glyph with the public GLUT API and read it back"""
+        advances = [glutBitmapWidth(font, code) for code in range(GLYPH_COUNT)]
+        if not any(advances):
+            raise ValueError("%r is not a GLUT bitmap font" % (font,))
+        height = glutBitmapHeight(font) if glutBitmapHeight else 0
+        if not 0 < height <= MAX_GLYPH_SIZE:
+            height = max(advances)
+        drawn, origins = _draw_glyphs(lambda code: glutBitmapCharacter(font, code), advances, height)
+        bitmaps = [drawn.get(code) for code in range(GLYPH_COUNT)]
+        return cls(repr(font), height, advances, bitmaps, [origins.get(code) for code in range(GLYPH_COUNT)])
+
+    @classmethod
+    def from_font_tables(cls, font):
+        """Read the glyphs straight out of freeglut's SFG_Font"""
+        struct = _glut_font_struct(font)
+        height = struct.height
+        advances = []
+        bitmaps = []
+        for code in range(struct.quantity):
+            face = struct.characters[code]
+            if not face:
+                advances.append(0)
+                bitmaps.append(None)
+                continue
+            width = face[0]
+            if width > MAX_GLYPH_SIZE:
+                raise ValueError("GLUT font data for %r has an unexpected layout" % (font,))
+            row_bytes = (width + 7) // 8
+            packed = np.ctypeslib.as_array(
+                ctypes.cast(ctypes.addressof(face.contents) + 1, ctypes.POINTER(ctypes.c_ubyte)),
+                (height * row_bytes,),
+            ).reshape(height, row_bytes)
+            bits = np.unpackbits(packed, axis=1)[:, :width]
+            advances.append(width)
+            bitmaps.append(bits * np.uint8(255))
+        origin = (-struct.xorig, -struct.yorig)
+        return cls(struct.name.decode('latin-1'), height, advances, bitmaps, [origin] * len(advances))
+
+    def width(self, text):
+        """Advance of ``text`` in pixels, as glutBitmapLength reports it"""
+        advances = self.advances
+        count = len(advances)
+        return sum(advances[code] for code in map(ord, text) if code < count)
+
+
+class GlyphAtlas(object):
+    """Every glyph of a set of fonts shelf-packed into one alpha image
+
+    ``rects[font_index][code]`` is the glyph's (x, y, width, height) in
+    texels; the texture itself is created by upload().
+    """
+    def __init__(self, fonts, width=ATLAS_WIDTH, padding=ATLAS_PADDING):
+        placements = []
+        x = y = shelf = padding
+        for font_index, font in enumerate(fonts):
+            for code, bitmap in enumerate(font.bitmaps):
+                if bitmap is None or not bitmap.size:
+                    continue
+                h, w = bitmap.shape
+                if x + w + padding > width:
+                    x = padding
+                    y += shelf + padding
+                    shelf = 0
+                placements.append((font_index, code, x, y))
+                x += w + padding
+                shelf = max(shelf, h)
+        height = 1
+        while height < y + shelf + padding:
+            height *= 2
+        self.width = width
+        self.height = height
+        self.image = np.zeros((height, width), dtype=np.uint8)
+        self.rects = [dict() for _ in fonts]
+        for font_index, code, x, y in placements:
+            bitmap = fonts[font_index].bitmaps[code]
+            h, w = bitmap.shape
+            self.image[y:y + h, x:x + w] = bitmap
+            self.rects[font_index][code] = (x, y, w, h)
+        self.texture = None
+
+    def upload(self):
+        """Create the GL texture (needs a current context); returns its id"""
+        if self.texture is None:
+            self.texture = glGenTextures(1)
+            glBindTexture(GL_TEXTURE_2D, self.texture)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+            glTexImage2D(
+                GL_TEXTURE_2D, 0, GL_ALPHA, self.width, self.height, 0,
+                GL_ALPHA, GL_UNSIGNED_BYTE, self.image,
+            )
+        return self.texture
+
+    def release(self):
+        if self.texture is not None:
+            glDeleteTextures([self.texture])
+            self.texture = None
+
+
+class TextRenderer(object):
+    """Queue strings during a frame with add(), draw them all with flush()
+
+    ``fonts`` are the GLUT bitmap font constants to support; raises
+    ValueError if their glyphs cannot be captured (see BitmapFont.from_glut),
+    in which case callers should keep using glutBitmapCharacter.
+
+    Positions are in the units of the current projection (the HUD's
+    gluOrtho2D); glyphs are drawn at one texel per window pixel like
+    glutBitmapCharacter, whatever the window size.
+    """
+    def __init__(self, fonts):
+        self.fonts = {}
+        loaded = []
+        for font in fonts:
+            self.fonts[self._key(font)] = len(loaded)
+            loaded.append(BitmapFont.from_glut(font))
+        self.bitmap_fonts = loaded
+        self.atlas = GlyphAtlas(loaded)
+        self.layouts = {}
+        self.queue = []
+        self.buffer = vbo.VBO(np.zeros((4, VERTEX_FLOATS), dtype=np.float32), usage=GL_STREAM_DRAW)
+        self.layout_hits = 0
+        self.layout_misses = 0
+        self.draw_calls = 0
+
+    @staticmethod
+    def _key(font):
+        return getattr(font, 'value', font)
+
+    def font(self, font):
+        return self.bitmap_fonts[self.fonts[self._key(font)]]
+
+    def width(self, text, font):
+        """Exact width of ``text`` in window pixels"""
+        return self.font(font).width(text)
+
+    def layout(self, text, font):
+        """(4N, 4) float32 rows of (x, y, u, v) in pixels from the pen origin, cached"""
+        index = self.fonts[self._key(font)]
+        key = (index, text)
+        quads = self.layouts.get(key)
+        if quads is not None:
+            self.layout_hits += 1
+            return quads
+        self.layout_misses += 1
+        font = self.bitmap_fonts[index]
+        rects = self.atlas.rects[index]
+        atlas_w, atlas_h = float(self.atlas.width), float(self.atlas.height)
+        rows = []
+        pen = 0
+        for code in map(ord, text):
+            if code >= len(font.advances):
+                continue
+            rect = rects.get(code)
+            if rect is not None:
+                tx, ty, w, h = rect
+                x0 = pen + font.origins[code][0]
+                y0 = font.origins[code][1]
+                u0, v0 = tx / atlas_w, ty / atlas_h
+                u1, v1 = (tx + w) / atlas_w, (ty + h) / atlas_h
+                rows.extend((
+                    (x0, y0, u0, v0), (x0 + w, y0, u1, v0),
+                    (x0 + w, y0 + h, u1, v1), (x0, y0 + h, u0, v1),
+                ))
+            pen += font.advances[code]
+        quads = np.array(rows, dtype=np.float32).reshape(-1, 4)
+        if len(self.layouts) >= LAYOUT_CACHE_SIZE:
+            self.layouts.clear()
+        self.layouts[key] = quads
+        return quads
+
+    def add(self, x, y, text, font, color=(1.0, 1.0, 1.0)):
+        """Queue ``text`` with its baseline origin at (x, y), like glRasterPos2f"""
+        quads = self.layout(text, font)
+        if len(quads):
+            self.queue.append((x, y, quads, color))
+
+    def flush(self, viewport=None, ortho=(1000.0, 800.0)):
+        """Draw everything queued in one call and empty the queue
+
+        ``ortho`` is the (width, height) the current projection maps onto
+        ``viewport`` (x, y, width, height; read from GL by default).
+        Returns the number of draw calls made (0 or 1).
+        """
+        queue, self.queue = self.queue, []
+        self.draw_calls = 0
+        if not queue:
+            return 0
+        if viewport is None:
+            viewport = glGetIntegerv(GL_VIEWPORT)
+        scale_x = ortho[0] / float(viewport[2])
+        scale_y = ortho[1] / float(viewport[3])
+        total = sum(len(quads) for _, _, quads, _ in queue)
+        vertices = np.empty((total, VERTEX_FLOATS), dtype=np.float32)
+        start = 0
+        for x, y, quads, color in queue:
+            rows = vertices[start:start + len(quads)]
+            # Snap the origin to a whole pixel so texels land on pixels one to one
+            rows[:, 0] = (np.floor(x / scale_x + 0.5) + quads[:, 0]) * scale_x
+            rows[:, 1] = (np.floor(y / scale_y + 0.5) + quads[:, 1]) * scale_y
+            rows[:, 2:4] = quads[:, 2:4]
+            rows[:, 4:7] = color[:3]
+            rows[:, 7] = color[3] if len(color) > 3 else 1.0
+            start += len(quads)
+
+        buffer = self.buffer
+        buffer.set_array(vertices)
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_TEXTURE_BIT)
+        glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
+        try:
+            glDisable(GL_LIGHTING)
+            glDisable(GL_DEPTH_TEST)
+            glEnable(GL_BLEND)
+            glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+            glEnable(GL_TEXTURE_2D)
+            glBindTexture(GL_TEXTURE_2D, self.atlas.upload())
+            glTexEnvi(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE)
+            glEnableClientState(GL_VERTEX_ARRAY)
+            glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+            glEnableClientState(GL_COLOR_ARRAY)
+            buffer.bind()
+            stride = VERTEX_FLOATS * 4
+            glVertexPointer(2, GL_FLOAT, stride, buffer)
+            glTexCoordPointer(2, GL_FLOAT, stride, buffer + 8)
+            glColorPointer(4, GL_FLOAT, stride, buffer + 16)
+            glDrawArrays(GL_QUADS, 0, total)
+            self.draw_calls = 1
+        finally:
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            glPopClientAttrib()
+            glPopAttrib()
+        return self.draw_calls
+
+    def release(self):
+        """Delete the atlas texture and VBO (needs the GL context they were created in)"""
+        self.atlas.release()
+        self.buffer.delete()